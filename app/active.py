@@ -0,0 +1,237 @@
+"""Incrementally maintained `active_alerts` table and its in-process snapshot.
+
+`alerts` keeps the full history; `active_alerts` holds only what is in effect
+right now (status Actual, not cancelled, not superseded, not past
+`ends`/`expires`). Ingest keeps it current per message, `sweep_expired`
+removes rows whose end time has passed, and `ActiveSnapshot` serves reads
+from memory. Every change bumps the `active_alerts` version counter
+(app.versions) in the writer's transaction.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, delete, func, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import ActiveAlert
+from .geometry import TIER_TOLERANCES, as_geojson
+from .versions import VERSION_SQL, bump
+
+
+SNAPSHOT_TTL_SECONDS = float(os.getenv('ACTIVE_SNAPSHOT_TTL_SECONDS', '10'))
+
+# Columns copied from the alert upsert values into active_alerts
+ACTIVE_COLUMNS = [
+    'sent', 'effective', 'onset', 'expires', 'ends', 'status', 'message_type',
+    'category', 'severity', 'certainty', 'urgency', 'event', 'sender_name',
+    'headline', 'area_desc', 'geocode_ugc', 'type_emoji', 'keywords', 'keyword_colors',
+]
+
+ALERT_ID_PREFIX = "https://api.weather.gov/alerts/"
+
+VERSION_NAME = 'active_alerts'
+
+
+def parse_iso(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def alert_end_time(values):
+    """Time after which an alert is no longer in effect (`ends`, else `expires`)."""
+    return parse_iso(values.get('ends')) or parse_iso(values.get('expires'))
+
+
+def referenced_ids(references):
+    """Normalized ids of the messages an alert updates or cancels."""
+    out = []
+    for ref in references or []:
+        rid = None
+        if isinstance(ref, dict):
+            rid = ref.get('identifier') or ref.get('@id')
+        elif isinstance(ref, str):
+            rid = ref
+        if rid:
+            if rid.startswith(ALERT_ID_PREFIX):
+                rid = rid[len(ALERT_ID_PREFIX):]
+            out.append(rid)
+    return out
+
+
+def sync_active_alert(db, values, now=None):
+    """Apply one upserted alert to `active_alerts` (caller commits).
+
+    `values` is the column dict used for the `alerts` upsert (it may carry a
+    geometry SQL expression under `geometry`). Returns the set of event names
+    whose active membership changed.
+    """
+    table = ActiveAlert.__table__
+    aid = values['id']
+    now = now or datetime.now(timezone.utc)
+    changed = set()
+    removed = 0
+
+    # Anything this message updates or cancels is superseded
+    refs = referenced_ids(values.get('references'))
+    if refs:
+        res = db.execute(delete(table).where(table.c.id.in_(refs)).returning(table.c.event)).all()
+        changed.update(r.event for r in res)
+        removed += len(res)
+
+    end = alert_end_time(values)
+    inactive = (
+        values.get('message_type') == 'Cancel'
+        or values.get('status') != 'Actual'
+        or (end is not None and end <= now)
+    )
+    if not inactive:
+        # An already-active newer message that references this one wins
+        superseded = db.execute(
+            select(exists().where(table.c.ref_ids.contains([aid])))
+        ).scalar()
+        inactive = bool(superseded)
+
+    if inactive:
+        res = db.execute(delete(table).where(table.c.id == aid).returning(table.c.event)).all()
+        changed.update(r.event for r in res)
+        if removed or res:
+            bump(db, VERSION_NAME)
+        return changed
+
+    row = {c: values.get(c) for c in ACTIVE_COLUMNS}
+    row['id'] = aid
+    row['ref_ids'] = refs
+    if values.get('geometry') is not None:
+        row['geometry'] = values['geometry']
+    stmt = pg_insert(table).values(**row)
+    update = {c: getattr(stmt.excluded, c) for c in ACTIVE_COLUMNS + ['ref_ids', 'geometry']}
+    update['updated_at'] = func.now()
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.id], set_=update)
+    db.execute(stmt)
+    bump(db, VERSION_NAME)
+    changed.add(values.get('event'))
+    return changed
+
+
+def sweep_expired(db):
+    """Delete active rows whose end time has passed. Returns changed event names."""
+    table = ActiveAlert.__table__
+    end = func.coalesce(table.c.ends, table.c.expires)
+    res = db.execute(delete(table).where(end <= func.now()).returning(table.c.event)).all()
+    events = {r.event for r in res}
+    if res:
+        bump(db, VERSION_NAME)
+    db.commit()
+    return events
+
+
+def _load_geojson(geom):
+    if geom is not None:
+        try:
+            geom = json.loads(geom)
+        except Exception:
+            pass
+    return geom
+
+
+def _row_to_dict(r):
+    return {
+        "id": r.id,
+        "geometry": _load_geojson(r.geometry),
+        "sent": r.sent,
+        "effective": r.effective,
+        "onset": r.onset,
+        "expires": r.expires,
+        "ends": r.ends,
+        "status": r.status,
+        "messageType": r.message_type,
+        "category": r.category,
+        "severity": r.severity,
+        "certainty": r.certainty,
+        "urgency": r.urgency,
+        "event": r.event,
+        "senderName": r.sender_name,
+        "headline": r.headline,
+        "areaDesc": r.area_desc,
+        "geocode_ugc": r.geocode_ugc,
+        "typeEmoji": r.type_emoji,
+        "keywords": r.keywords,
+        "keywordColors": r.keyword_colors,
+    }
+
+
+class ActiveSnapshot:
+    """Read-optimized in-memory copy of `active_alerts`.
+
+    Refreshed at most every `ACTIVE_SNAPSHOT_TTL_SECONDS`, and only reloaded
+    when the table's version counter changed. Rows past their
+    end time are filtered at read time so the sweeper interval doesn't matter.
+    Every geometry tier is kept (as GeoJSON) together with the row's bbox so
+    `rows(tier=..., bbox=...)` needs no database work. `session_factory`
+    produces async sessions.
+    """
+
+    def __init__(self, session_factory, ttl=SNAPSHOT_TTL_SECONDS):
+        self._session_factory = session_factory
+        self._ttl = ttl
+        self._lock = asyncio.Lock()
+        self._checked = 0.0
+        self._loaded = False
+        self._version = None
+        self._rows = []
+
+    async def _refresh(self):
+        table = ActiveAlert.__table__
+        async with self._session_factory() as db:
+            version = (await db.execute(VERSION_SQL, {"name": VERSION_NAME})).scalar()
+            if self._loaded and version == self._version:
+                return
+            tiers = sorted(TIER_TOLERANCES)
+            cols = [c for c in table.c if not c.name.startswith('geometry') and c.name not in ('ref_ids', 'updated_at')]
+            geoms = [func.ST_AsGeoJSON(table.c.geometry).label('geometry')] + [
+                as_geojson(table, 'geometry', t).label(f'geojson_{t}')
+                for t in tiers
+            ]
+            box = table.c.geometry_bbox
+            extent = [func.ST_XMin(box).label('xmin'), func.ST_YMin(box).label('ymin'),
+                      func.ST_XMax(box).label('xmax'), func.ST_YMax(box).label('ymax')]
+            stmt = select(*cols, *geoms, *extent).order_by(table.c.sent.desc())
+            rows = []
+            for r in (await db.execute(stmt)).all():
+                d = _row_to_dict(r)
+                by_tier = {t: _load_geojson(getattr(r, f'geojson_{t}')) for t in tiers}
+                bbox = (r.xmin, r.ymin, r.xmax, r.ymax) if r.xmin is not None else None
+                rows.append((r.ends or r.expires, d, by_tier, bbox))
+            self._rows = rows
+            self._version = version
+            self._loaded = True
+
+    async def rows(self, tier=0, bbox=None):
+        """Unexpired rows, with geometries at `tier`, optionally within a lon/lat `bbox`."""
+        if time.monotonic() - self._checked >= self._ttl:
+            async with self._lock:
+                # Another request may have refreshed while we waited
+                if time.monotonic() - self._checked >= self._ttl:
+                    await self._refresh()
+                    self._checked = time.monotonic()
+        now = datetime.now(timezone.utc)
+        out = []
+        for end, d, by_tier, extent in self._rows:
+            if end is not None and end <= now:
+                continue
+            if bbox is not None and (extent is None or extent[0] > bbox[2] or extent[2] < bbox[0]
+                                     or extent[1] > bbox[3] or extent[3] < bbox[1]):
+                continue
+            out.append(d if tier == 0 else dict(d, geometry=by_tier.get(tier)))
+        return out
@@ -3,10 +3,12 @@ import time
 import hmac
 import hashlib
 import base64
-from fastapi import FastAPI, Request, Form, HTTPException, Header # type: ignore
+from fastapi import FastAPI, Request, Form, HTTPException, Header, Depends # type: ignore
 from fastapi.responses import HTMLResponse, JSONResponse # type: ignore
 from fastapi.templating import Jinja2Templates # type: ignore
-from .db import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import SessionLocal, get_db
 from .models import ApiKey
 
 
@@ -43,14 +45,12 @@ def index(request: Request):
 
 
 @app.get('/api/apikeys')
-def api_list_keys():
-    db = SessionLocal()
-    try:
-        keys = db.query(ApiKey).order_by(ApiKey.id.desc()).all()
-        out = [{"id": k.id, "owner": k.owner, "active": bool(k.active)} for k in keys]
-        return JSONResponse(out)
-    finally:
-        db.close()
+async def api_list_keys(db: AsyncSession = Depends(get_db)):
+    rows = (await db.execute(
+        select(ApiKey.id, ApiKey.owner, ApiKey.active).order_by(ApiKey.id.desc())
+    )).all()
+    out = [{"id": k.id, "owner": k.owner, "active": bool(k.active)} for k in rows]
+    return JSONResponse(out)
 
 
 @app.post('/api/apikeys/create')
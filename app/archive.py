@@ -0,0 +1,278 @@
+"""Content-addressed archive of raw NWS pages and SPC products, with replay.
+
+Every raw payload the pollers download is stored once under
+`RAW_ARCHIVE_DIR/objects/<sha256[:2]>/<sha256>.<codec>` (zstd when the
+`zstandard` package is installed, else gzip), so identical re-fetches cost
+no extra space. Each fetch is listed in the `raw_archive` time index.
+
+    python -m app.archive list   --since 2026-05-01 --until 2026-05-02
+    python -m app.archive replay --since 2026-05-01 --until 2026-05-02 [--source nws|spc]
+    python -m app.archive prune  [--days 30]
+
+`replay` feeds archived payloads back through the normal ingest code in
+time order, skipping payloads and alert features already replayed in the
+same run.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+try:
+    import zstandard
+except ImportError:  # optional; fall back to gzip
+    zstandard = None
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+ENABLED = os.getenv('RAW_ARCHIVE', '1') in ('1', 'true', 'True')
+ARCHIVE_DIR = Path(os.getenv('RAW_ARCHIVE_DIR', str(ROOT / 'archive' / 'raw')))
+# auto | zstd | gzip
+COMPRESSION = os.getenv('RAW_ARCHIVE_COMPRESSION', 'auto')
+ZSTD_LEVEL = int(os.getenv('RAW_ARCHIVE_ZSTD_LEVEL', '10'))
+# 0 keeps everything
+RETENTION_DAYS = int(os.getenv('RAW_ARCHIVE_RETENTION_DAYS', '0'))
+PRUNE_INTERVAL_SECONDS = int(os.getenv('RAW_ARCHIVE_PRUNE_SECONDS', '3600'))
+
+
+def _codec():
+    if COMPRESSION == 'gzip' or (COMPRESSION == 'auto' and zstandard is None):
+        return 'gz'
+    if zstandard is None:
+        raise RuntimeError("RAW_ARCHIVE_COMPRESSION=zstd requires the zstandard package")
+    return 'zst'
+
+
+def _compress(data, codec):
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, codec):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError("archive object is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def object_path(sha256, codec, archive_dir=None):
+    return Path(archive_dir or ARCHIVE_DIR) / 'objects' / sha256[:2] / f"{sha256}.{codec}"
+
+
+def put_object(content, archive_dir=None):
+    """Store `content` if not already present. Returns (sha256, codec, stored_size, path)."""
+    sha256 = hashlib.sha256(content).hexdigest()
+    # An object may already exist under either codec
+    for codec in ('zst', 'gz'):
+        path = object_path(sha256, codec, archive_dir)
+        if path.exists():
+            # Fresh mtime: prune skips recent unreferenced objects until the index row lands
+            os.utime(path)
+            return sha256, codec, path.stat().st_size, path
+    codec = _codec()
+    path = object_path(sha256, codec, archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + f'.{os.getpid()}.tmp')
+    tmp.write_bytes(_compress(content, codec))
+    tmp.replace(path)
+    return sha256, codec, path.stat().st_size, path
+
+
+def read_object(sha256, codec, archive_dir=None):
+    return _decompress(object_path(sha256, codec, archive_dir).read_bytes(), codec)
+
+
+def store(engine, source, name, url, content, fetched_at=None):
+    """Archive one raw payload and index it (best-effort). Returns the sha256 or None."""
+    if not ENABLED or not content:
+        return None
+    try:
+        sha256, codec, stored_size, _ = put_object(content)
+        with engine.begin() as conn:
+            conn.execute(text(
+                """
+                INSERT INTO raw_archive (source, name, url, fetched_at, sha256, codec, size, stored_size)
+                VALUES (:source, :name, :url, :fetched_at, :sha256, :codec, :size, :stored_size)
+                """
+            ), {
+                "source": source,
+                "name": name,
+                "url": url,
+                "fetched_at": fetched_at or datetime.now(timezone.utc),
+                "sha256": sha256,
+                "codec": codec,
+                "size": len(content),
+                "stored_size": stored_size,
+            })
+        return sha256
+    except Exception as e:
+        print(f"archive: failed to store {source}/{name}: {e}")
+        return None
+
+
+def entries(conn, since=None, until=None, source=None):
+    """Index rows in fetch order, optionally bounded by time and source."""
+    where, params = [], {}
+    if since is not None:
+        where.append("fetched_at >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("fetched_at < :until")
+        params["until"] = until
+    if source:
+        where.append("source = :source")
+        params["source"] = source
+    sql = "SELECT id, source, name, url, fetched_at, sha256, codec, size, stored_size FROM raw_archive"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return conn.execute(text(sql + " ORDER BY fetched_at, id"), params).all()
+
+
+def prune(engine, days=None, archive_dir=None):
+    """Drop index rows older than `days` and delete objects nothing references any more."""
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return 0, 0
+    with engine.begin() as conn:
+        dropped = conn.execute(text(
+            "DELETE FROM raw_archive WHERE fetched_at < now() - make_interval(days => :d)"
+        ), {"d": days}).rowcount
+        referenced = {r.sha256 for r in conn.execute(text("SELECT DISTINCT sha256 FROM raw_archive"))}
+    removed = 0
+    objects = Path(archive_dir or ARCHIVE_DIR) / 'objects'
+    if objects.exists():
+        for path in objects.glob('*/*.*'):
+            if path.name.endswith('.tmp'):
+                continue
+            # Skip fresh objects whose index row may not be committed yet
+            if path.name.split('.', 1)[0] not in referenced and time.time() - path.stat().st_mtime > 3600:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+    return dropped, removed
+
+
+_last_prune = 0.0
+
+
+def maintain(engine):
+    """Apply retention at most once per `RAW_ARCHIVE_PRUNE_SECONDS`."""
+    global _last_prune
+    now = time.monotonic()
+    if RETENTION_DAYS <= 0 or (_last_prune and now - _last_prune < PRUNE_INTERVAL_SECONDS):
+        return
+    _last_prune = now
+    try:
+        dropped, removed = prune(engine)
+        if dropped or removed:
+            print(f"archive: pruned {dropped} index rows, {removed} objects")
+    except Exception as e:
+        print(f"archive: prune failed: {e}")
+
+
+def _replay_nws(payloads, seen_features):
+    from .db import SessionLocal
+    from .ingest import _process_features
+
+    features = []
+    for content in payloads:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            continue
+        for f in data.get('features') or []:
+            # The same alert version appears in many consecutive pages
+            key = hashlib.sha1(json.dumps(f, sort_keys=True).encode('utf-8')).digest()
+            if key not in seen_features:
+                seen_features.add(key)
+                features.append(f)
+    if not features:
+        return 0
+    db = SessionLocal()
+    try:
+        _process_features(features, db)
+    finally:
+        db.close()
+    return len(features)
+
+
+def replay(engine, since=None, until=None, source=None, batch=200):
+    """Re-ingest archived payloads in a time range. Returns (payloads, nws features) replayed."""
+    from .spc_ingest import store_product
+
+    with engine.connect() as conn:
+        rows = entries(conn, since, until, source)
+    seen_objects, seen_features = set(), set()
+    payloads = features = 0
+    nws_batch = []
+    for row in rows:
+        # Identical content was already replayed (or would be a no-op upsert)
+        key = (row.source, row.name, row.sha256)
+        if key in seen_objects:
+            continue
+        seen_objects.add(key)
+        try:
+            content = read_object(row.sha256, row.codec)
+        except (OSError, RuntimeError) as e:
+            print(f"archive: missing object for {row.source}/{row.name} at {row.fetched_at}: {e}")
+            continue
+        payloads += 1
+        if row.source == 'nws':
+            nws_batch.append(content)
+            if len(nws_batch) >= batch:
+                features += _replay_nws(nws_batch, seen_features)
+                nws_batch = []
+        elif row.source == 'spc':
+            try:
+                store_product(row.name, row.url, row.name, json.loads(content))
+            except Exception as e:
+                print(f"archive: replay of {row.name} at {row.fetched_at} failed: {e}")
+    features += _replay_nws(nws_batch, seen_features)
+    return payloads, features
+
+
+def _parse_time(value):
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raw payload archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("list", "replay"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", type=_parse_time, default=None, help="ISO time (UTC if no offset)")
+        p.add_argument("--until", type=_parse_time, default=None)
+        p.add_argument("--source", choices=("nws", "spc"), default=None)
+    p = sub.add_parser("prune")
+    p.add_argument("--days", type=int, default=None, help="Overrides RAW_ARCHIVE_RETENTION_DAYS")
+    args = parser.parse_args()
+
+    from .db import engine
+    if args.command == "list":
+        with engine.connect() as conn:
+            for r in entries(conn, args.since, args.until, args.source):
+                print(f"{r.fetched_at.isoformat()}  {r.source:3}  {r.name:32}  {r.size:>9}  {r.stored_size:>8}  {r.sha256[:16]}")
+    elif args.command == "replay":
+        t0 = time.perf_counter()
+        payloads, features = replay(engine, args.since, args.until, args.source)
+        print(f"archive: replayed {payloads} payloads ({features} NWS features) in {time.perf_counter() - t0:.1f}s")
+    elif args.command == "prune":
+        dropped, removed = prune(engine, args.days)
+        print(f"archive: pruned {dropped} index rows, {removed} objects")
+
+
+if __name__ == '__main__':
+    main()
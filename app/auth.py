@@ -1,6 +1,8 @@
-from fastapi import Header, HTTPException
+from fastapi import Header, HTTPException, Depends
 from starlette.status import HTTP_401_UNAUTHORIZED
-from .db import SessionLocal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import get_db
 from .models import ApiKey
 import os
 import hmac
@@ -9,16 +11,15 @@ import time
 import base64
 
 
-def verify_api_key(x_api_key: str = Header(None)):
+async def verify_api_key(x_api_key: str = Header(None), db: AsyncSession = Depends(get_db)):
     if not x_api_key:
         raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Missing API key")
-    db = SessionLocal()
-    try:
-        key = db.query(ApiKey).filter(ApiKey.key == x_api_key, ApiKey.active == 1).first()
-        if not key:
-            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid API key")
-    finally:
-        db.close()
+    # Checked on the primary so newly created keys work immediately
+    key = (await db.execute(
+        select(ApiKey.id).where(ApiKey.key == x_api_key, ApiKey.active == 1).limit(1)
+    )).first()
+    if not key:
+        raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Invalid API key")
 
 
 def verify_admin(x_admin_key: str = Header(None)):
@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,352 +18,203 @@ DB_NAME = os.getenv('POSTGRES_DB', 'alerts')
 
 DATABASE_URL = f"postgresql+psycopg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, future=True)
+# Optional read replica: either a full URL or just a different host/port
+DB_READ_HOST = os.getenv('POSTGRES_READ_HOST')
+DB_READ_PORT = os.getenv('POSTGRES_READ_PORT', DB_PORT)
+READ_DATABASE_URL = os.getenv('DATABASE_READ_URL') or (
+    f"postgresql+psycopg://{DB_USER}:{DB_PASS}@{DB_READ_HOST}:{DB_READ_PORT}/{DB_NAME}" if DB_READ_HOST else None
+)
+
+# Pool tuning (per process)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') in ('1', 'true', 'True')
+
+
+class PoolStats:
+    """Checkout wait time, saturation and connection counters for one pool."""
+
+    def __init__(self, name, pool_size, max_overflow):
+        self.name = name
+        self.capacity = pool_size + max(max_overflow, 0)
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=1024)
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.recent_waits.append(seconds)
+
+    def snapshot(self, pool):
+        with self.lock:
+            waits = sorted(self.recent_waits)
+            p50 = waits[len(waits) // 2] if waits else 0.0
+            p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+            return {
+                "name": self.name,
+                "pool_size": pool.size(),
+                "capacity": self.capacity,
+                "checked_out": self.checked_out,
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "saturation": round(self.checked_out / self.capacity, 3) if self.capacity else None,
+                "max_checked_out": self.max_checked_out,
+                "connections_opened": self.connects,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_avg_ms": round(1000 * self.wait_total / max(self.checkouts + self.timeouts, 1), 3),
+                "checkout_wait_p50_ms": round(1000 * p50, 3),
+                "checkout_wait_p99_ms": round(1000 * p99, 3),
+                "checkout_wait_max_ms": round(1000 * self.wait_max, 3),
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Records how long callers wait for a connection from the pool."""
+
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        new = super().recreate()
+        new.stats = self.stats
+        return new
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _instrument(eng, name):
+    # Async engines expose the pool and its events on their sync facade
+    eng = getattr(eng, 'sync_engine', eng)
+    stats = PoolStats(name, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+    eng.pool.stats = stats
+
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_conn, record):
+        with stats.lock:
+            stats.connects += 1
+
+    @event.listens_for(eng, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        with stats.lock:
+            stats.checked_out += 1
+            stats.max_checked_out = max(stats.max_checked_out, stats.checked_out)
+
+    @event.listens_for(eng, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        with stats.lock:
+            stats.checked_out = max(stats.checked_out - 1, 0)
+
+
+def _make_engine(url, name):
+    eng = create_engine(
+        url,
+        future=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    _instrument(eng, name)
+    return eng
+
+
+def _make_async_engine(url, name):
+    eng = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    _instrument(eng, name)
+    return eng
+
+
+# `engine` is the primary (all writes); `read_engine` serves GET endpoints and
+# is the primary itself unless a replica is configured.
+engine = _make_engine(DATABASE_URL, "primary")
+read_engine = _make_engine(READ_DATABASE_URL, "replica") if READ_DATABASE_URL else engine
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Async engines (psycopg3 async) for FastAPI request handlers; engines are
+# lazy, so processes that never use them (ingest pollers) open no connections.
+async_engine = _make_async_engine(DATABASE_URL, "primary_async")
+async_read_engine = _make_async_engine(READ_DATABASE_URL, "replica_async") if READ_DATABASE_URL else async_engine
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_db():
+    """FastAPI dependency: async session on the primary."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_read_db():
+    """FastAPI dependency: async session on the read replica (or primary)."""
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+
+def pool_status():
+    """Pool statistics for every engine in this process."""
+    out = []
+    for eng in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine):
+        stats = getattr(eng.pool, 'stats', None)
+        if stats is not None and all(o["name"] != stats.name for o in out):
+            out.append(stats.snapshot(eng.pool))
+    return out
+
 
 def init_db():
-    """Create tables and ensure PostGIS spatial index exists.
+    """Bring the schema up to date via the versioned migration ledger.
 
-    - Runs SQL to create the `postgis` extension if available (best-effort).
-    - Creates a GiST index on `alerts.geometry` if it doesn't already exist.
+    See `app.migrations`: pending migrations are applied once each under an
+    advisory lock; when nothing is pending this costs a single SELECT.
     """
-    Base.metadata.create_all(bind=engine)
-
-    # Ensure PostGIS extension and spatial index (best-effort; ignore failures)
-    try:
-        with engine.connect() as conn:
-            # Create extension if possible (may require superuser; ignore errors)
-            try:
-                conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis;"))
-            except Exception:
-                pass
-
-            # Create a GiST spatial index on alerts.geometry if it doesn't exist
-            try:
-                conn.execute(text(
-                    "CREATE INDEX IF NOT EXISTS idx_alerts_geometry ON alerts USING GIST (geometry);"
-                ))
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        # If engine connection itself fails (DB not ready), let the caller retry via container restart
-        pass
-
-    # Ensure extracted columns exist (best-effort ALTER TABLE statements)
-    try:
-        with engine.connect() as conn:
-            alter_stmts = [
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sent timestamptz",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS effective timestamptz",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS onset timestamptz",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS expires timestamptz",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS ends timestamptz",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS status varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS message_type varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS category varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS severity varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS certainty varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS urgency varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS event varchar(512)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sender varchar(256)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sender_name varchar(256)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS headline varchar(512)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS area_desc varchar(1024)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS description text",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS instruction text",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS response varchar(128)",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS geocode jsonb",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS parameters jsonb",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS affected_zones jsonb",
-                "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS references jsonb",
-            ]
-            for s in alter_stmts:
-                try:
-                    conn.execute(text(s))
-                except Exception:
-                    pass
-            # Add an index on sent for faster time-range queries
-            try:
-                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_alerts_sent ON alerts (sent);"))
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        pass
-
-    # Ensure SPC outlooks have `issue` column and unique index on (product, issue)
-    try:
-        with engine.connect() as conn:
-            try:
-                conn.execute(text("ALTER TABLE convective_outlooks ADD COLUMN IF NOT EXISTS issue timestamptz;"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE fire_outlooks ADD COLUMN IF NOT EXISTS issue timestamptz;"))
-            except Exception:
-                pass
-            try:
-                # Drop any legacy unique indexes that included dn to allow schema migration
-                try:
-                    conn.execute(text("DROP INDEX IF EXISTS uq_convective_product_issue_dn;"))
-                except Exception:
-                    pass
-                try:
-                    conn.execute(text("DROP INDEX IF EXISTS uq_fire_product_issue_dn;"))
-                except Exception:
-                    pass
-                # Create a unique index on product + issue + feature_index to support idempotent upserts
-                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_convective_product_issue_featidx ON convective_outlooks (product, issue, feature_index);"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_fire_product_issue_featidx ON fire_outlooks (product, issue, feature_index);"))
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        pass
-
-    # Ensure dn column is text for both outlook tables (convert existing integer values to text)
-    try:
-        with engine.connect() as conn:
-            try:
-                conn.execute(text("ALTER TABLE convective_outlooks ALTER COLUMN dn TYPE text USING dn::text;"))
-            except Exception:
-                pass
-            try:
-                conn.execute(text("ALTER TABLE fire_outlooks ALTER COLUMN dn TYPE text USING dn::text;"))
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        pass
-
-    # If there's a SQL migration file for SPC outlooks (db_init/03_spc_outlooks.sql), apply it idempotently
-    # and migrate any legacy *_features rows into the single-feature outlook tables.
-    try:
-        from pathlib import Path
-        root = Path(__file__).resolve().parents[1]
-        sql_file = root / 'db_init' / '03_spc_outlooks.sql'
-        if sql_file.exists():
-            with engine.begin() as conn:
-                try:
-                    sql_text = sql_file.read_text()
-                    # Ensure the new single-table schema exists (idempotent)
-                    conn.exec_driver_sql(sql_text)
-
-                    # Detect legacy feature tables
-                    has_conv_features = conn.execute(text("SELECT to_regclass('public.convective_features')")).scalar()
-                    has_fire_features = conn.execute(text("SELECT to_regclass('public.fire_features')")).scalar()
-
-                    # Migrate convective features into convective_outlooks if present
-                    if has_conv_features:
-                        try:
-                            conn.exec_driver_sql(
-                                """
-                                INSERT INTO convective_outlooks (
-                                  product, url, payload, fetched_hour, feature_index, properties, dn, valid, expire, issue,
-                                  forecaster, label, label2, stroke, fill, geom, created_at
-                                )
-                                SELECT o.product, o.url, o.payload, COALESCE(o.fetched_hour, now()), f.feature_index, f.properties, f.dn, f.valid, f.expire,
-                                       COALESCE(f.issue, o.issue), f.forecaster, f.label, f.label2, f.stroke, f.fill, f.geom, f.created_at
-                                    FROM convective_outlooks o JOIN convective_features f ON f.outlook_id = o.id
-                                                                    ON CONFLICT (product, issue) DO UPDATE
-                                  SET payload = EXCLUDED.payload,
-                                      properties = EXCLUDED.properties,
-                                      dn = EXCLUDED.dn,
-                                      valid = EXCLUDED.valid,
-                                      expire = EXCLUDED.expire,
-                                      forecaster = EXCLUDED.forecaster,
-                                      label = EXCLUDED.label,
-                                      label2 = EXCLUDED.label2,
-                                      stroke = EXCLUDED.stroke,
-                                      fill = EXCLUDED.fill,
-                                      geom = EXCLUDED.geom,
-                                      created_at = EXCLUDED.created_at;
-                                """
-                            )
-                            # Rename the old feature table to preserve data (non-destructive)
-                            conn.exec_driver_sql("ALTER TABLE IF EXISTS convective_features RENAME TO convective_features_old;")
-                        except Exception:
-                            # If migration fails for any reason, don't block startup
-                            pass
-
-                    # Normalize geometry to Multi* for compatibility (safe if already multi)
-                    try:
-                        conn.exec_driver_sql("UPDATE convective_outlooks SET geom = ST_Multi(geom) WHERE geom IS NOT NULL;")
-                        conn.exec_driver_sql("UPDATE fire_outlooks SET geom = ST_Multi(geom) WHERE geom IS NOT NULL;")
-                    except Exception:
-                        pass
-
-                    # Migrate fire features into fire_outlooks if present
-                    if has_fire_features:
-                        try:
-                            conn.exec_driver_sql(
-                                """
-                                INSERT INTO fire_outlooks (
-                                  product, url, payload, fetched_hour, feature_index, properties, dn, valid, expire, issue,
-                                  forecaster, label, label2, stroke, fill, geom, created_at
-                                )
-                                SELECT o.product, o.url, o.payload, COALESCE(o.fetched_hour, now()), f.feature_index, f.properties, f.dn, f.valid, f.expire,
-                                       COALESCE(f.issue, o.issue), f.forecaster, f.label, f.label2, f.stroke, f.fill, f.geom, f.created_at
-                                FROM fire_outlooks o JOIN fire_features f ON f.outlook_id = o.id
-                                ON CONFLICT (product, issue) DO UPDATE
-                                  SET payload = EXCLUDED.payload,
-                                      properties = EXCLUDED.properties,
-                                      dn = EXCLUDED.dn,
-                                      valid = EXCLUDED.valid,
-                                      expire = EXCLUDED.expire,
-                                      forecaster = EXCLUDED.forecaster,
-                                      label = EXCLUDED.label,
-                                      label2 = EXCLUDED.label2,
-                                      stroke = EXCLUDED.stroke,
-                                      fill = EXCLUDED.fill,
-                                      geom = EXCLUDED.geom,
-                                      created_at = EXCLUDED.created_at;
-                                """
-                            )
-                            conn.exec_driver_sql("ALTER TABLE IF EXISTS fire_features RENAME TO fire_features_old;")
-                        except Exception:
-                            pass
-
-                    # If some rows were created with only `payload` populated (legacy/migration issues),
-                    # extract the first feature's properties/geometry into typed columns.
-                    try:
-                        conn.exec_driver_sql(
-                            """
-                            -- Populate convective_outlooks typed columns from payload->features[0]
-                            UPDATE convective_outlooks SET
-                                properties = payload->'features'->0->'properties',
-                                dn = COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),'') , 'NA'),
-                                valid = NULLIF(payload->'features'->0->'properties'->>'VALID_ISO','')::timestamptz,
-                                expire = NULLIF(payload->'features'->0->'properties'->>'EXPIRE_ISO','')::timestamptz,
-                                issue = NULLIF(payload->'features'->0->'properties'->>'ISSUE_ISO','')::timestamptz,
-                                forecaster = payload->'features'->0->'properties'->>'FORECASTER',
-                                label = payload->'features'->0->'properties'->>'LABEL',
-                                label2 = payload->'features'->0->'properties'->>'LABEL2',
-                                stroke = payload->'features'->0->'properties'->>'stroke',
-                                fill = payload->'features'->0->'properties'->>'fill',
-                                geom = CASE WHEN (payload->'features'->0->'geometry') IS NULL OR (payload->'features'->0->'geometry') = 'null' THEN geom ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((payload->'features'->0->'geometry')::text)),4326) END
-                            WHERE (payload->'features'->0->'properties') IS NOT NULL;
-
-                            -- Populate fire_outlooks typed columns from payload->features[0]
-                            UPDATE fire_outlooks SET
-                                properties = payload->'features'->0->'properties',
-                                dn = COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),'') , 'NA'),
-                                valid = NULLIF(payload->'features'->0->'properties'->>'VALID_ISO','')::timestamptz,
-                                expire = NULLIF(payload->'features'->0->'properties'->>'EXPIRE_ISO','')::timestamptz,
-                                issue = NULLIF(payload->'features'->0->'properties'->>'ISSUE_ISO','')::timestamptz,
-                                forecaster = payload->'features'->0->'properties'->>'FORECASTER',
-                                label = payload->'features'->0->'properties'->>'LABEL',
-                                label2 = payload->'features'->0->'properties'->>'LABEL2',
-                                stroke = payload->'features'->0->'properties'->>'stroke',
-                                fill = payload->'features'->0->'properties'->>'fill',
-                                geom = CASE WHEN (payload->'features'->0->'geometry') IS NULL OR (payload->'features'->0->'geometry') = 'null' THEN geom ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((payload->'features'->0->'geometry')::text)),4326) END
-                            WHERE (payload->'features'->0->'properties') IS NOT NULL;
-                            """
-                        )
-                    except Exception:
-                        pass
-
-                    # Ensure DN matches the stored properties (do NOT append suffixes)
-                    try:
-                        conn.exec_driver_sql(
-                            """
-                            UPDATE convective_outlooks SET dn = COALESCE(NULLIF(properties->>'DN',''), COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),''),'NA'));
-                            UPDATE fire_outlooks SET dn = COALESCE(NULLIF(properties->>'DN',''), COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),''),'NA'));
-                            -- Recompute feature_index by finding the ordinal of the matching properties JSON in the payload features
-                            UPDATE convective_outlooks c SET feature_index = sub.idx
-                            FROM (
-                                SELECT c2.id,
-                                    (SELECT (fe.ord - 1)
-                                     FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
-                                     WHERE fe.elem->'properties' = c2.properties
-                                     LIMIT 1) AS idx
-                                FROM convective_outlooks c2
-                                WHERE c2.feature_index IS NULL OR c2.feature_index = 0
-                            ) sub
-                            WHERE c.id = sub.id AND sub.idx IS NOT NULL;
-
-                            UPDATE fire_outlooks c SET feature_index = sub.idx
-                            FROM (
-                                SELECT c2.id,
-                                    (SELECT (fe.ord - 1)
-                                     FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
-                                     WHERE fe.elem->'properties' = c2.properties
-                                     LIMIT 1) AS idx
-                                FROM fire_outlooks c2
-                                WHERE c2.feature_index IS NULL OR c2.feature_index = 0
-                            ) sub
-                            WHERE c.id = sub.id AND sub.idx IS NOT NULL;
-
-                            -- fallback: ensure no NULLs remain
-                            UPDATE convective_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
-                            UPDATE fire_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
-                            """
-                        )
-                    except Exception:
-                        pass
-
-                    # Additional fixes: clean DN suffixes (eg. '-<id>') introduced earlier,
-                    # and recompute feature_index by matching properties/DN to payload features.
-                    try:
-                        conn.exec_driver_sql(
-                            """
-                            -- Remove appended -<id> suffixes from dn if present
-                            UPDATE convective_outlooks SET dn = regexp_replace(dn, '-[0-9]+$','') WHERE dn ~ '-[0-9]+$';
-                            UPDATE fire_outlooks SET dn = regexp_replace(dn, '-[0-9]+$','') WHERE dn ~ '-[0-9]+$';
-
-                            -- Recompute feature_index by matching properties JSON or DN within the payload features
-                            UPDATE convective_outlooks c SET feature_index = sub.idx
-                            FROM (
-                                SELECT c2.id,
-                                    (SELECT (fe.ord - 1)
-                                     FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
-                                     WHERE (fe.elem->'properties') IS NOT NULL
-                                         AND ((fe.elem->'properties') = c2.properties OR (fe.elem->'properties'->>'DN') = c2.properties->>'DN')
-                                     LIMIT 1) AS idx
-                                FROM convective_outlooks c2
-                                WHERE c2.feature_index IS NULL
-                            ) sub
-                            WHERE c.id = sub.id AND sub.idx IS NOT NULL;
-
-                            UPDATE fire_outlooks c SET feature_index = sub.idx
-                            FROM (
-                                SELECT c2.id,
-                                    (SELECT (fe.ord - 1)
-                                     FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
-                                     WHERE (fe.elem->'properties') IS NOT NULL
-                                         AND ((fe.elem->'properties') = c2.properties OR (fe.elem->'properties'->>'DN') = c2.properties->>'DN')
-                                     LIMIT 1) AS idx
-                                FROM fire_outlooks c2
-                                WHERE c2.feature_index IS NULL
-                            ) sub
-                            WHERE c.id = sub.id AND sub.idx IS NOT NULL;
-
-                            -- fallback: set any remaining NULL indices to 0
-                            UPDATE convective_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
-                            UPDATE fire_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
-                            """
-                        )
-                    except Exception:
-                        pass
-                except Exception:
-                    # If the DB user cannot create extensions or types, ignore and continue
-                    pass
-    except Exception:
-        pass
-
-    # Drop the `sender` column if present (we no longer persist it separately)
+    from .migrations import migrate
     try:
-        with engine.connect() as conn:
-            try:
-                conn.execute(text("ALTER TABLE alerts DROP COLUMN IF EXISTS sender;"))
-            except Exception:
-                pass
-            conn.commit()
-    except Exception:
-        pass
+        migrate(engine)
+    except Exception as e:
+        # Never serve or ingest against a half-migrated schema; the container
+        # restarts and retries the pending migrations
+        print(f"init_db: migrations failed: {e}")
+        raise
@@ -0,0 +1,164 @@
+"""Alert enrichment from the seeded `alert_types` and `alert_keywords` tables.
+
+The lookup tables are small and change rarely, so they are loaded once into
+memory: an exact-match dict for `event` -> emoji and an Aho-Corasick automaton
+for keyword matching. A cheap signature query detects table changes and
+triggers a reload (checked at most every `ENRICH_RELOAD_SECONDS`).
+"""
+
+import os
+import time
+from collections import deque
+
+from sqlalchemy import text
+
+
+RELOAD_SECONDS = int(os.getenv('ENRICH_RELOAD_SECONDS', '60'))
+
+SIGNATURE_SQL = text(
+    """
+    SELECT
+      (SELECT md5(coalesce(string_agg(type_name || '|' || coalesce(emoji, ''), ',' ORDER BY type_name), ''))
+         FROM alert_types) AS types_sig,
+      (SELECT md5(coalesce(string_agg(keyword || '|' || coalesce(emoji, '') || '|' || coalesce(color, ''), ',' ORDER BY keyword), ''))
+         FROM alert_keywords) AS keywords_sig
+    """
+)
+
+
+class KeywordMatcher:
+    """Aho-Corasick multi-pattern matcher (case-insensitive, whole words only)."""
+
+    def __init__(self, keywords):
+        # goto transitions, failure links and outputs (keyword indexes) per state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._keywords = []
+        for kw in keywords:
+            if kw:
+                self._add(kw)
+        self._build()
+
+    def _add(self, keyword):
+        idx = len(self._keywords)
+        self._keywords.append(keyword)
+        state = 0
+        for ch in keyword.casefold():
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(idx)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, haystack):
+        """Return matched keywords in order of first occurrence (deduplicated)."""
+        if not haystack or not self._keywords:
+            return []
+        text_cf = haystack.casefold()
+        found = []
+        seen = set()
+        state = 0
+        for pos, ch in enumerate(text_cf):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for idx in self._out[state]:
+                if idx in seen:
+                    continue
+                start = pos - len(self._keywords[idx].casefold()) + 1
+                end = pos + 1
+                # Only accept whole-word matches ("Test" must not match "Contest")
+                if start > 0 and text_cf[start - 1].isalnum():
+                    continue
+                if end < len(text_cf) and text_cf[end].isalnum():
+                    continue
+                seen.add(idx)
+                found.append((start, self._keywords[idx]))
+        found.sort(key=lambda t: t[0])
+        return [kw for _, kw in found]
+
+
+class Enricher:
+    """In-memory view of the lookup tables used to enrich alerts at ingest."""
+
+    def __init__(self, types=None, keywords=None, signature=None):
+        self.type_emojis = dict(types or {})
+        self.keywords = dict(keywords or {})
+        self.signature = signature
+        self.matcher = KeywordMatcher(self.keywords.keys())
+
+    def enrich(self, properties):
+        """Return the enrichment columns for an alert's `properties` dict."""
+        event = properties.get('event')
+        type_emoji = self.type_emojis.get(event.strip()) if isinstance(event, str) else None
+
+        # Match keywords against the event name and headline
+        haystack = ' \n'.join([str(properties.get(k)) for k in ('event', 'headline') if properties.get(k)])
+        matched = self.matcher.find(haystack)
+        colors = []
+        for kw in matched:
+            color = self.keywords[kw].get('color')
+            if color and color not in colors:
+                colors.append(color)
+        return {
+            'type_emoji': type_emoji,
+            'keywords': matched,
+            'keyword_colors': colors,
+        }
+
+
+_enricher = Enricher()
+_last_check = 0.0
+
+
+def _load(conn, signature):
+    types = {}
+    keywords = {}
+    for r in conn.execute(text("SELECT type_name, emoji FROM alert_types")):
+        if r.type_name:
+            types[r.type_name.strip()] = r.emoji
+    for r in conn.execute(text("SELECT keyword, emoji, color FROM alert_keywords")):
+        if r.keyword:
+            keywords[r.keyword] = {'emoji': r.emoji, 'color': r.color}
+    return Enricher(types, keywords, signature)
+
+
+def get_enricher(conn):
+    """Return the current Enricher, reloading it if the lookup tables changed.
+
+    `conn` may be a Session or Connection. Failures (e.g. the seed tables are
+    missing) keep the previously loaded maps.
+    """
+    global _enricher, _last_check
+    now = time.monotonic()
+    if _last_check and now - _last_check < RELOAD_SECONDS:
+        return _enricher
+    _last_check = now
+    try:
+        row = conn.execute(SIGNATURE_SQL).first()
+        signature = (row.types_sig, row.keywords_sig)
+        if signature != _enricher.signature:
+            _enricher = _load(conn, signature)
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+    return _enricher
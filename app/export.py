@@ -0,0 +1,327 @@
+"""Columnar exports of alerts and SPC outlooks (Arrow IPC / GeoParquet).
+
+Rows are read through a server-side cursor in batches of `EXPORT_BATCH_ROWS`
+and written as typed Arrow record batches, so memory stays flat however
+large the range. Geometry is WKB (`ST_AsBinary`); Parquet files carry
+GeoParquet `geo` metadata so GeoPandas / DuckDB spatial read them as-is.
+
+    GET /export/alerts?format=parquet&since=2026-01-01&until=2026-02-01&columns=id,sent,event,geometry
+    GET /export/outlooks?format=arrow&product=day1otlk_cat_nolyr&since=2026-04-01
+
+    python -m app.export alerts --since 2026-01-01 --until 2026-02-01 --out alerts_2026_01.parquet
+    python -m app.export outlooks --format arrow --out outlooks.arrow
+
+Requires `pyarrow` (in requirements.txt; guarded so the app still starts
+without it).
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # e.g. a local env without it; exports are unavailable
+    pa = None
+    pq = None
+
+
+BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '10000'))
+
+FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _jsonb_text_array(col):
+    return f"CASE WHEN jsonb_typeof({col}) = 'array' THEN ARRAY(SELECT jsonb_array_elements_text({col})) END"
+
+
+# name -> (SQL expression, column type); types map to Arrow in `_arrow_type`
+ALERT_COLUMNS = {
+    'id': ('id', 'string'),
+    'sent': ('sent', 'timestamp'),
+    'effective': ('effective', 'timestamp'),
+    'onset': ('onset', 'timestamp'),
+    'expires': ('expires', 'timestamp'),
+    'ends': ('ends', 'timestamp'),
+    'status': ('status', 'string'),
+    'message_type': ('message_type', 'string'),
+    'category': ('category', 'string'),
+    'severity': ('severity', 'string'),
+    'certainty': ('certainty', 'string'),
+    'urgency': ('urgency', 'string'),
+    'event': ('event', 'string'),
+    'sender_name': ('sender_name', 'string'),
+    'headline': ('headline', 'string'),
+    'area_desc': ('area_desc', 'string'),
+    'description': ('description', 'string'),
+    'instruction': ('instruction', 'string'),
+    'response': ('response', 'string'),
+    'geocode_ugc': (_jsonb_text_array('geocode_ugc'), 'list'),
+    'geocode_same': (_jsonb_text_array('geocode_same'), 'list'),
+    'affected_zones': (_jsonb_text_array('affected_zones'), 'list'),
+    'parameters_vtec': ('parameters_vtec', 'string'),
+    'parameters_nwsheadline': ('parameters_nwsheadline', 'string'),
+    'parameters_maxhailsize': ('CAST(parameters_maxhailsize AS double precision)', 'float'),
+    'parameters_maxwindgust': ('parameters_maxwindgust', 'string'),
+    'parameters_tornadodetection': ('parameters_tornadodetection', 'string'),
+    'parameters_awipsidentifier': ('parameters_awipsidentifier', 'string'),
+    'parameters_wmoidentifier': ('parameters_wmoidentifier', 'string'),
+    'type_emoji': ('type_emoji', 'string'),
+    'keywords': (_jsonb_text_array('keywords'), 'list'),
+    'parameters': ('CAST(parameters AS text)', 'json'),
+    'references': ('CAST("references" AS text)', 'json'),
+    'properties': ('CAST(alert_properties(alerts) AS text)', 'json'),
+    'geometry': ('ST_AsBinary(geometry)', 'wkb'),
+}
+# Full raw properties are opt-in (`columns=...,properties`)
+ALERT_DEFAULT = [c for c in ALERT_COLUMNS if c != 'properties']
+
+OUTLOOK_COLUMNS = {
+    'kind': ('kind', 'string'),
+    'id': ('id', 'int'),
+    'product': ('product', 'string'),
+    'issue': ('issue', 'timestamp'),
+    'valid': ('valid', 'timestamp'),
+    'expire': ('expire', 'timestamp'),
+    'feature_index': ('feature_index', 'int'),
+    'dn': ('dn', 'string'),
+    'label': ('label', 'string'),
+    'label2': ('label2', 'string'),
+    'forecaster': ('forecaster', 'string'),
+    'stroke': ('stroke', 'string'),
+    'fill': ('fill', 'string'),
+    'created_at': ('created_at', 'timestamp'),
+    'properties': ('CAST(properties AS text)', 'json'),
+    'geometry': ('ST_AsBinary(geom)', 'wkb'),
+}
+OUTLOOK_DEFAULT = [c for c in OUTLOOK_COLUMNS if c != 'properties']
+# Shared by both outlook tables (which differ in generated / bookkeeping columns)
+OUTLOOK_SOURCE_COLUMNS = (
+    "id, product, issue, valid, expire, feature_index, dn, label, label2, forecaster, stroke, fill, "
+    "created_at, properties, geom"
+)
+
+
+def available():
+    return pa is not None
+
+
+def _arrow_type(kind):
+    return {
+        'string': pa.string(),
+        'json': pa.large_string(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'float': pa.float64(),
+        'int': pa.int64(),
+        'list': pa.list_(pa.string()),
+        'wkb': pa.binary(),
+    }[kind]
+
+
+def select_columns(spec, default, requested):
+    """Validated column names in request order (default set if none requested)."""
+    if not requested:
+        return list(default)
+    unknown = [c for c in requested if c not in spec]
+    if unknown:
+        raise ValueError(f"unknown columns: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def schema(spec, columns):
+    fields = [pa.field(c, _arrow_type(spec[c][1])) for c in columns]
+    metadata = None
+    if 'geometry' in columns:
+        # GeoParquet 1.0 (no crs = OGC:CRS84, i.e. lon/lat WGS84 as stored)
+        metadata = {b'geo': json.dumps({
+            "version": "1.0.0",
+            "primary_column": "geometry",
+            "columns": {"geometry": {"encoding": "WKB", "geometry_types": []}},
+        }).encode('utf-8')}
+    return pa.schema(fields, metadata=metadata)
+
+
+def alerts_query(columns, since=None, until=None, events=None):
+    where, params = [], {}
+    if since is not None:
+        where.append("sent >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("sent < :until")
+        params["until"] = until
+    if events:
+        where.append("event = ANY(:events)")
+        params["events"] = events
+    sql = "SELECT " + ", ".join(f'{ALERT_COLUMNS[c][0]} AS "{c}"' for c in columns) + " FROM alerts"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return text(sql + " ORDER BY sent, id"), params
+
+
+def outlooks_query(columns, since=None, until=None, products=None, kind=None):
+    where, params = [], {}
+    if since is not None:
+        where.append("issue >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("issue < :until")
+        params["until"] = until
+    if products:
+        where.append("product = ANY(:products)")
+        params["products"] = products
+    parts = []
+    for k, table in (('convective', 'convective_outlooks'), ('fire', 'fire_outlooks')):
+        if kind and kind != k:
+            continue
+        part = f"SELECT '{k}' AS kind, {OUTLOOK_SOURCE_COLUMNS} FROM {table}"
+        if where:
+            part += " WHERE " + " AND ".join(where)
+        parts.append(part)
+    cols = ", ".join(f'{OUTLOOK_COLUMNS[c][0]} AS "{c}"' for c in columns)
+    sql = f"SELECT {cols} FROM ({' UNION ALL '.join(parts)}) o ORDER BY o.issue, o.product, o.feature_index"
+    return text(sql), params
+
+
+def record_batch(schema_, rows):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema_]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(list(values), type=field.type) for values, field in zip(columns, schema_)],
+        schema=schema_,
+    )
+
+
+class _ChunkSink:
+    """Write-only file object collecting output so it can be streamed out per batch."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        out = b"".join(self.chunks)
+        self.chunks = []
+        return out
+
+
+class BatchWriter:
+    """Encodes record batches as an Arrow IPC stream or Parquet, yielding bytes as they are produced."""
+
+    def __init__(self, schema_, fmt, sink=None):
+        self.schema = schema_
+        self.sink = sink or _ChunkSink()
+        out = pa.PythonFile(self.sink, mode='w')
+        if fmt == 'parquet':
+            self.writer = pq.ParquetWriter(out, schema_, compression='zstd')
+        else:
+            self.writer = pa.ipc.new_stream(out, schema_)
+        self.fmt = fmt
+
+    def write_rows(self, rows):
+        batch = record_batch(self.schema, rows)
+        if self.fmt == 'parquet':
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        return self._drain()
+
+    def close(self):
+        self.writer.close()
+        return self._drain()
+
+    def _drain(self):
+        return self.sink.drain() if isinstance(self.sink, _ChunkSink) else b""
+
+
+async def stream_export(engine, query, params, schema_, fmt, batch_rows=BATCH_ROWS):
+    """Async generator of encoded bytes, reading `query` through a server-side cursor."""
+    writer = BatchWriter(schema_, fmt)
+    async with engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=batch_rows), params)
+        async for rows in result.partitions(batch_rows):
+            chunk = writer.write_rows([tuple(r) for r in rows])
+            if chunk:
+                yield chunk
+    tail = writer.close()
+    if tail:
+        yield tail
+
+
+def export_to_file(engine, query, params, schema_, fmt, path, batch_rows=BATCH_ROWS):
+    """Write an export to `path` (sync, for the CLI). Returns rows written."""
+    total = 0
+    with open(path, 'wb') as fh:
+        writer = BatchWriter(schema_, fmt, sink=fh)
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(query, params)
+            for rows in result.partitions(batch_rows):
+                writer.write_rows([tuple(r) for r in rows])
+                total += len(rows)
+        writer.close()
+    return total
+
+
+def _parse_time(value):
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export alerts or SPC outlooks as Arrow IPC / GeoParquet")
+    parser.add_argument('dataset', choices=('alerts', 'outlooks'))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+    parser.add_argument('--since', type=_parse_time, default=None, help="ISO time (UTC if no offset); alerts: sent, outlooks: issue")
+    parser.add_argument('--until', type=_parse_time, default=None)
+    parser.add_argument('--columns', type=_csv, default=None, help="Comma-separated column names")
+    parser.add_argument('--event', type=_csv, default=None, help="Alerts: comma-separated event names")
+    parser.add_argument('--product', type=_csv, default=None, help="Outlooks: comma-separated products")
+    parser.add_argument('--kind', choices=('convective', 'fire'), default=None)
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit("pyarrow is not installed (pip install pyarrow)")
+    from .db import read_engine
+    if args.dataset == 'alerts':
+        columns = select_columns(ALERT_COLUMNS, ALERT_DEFAULT, args.columns)
+        query, params = alerts_query(columns, args.since, args.until, args.event)
+        schema_ = schema(ALERT_COLUMNS, columns)
+    else:
+        columns = select_columns(OUTLOOK_COLUMNS, OUTLOOK_DEFAULT, args.columns)
+        query, params = outlooks_query(columns, args.since, args.until, args.product, args.kind)
+        schema_ = schema(OUTLOOK_COLUMNS, columns)
+    total = export_to_file(read_engine, query, params, schema_, args.format, args.out)
+    print(f"export: wrote {total} {args.dataset} rows to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
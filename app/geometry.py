@@ -0,0 +1,99 @@
+"""Multi-resolution geometry tiers for alerts and SPC outlooks.
+
+Each geometry column `<g>` has stored generated companions, computed by
+PostgreSQL at write time:
+
+- `<g>_bbox`: `ST_Envelope(<g>)` (GiST-indexed) for cheap map-window filters;
+- `<g>_s1`, `<g>_s2`, `<g>_s3`: `ST_SimplifyPreserveTopology` at
+  `TIER_TOLERANCES` degrees, made valid with `ST_MakeValid`.
+
+Writers wrap incoming geometries in `ST_MakeValid` (see `make_valid`). Read
+endpoints pick a tier from a slippy-map `zoom` or an explicit `tolerance`
+(degrees) with `tier_for`.
+"""
+
+from sqlalchemy import func
+
+
+# Tier -> simplification tolerance in degrees (tier 0 is the full geometry)
+TIER_TOLERANCES = {1: 0.001, 2: 0.01, 3: 0.05}
+
+# Coordinate precision worth sending for each simplified tier (tier 0 keeps
+# ST_AsGeoJSON's default)
+GEOJSON_DIGITS = {1: 5, 2: 4, 3: 3}
+
+# (table, geometry column) pairs that carry tiers
+TIERED_COLUMNS = [
+    ('alerts', 'geometry'),
+    ('active_alerts', 'geometry'),
+    ('convective_outlooks', 'geom'),
+    ('fire_outlooks', 'geom'),
+]
+
+
+def bbox_sql(column):
+    return f"ST_Envelope({column})"
+
+
+def tier_sql(column, tier):
+    return f"ST_MakeValid(ST_SimplifyPreserveTopology({column}, {TIER_TOLERANCES[tier]}))"
+
+
+def make_valid(expr):
+    """SQL expression that repairs an invalid geometry (no-op for valid ones)."""
+    return func.ST_MakeValid(expr)
+
+
+def tier_for(zoom=None, tolerance=None):
+    """Coarsest tier whose simplification stays below one map pixel / `tolerance`.
+
+    `zoom` is a web-mercator zoom level (one 256px tile spans the world at 0);
+    `tolerance` is in degrees. With neither, the full geometry (tier 0) is used.
+    """
+    if tolerance is None and zoom is not None:
+        tolerance = 360.0 / (256 * 2 ** max(0, min(int(zoom), 22)))
+    if tolerance is None or tolerance <= 0:
+        return 0
+    best = 0
+    for tier, tol in sorted(TIER_TOLERANCES.items()):
+        if tol <= tolerance:
+            best = tier
+    return best
+
+
+def tier_column(table, column, tier):
+    """The column of `table` holding `column` at `tier`."""
+    return table.c[column] if tier == 0 else table.c[f"{column}_s{tier}"]
+
+
+def as_geojson(table, column, tier):
+    """`ST_AsGeoJSON` of the tier column, rounded to the tier's precision."""
+    if tier in GEOJSON_DIGITS:
+        return func.ST_AsGeoJSON(tier_column(table, column, tier), GEOJSON_DIGITS[tier])
+    return func.ST_AsGeoJSON(tier_column(table, column, tier))
+
+
+def geojson_sql(column, tier):
+    """SQL `ST_AsGeoJSON` of `column` (already at `tier`), rounded like `as_geojson`."""
+    if tier in GEOJSON_DIGITS:
+        return f"ST_AsGeoJSON({column}, {GEOJSON_DIGITS[tier]})"
+    return f"ST_AsGeoJSON({column})"
+
+
+def parse_bbox(value):
+    """Parse `minx,miny,maxx,maxy` into a 4-tuple of floats (None if empty/invalid)."""
+    if not value:
+        return None
+    try:
+        parts = [float(p) for p in value.split(',')]
+    except ValueError:
+        return None
+    if len(parts) != 4:
+        return None
+    return tuple(parts)
+
+
+def bbox_filter(table, column, bbox):
+    """Index-assisted intersection of the `<column>_bbox` with a lon/lat box."""
+    envelope = func.ST_MakeEnvelope(bbox[0], bbox[1], bbox[2], bbox[3], 4326)
+    return table.c[f"{column}_bbox"].op('&&')(envelope)
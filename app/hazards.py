@@ -0,0 +1,160 @@
+"""Dissolved national hazard layers.
+
+`hazard_layers` holds one precomputed geometry per active NWS event type
+(`source` 'nws', `name` the event) and per SPC product category (`source`
+'spc', `name` the product, `category` its LABEL / DN): the `ST_Union` of the
+member polygons, simplified like geometry tier `HAZARD_LAYER_TIER` (see
+app.geometry).
+
+- ingest rebuilds only the event types whose `active_alerts` membership
+  changed in that poll (new, updated, cancelled, superseded or swept
+  alerts);
+- spc_ingest rebuilds a product's categories after storing its latest
+  issuance.
+
+Every rebuild bumps the `hazard_layers` version counter (app.versions) in
+its transaction. `HazardCache` serves the layers as prebuilt GeoJSON bodies
+with an ETag, reloading only when that version changes. Alerts without a
+geometry (zone-only messages) are counted in `members` but add no area.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from sqlalchemy import text
+
+from .geometry import geojson_sql, tier_sql
+from .versions import VERSION_SQL, bump
+
+
+LAYER_TIER = int(os.getenv('HAZARD_LAYER_TIER', '2'))
+VERSION_TTL_SECONDS = float(os.getenv('HAZARD_VERSION_TTL_SECONDS', '5'))
+
+OUTLOOK_TABLES = {'convective': 'convective_outlooks', 'fire': 'fire_outlooks'}
+
+VERSION_NAME = 'hazard_layers'
+
+
+def _dissolve_sql(column):
+    """Polygons of `column` unioned across the group, then simplified for display."""
+    union = f"ST_Union(ST_CollectionExtract(ST_MakeValid({column}), 3))"
+    return f"ST_Multi(ST_CollectionExtract({tier_sql(union, LAYER_TIER) if LAYER_TIER else union}, 3))"
+
+
+ALERT_LAYERS_SQL = f"""
+    INSERT INTO hazard_layers (source, name, category, members, geom, updated_at)
+    SELECT 'nws', event, '', count(*), {_dissolve_sql('geometry')}, now()
+    FROM active_alerts
+    WHERE event = ANY(:events) AND coalesce(ends, expires, 'infinity') > now()
+    GROUP BY event
+"""
+
+
+def _outlook_layers_sql(kind):
+    return f"""
+        INSERT INTO hazard_layers (source, name, category, members, geom, updated_at)
+        SELECT 'spc', o.product, coalesce(o.label, o.dn, 'NA'), count(*), {_dissolve_sql('o.geom')}, now()
+        FROM {OUTLOOK_TABLES[kind]} o JOIN spc_product_latest l ON l.product = o.product AND l.issue = o.issue
+        WHERE o.product = ANY(:products)
+        GROUP BY o.product, coalesce(o.label, o.dn, 'NA')
+    """
+
+
+def refresh_alert_layers(conn, events):
+    """Rebuild the layers of `events` from `active_alerts` (caller commits). Returns layers written."""
+    events = sorted(e for e in events if e)
+    if not events:
+        return 0
+    conn.execute(text("DELETE FROM hazard_layers WHERE source = 'nws' AND name = ANY(:events)"), {"events": events})
+    written = conn.execute(text(ALERT_LAYERS_SQL), {"events": events}).rowcount
+    bump(conn, VERSION_NAME)
+    return written
+
+
+def refresh_outlook_layers(conn, kind, products):
+    """Rebuild the category layers of SPC `products` from their latest issuance. Returns layers written."""
+    products = sorted(products)
+    if not products:
+        return 0
+    conn.execute(text("DELETE FROM hazard_layers WHERE source = 'spc' AND name = ANY(:products)"), {"products": products})
+    written = conn.execute(text(_outlook_layers_sql(kind)), {"products": products}).rowcount
+    bump(conn, VERSION_NAME)
+    return written
+
+
+def rebuild_all(conn):
+    """Rebuild every layer (initial build / repair)."""
+    conn.execute(text("DELETE FROM hazard_layers"))
+    bump(conn, VERSION_NAME)
+    events = conn.execute(text("SELECT DISTINCT event FROM active_alerts")).scalars().all()
+    refresh_alert_layers(conn, events)
+    for kind in OUTLOOK_TABLES:
+        products = conn.execute(text("SELECT product FROM spc_product_latest WHERE kind = :k"), {"k": kind}).scalars().all()
+        refresh_outlook_layers(conn, kind, products)
+
+
+LAYERS_SQL = text(
+    f"""
+    SELECT source, name, category, members, updated_at, {geojson_sql('geom', LAYER_TIER)} AS geometry
+    FROM hazard_layers
+    ORDER BY source, name, category
+    """
+)
+
+
+class HazardCache:
+    """Prebuilt GeoJSON bodies of the hazard layers, valid for one table version."""
+
+    def __init__(self, ttl=VERSION_TTL_SECONDS):
+        self._ttl = ttl
+        self._lock = asyncio.Lock()
+        self._checked = 0.0
+        self._version = None
+        self._layers = []
+        self._bodies = {}
+
+    async def _refresh(self, db):
+        if time.monotonic() - self._checked < self._ttl:
+            return
+        async with self._lock:
+            if time.monotonic() - self._checked < self._ttl:
+                return
+            version = (await db.execute(VERSION_SQL, {"name": VERSION_NAME})).scalar()
+            if version != self._version:
+                rows = (await db.execute(LAYERS_SQL)).all()
+                self._layers = [
+                    {
+                        "type": "Feature",
+                        "geometry": json.loads(r.geometry) if r.geometry else None,
+                        "properties": {
+                            "source": r.source,
+                            "name": r.name,
+                            "category": r.category or None,
+                            "members": r.members,
+                            "updatedAt": r.updated_at.isoformat() if r.updated_at else None,
+                        },
+                    }
+                    for r in rows
+                ]
+                self._bodies.clear()
+                self._version = version
+            self._checked = time.monotonic()
+
+    async def body(self, db, source=None, names=None):
+        """(JSON bytes, ETag) of the FeatureCollection of matching layers."""
+        await self._refresh(db)
+        key = (source, tuple(sorted(names)) if names else None)
+        if key not in self._bodies:
+            if len(self._bodies) >= 256:
+                self._bodies.clear()
+            features = [
+                f for f in self._layers
+                if (source is None or f["properties"]["source"] == source)
+                and (not names or f["properties"]["name"] in names)
+            ]
+            body = json.dumps({"type": "FeatureCollection", "features": features}, separators=(',', ':')).encode()
+            self._bodies[key] = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        return self._bodies[key]
@@ -1,11 +1,24 @@
 import os
 import time
 import json
+from datetime import datetime, timezone
 import requests
-from .db import SessionLocal
+from .db import SessionLocal, engine
 from .models import Alert
+from .enrich import get_enricher
+from .vtec import upsert_vtec_events
+from .active import sync_active_alert, sweep_expired, parse_iso
+from .partitions import maintain as maintain_partitions, stored_sent
+from .leader import start_election
+from .geometry import make_valid
+from .overlap import refresh_alert_overlaps
+from .polling import AdaptiveInterval, cache_max_age, is_urgent, retry_after
+from .properties import stored_properties
+from .rollups import record_alert
+from .hazards import refresh_alert_layers
+from . import archive, metrics
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import func
+from sqlalchemy import func, literal_column
 
 NWS_URL = "https://api.weather.gov/alerts"
 
@@ -20,35 +33,81 @@ def _normalize_id(aid: str) -> str:
     return aid
 
 
-def fetch_and_store(limit=100):
+def fetch_and_store(limit=100, validators=None):
     """Fetch alerts from NWS and upsert into Postgres alerts table.
 
     - Strip the 'https://api.weather.gov/alerts/' prefix from IDs.
     - Convert GeoJSON geometry to PostGIS geometry using ST_GeomFromGeoJSON
       and only update geometry on conflict when a geometry is provided.
+    - With a `validators` dict, send the previous ETag / Last-Modified and
+      skip processing on 304 (the dict is updated in place).
+
+    Returns a poll result for `app.polling.AdaptiveInterval`.
     """
-    resp = requests.get(NWS_URL, params={"limit": limit}, headers={"User-Agent": "weather-alert-router/1.0"})
-    resp.raise_for_status()
-    data = resp.json()
-    features = data.get('features', [])
-    db = SessionLocal()
-    try:
-        _process_features(features, db)
-    finally:
-        db.close()
+    headers = {"User-Agent": "weather-alert-router/1.0"}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    with metrics.stage('nws', 'alerts', 'total'):
+        with metrics.stage('nws', 'alerts', 'fetch'):
+            resp = requests.get(NWS_URL, params={"limit": limit}, headers=headers, timeout=30)
+            resp.raise_for_status()
+        result = {
+            'status': resp.status_code,
+            'max_age': cache_max_age(resp.headers),
+            'retry_after': retry_after(resp.headers),
+        }
+        if resp.status_code == 304:
+            return result
+        if validators is not None:
+            validators['etag'] = resp.headers.get('ETag')
+            validators['last_modified'] = resp.headers.get('Last-Modified')
+        metrics.FETCH_BYTES.labels('nws', 'alerts').inc(len(resp.content))
+        archive.store(engine, 'nws', 'alerts', resp.url, resp.content)
+        with metrics.stage('nws', 'alerts', 'parse'):
+            data = resp.json()
+        features = data.get('features', [])
+        db = SessionLocal()
+        try:
+            with metrics.stage('nws', 'alerts', 'upsert'):
+                counts = _process_features(features, db)
+        finally:
+            db.close()
+    result.update(
+        updated=data.get('updated'),
+        changed=counts['inserted'] + counts['updated'],
+        urgent=counts['urgent'],
+        max_lag=counts['max_lag'],
+    )
+    return result
+
+
+def _sent_sort_key(feature):
+    sent = parse_iso((feature.get('properties') or {}).get('sent'))
+    return sent.timestamp() if sent else 0.0
 
 
 def _process_features(features, db):
     """Process a list of GeoJSON Feature objects and upsert them into DB.
 
     This centralizes the upsert logic so it can be used for live fetches
-    and loading example snapshots.
+    and loading example snapshots. Returns inserted/updated/skipped/failed
+    counts, plus new urgent alerts and the largest sent -> ingest lag (s).
     """
     table = Alert.__table__
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'urgent': 0, 'max_lag': None}
+    enricher = get_enricher(db)
+    # Event types whose active membership changed (their hazard layers are rebuilt)
+    changed_events = set()
+    # Oldest first, so updates/cancels are applied after the messages they reference
+    features = sorted(features, key=_sent_sort_key)
     for f in features:
         raw_id = f.get('id') or f.get('properties', {}).get('id')
         aid = _normalize_id(raw_id)
         if not aid:
+            counts['skipped'] += 1
             continue
         properties = f.get('properties') or {}
         geom = f.get('geometry')
@@ -56,10 +115,13 @@ def _process_features(features, db):
         geom_expr = None
         if geom:
             geom_json = json.dumps(geom)
-            geom_expr = func.ST_SetSRID(func.ST_GeomFromGeoJSON(geom_json), 4326)
+            geom_expr = make_valid(func.ST_SetSRID(func.ST_GeomFromGeoJSON(geom_json), 4326))
 
-        # Map first-level properties into individual columns when available
-        sent = properties.get('sent')
+        # Map first-level properties into individual columns when available.
+        # `sent` is the partition key, so it must never be NULL; without one,
+        # keep the stored row's so the upsert still matches on id.
+        sent = (properties.get('sent') or stored_sent(db, aid) or properties.get('effective')
+                or datetime.now(timezone.utc).isoformat())
         effective = properties.get('effective')
         onset = properties.get('onset')
         expires = properties.get('expires')
@@ -93,7 +155,8 @@ def _process_features(features, db):
 
         values = dict(
             id=aid,
-            properties=properties,
+            # Residual keys only in ALERTS_PROPERTIES_MODE=compact
+            properties=stored_properties(properties),
             sent=sent,
             effective=effective,
             onset=onset,
@@ -119,6 +182,7 @@ def _process_features(features, db):
             affected_zones=affected_zones,
             references=references,
         )
+        values.update(enricher.enrich(properties))
 
         if geom_expr is not None:
             values['geometry'] = geom_expr
@@ -183,10 +247,11 @@ def _process_features(features, db):
 
         # Build update dict; use excluded for columns so upsert updates fields
         update_dict = {c: getattr(stmt.excluded, c) for c in [
-            'properties', 'sent', 'effective', 'onset', 'expires', 'ends',
+            'properties', 'effective', 'onset', 'expires', 'ends',
             'status', 'message_type', 'category', 'severity', 'certainty', 'urgency',
             'event', 'sender_name', 'headline', 'area_desc', 'description',
-            'instruction', 'response', 'geocode', 'parameters', 'affected_zones', 'references'
+            'instruction', 'response', 'geocode', 'parameters', 'affected_zones', 'references',
+            'type_emoji', 'keywords', 'keyword_colors'
         ]}
         if geom_expr is not None:
             update_dict['geometry'] = stmt.excluded.geometry
@@ -207,14 +272,62 @@ def _process_features(features, db):
                     update_dict[col] = getattr(stmt.excluded, col)
 
         stmt = stmt.on_conflict_do_update(
-            index_elements=[table.c.id],
+            index_elements=[table.c.id, table.c.sent],
             set_=update_dict
-        )
+        ).returning(literal_column('(xmax = 0)').label('inserted'))
         try:
-            db.execute(stmt)
+            inserted = db.execute(stmt).scalar()
+            _derived(db, aid, 'vtec', upsert_vtec_events, db, aid, properties)
+            changed_events |= _derived(db, aid, 'active', sync_active_alert, db, values) or set()
+            _derived(db, aid, 'overlaps', refresh_alert_overlaps, db, aid, parse_iso(sent))
+            if inserted:
+                _derived(db, aid, 'rollups', record_alert, db, values)
             db.commit()
+            counts['inserted' if inserted else 'updated'] += 1
+            sent_at = parse_iso(sent)
+            metrics.observe_newest_sent(sent_at)
+            if inserted:
+                urgent = is_urgent(properties)
+                counts['urgent'] += urgent
+                if sent_at is not None:
+                    # Delay between NWS issuing the message and it landing here
+                    lag = max(0.0, time.time() - sent_at.timestamp())
+                    metrics.INGEST_LAG.labels('urgent' if urgent else 'other').observe(lag)
+                    counts['max_lag'] = max(lag, counts['max_lag'] or 0.0)
         except Exception:
             db.rollback()
+            counts['failed'] += 1
+    metrics.count_features('nws', 'alerts', counts['inserted'], counts['updated'], counts['skipped'], counts['failed'])
+    refresh_hazard_layers(db, changed_events)
+    return counts
+
+
+def _derived(db, aid, step, fn, *args):
+    """Run one derived-state update of a stored alert in a savepoint.
+
+    A failure must never cost us the alert row itself: it is rolled back,
+    logged and counted in `wxrouter_ingest_derived_failures_total{step}`.
+    """
+    try:
+        with db.begin_nested():
+            return fn(*args)
+    except Exception as e:
+        metrics.count_derived_failure(step)
+        print(f"ingest: {step} update failed for {aid}: {e}")
+        return None
+
+
+def refresh_hazard_layers(db, events):
+    """Rebuild the dissolved layers of `events` (best-effort)."""
+    if not events:
+        return
+    try:
+        with metrics.stage('nws', 'alerts', 'hazard_layers'):
+            refresh_alert_layers(db, events)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"ingest: hazard layer refresh failed: {e}")
 
 
 def load_example_and_store():
@@ -247,15 +360,32 @@ def load_example_and_store():
         db.close()
 
 
+def sweep_active_alerts():
+    """Remove expired rows from `active_alerts` (best-effort)."""
+    db = SessionLocal()
+    try:
+        refresh_hazard_layers(db, sweep_expired(db))
+    except Exception as e:
+        db.rollback()
+        print(f"ingest: active alert sweep failed: {e}")
+    finally:
+        db.close()
+
+
 def run_polling():
     """Run fetch loop. Configure with environment variables:
 
     - `POLL_ENABLED` (set to '1' to run continuously)
-    - `POLL_INTERVAL_SECONDS` (defaults to 300 seconds)
+    - `POLL_INTERVAL_SECONDS` (defaults to 300 seconds; the fixed interval
+      with `POLL_ADAPTIVE=0`, else the default `POLL_MAX_SECONDS`)
+    - `POLL_ADAPTIVE`, `POLL_MIN_SECONDS`, `POLL_MAX_SECONDS`, `POLL_BACKOFF`,
+      `POLL_JITTER`: adaptive interval (see app.polling)
     - `POLL_LIMIT` (number of records to request per fetch, default 100)
+    - `METRICS_PORT` (serve Prometheus metrics on this port; 0 = off)
+    - `LEADER_ELECTION` (default '1'): with several ingest replicas only the
+      elected leader polls; standbys take over if it dies (see app.leader)
     """
     poll_enabled = os.getenv('POLL_ENABLED', '0') in ('1', 'true', 'True')
-    interval = int(os.getenv('POLL_INTERVAL_SECONDS', '300'))
     limit = int(os.getenv('POLL_LIMIT', '100'))
 
     # Wait for the `app` service to become available before running ingest.
@@ -279,16 +409,48 @@ def run_polling():
         if not ok:
             print(f"ingest: app did not become ready within {timeout}s, continuing anyway")
 
+    metrics.start_server()
+    elector = start_election('nws_ingest')
+    if elector is not None and not elector.is_leader:
+        print("ingest: standing by; another instance is the leader")
+        elector.wait_for_leadership()
+
     # Optionally load example snapshot first (useful for dev/testing)
     load_example_and_store()
 
     # One-shot run against the live API
-    fetch_and_store(limit=limit)
+    validators = {}
+    result = poll_once(limit, validators)
 
     if poll_enabled:
+        scheduler = AdaptiveInterval()
         while True:
-            time.sleep(interval)
-            fetch_and_store(limit=limit)
+            delay = scheduler.next_delay(result)
+            metrics.POLL_INTERVAL.set(delay)
+            time.sleep(delay)
+            if elector is not None and not elector.is_leader:
+                print("ingest: lost leadership; standing by")
+                elector.wait_for_leadership()
+                validators.clear()
+            result = poll_once(limit, validators)
+
+
+def poll_once(limit, validators=None):
+    """One poll cycle: fetch/upsert, sweep expired active alerts, partition and archive upkeep."""
+    try:
+        result = fetch_and_store(limit=limit, validators=validators)
+        if result.get('changed'):
+            lag = f", max lag {result['max_lag']:.0f}s" if result.get('max_lag') is not None else ''
+            print(f"ingest: {result['changed']} changed ({result['urgent']} urgent){lag}")
+    except Exception as e:
+        metrics.FETCH_ERRORS.labels('nws', 'alerts').inc()
+        print(f"ingest: fetch failed: {e}")
+        response = getattr(e, 'response', None)
+        result = {'error': True, 'retry_after': retry_after(response.headers) if response is not None else None}
+    sweep_active_alerts()
+    maintain_partitions(engine)
+    archive.maintain(engine)
+    return result
 
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+"""Leader election for the ingest pollers using PostgreSQL advisory locks.
+
+Each poller process runs a `LeaderElector`: a background thread that holds
+a dedicated connection and tries `pg_try_advisory_lock` for its role. The
+instance holding the lock is the leader; everyone else is a standby. All
+instances write a heartbeat row to `worker_heartbeats` every
+`LEADER_HEARTBEAT_SECONDS`:
+
+- A leader that dies normally drops its connection, releasing the lock; a
+  standby takes over on its next heartbeat.
+- A leader whose heartbeat is older than `LEADER_TTL_SECONDS` (frozen
+  container, dead host with a half-open TCP connection) has its backend terminated by a
+  standby so the lock is released within seconds.
+"""
+
+import hashlib
+import os
+import socket
+import threading
+
+from sqlalchemy import text
+
+from .db import engine
+
+
+LEADER_ELECTION = os.getenv('LEADER_ELECTION', '1') in ('1', 'true', 'True')
+HEARTBEAT_SECONDS = float(os.getenv('LEADER_HEARTBEAT_SECONDS', '5'))
+TTL_SECONDS = float(os.getenv('LEADER_TTL_SECONDS', '20'))
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def lock_key(role):
+    """Stable signed 64-bit advisory lock key for a role name."""
+    digest = hashlib.sha256(f"weather-alert-router:{role}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+HEARTBEAT_SQL = text(
+    """
+    INSERT INTO worker_heartbeats (role, instance_id, hostname, pid, backend_pid, is_leader, started_at, last_seen)
+    VALUES (:role, :instance_id, :hostname, :pid, pg_backend_pid(), :is_leader, now(), now())
+    ON CONFLICT (role, instance_id) DO UPDATE
+      SET backend_pid = EXCLUDED.backend_pid,
+          is_leader = EXCLUDED.is_leader,
+          last_seen = EXCLUDED.last_seen
+    """
+)
+
+
+class LeaderElector:
+    """Background advisory-lock election for one role (e.g. 'nws_ingest')."""
+
+    def __init__(self, role, instance_id=INSTANCE_ID, heartbeat=HEARTBEAT_SECONDS, ttl=TTL_SECONDS):
+        self.role = role
+        self.instance_id = instance_id
+        self.key = lock_key(role)
+        self.heartbeat = heartbeat
+        self.ttl = ttl
+        self._conn = None
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return self._leader.is_set()
+
+    def start(self):
+        self._tick()
+        self._thread = threading.Thread(target=self._run, name=f"leader-{self.role}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat * 2)
+        self._release()
+
+    def wait_for_leadership(self, timeout=None):
+        """Block until this instance is the leader (or timeout). Returns is_leader."""
+        return self._leader.wait(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat):
+            self._tick()
+
+    def _tick(self):
+        try:
+            if self._conn is None:
+                self._try_acquire()
+            if self._conn is not None:
+                self._beat(self._conn)
+            else:
+                with engine.connect() as conn:
+                    self._beat(conn)
+                    conn.commit()
+                    self._evict_stale_leader(conn)
+                    conn.commit()
+        except Exception as e:
+            if self.is_leader:
+                print(f"leader[{self.role}]: lost leadership ({e})")
+            self._release(broken=True)
+
+    def _try_acquire(self):
+        conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.key}).scalar()
+        except Exception:
+            conn.invalidate()
+            conn.close()
+            raise
+        if got:
+            self._conn = conn
+            self._leader.set()
+            print(f"leader[{self.role}]: {self.instance_id} is now leader")
+        else:
+            conn.close()
+
+    def _beat(self, conn):
+        conn.execute(HEARTBEAT_SQL, {
+            "role": self.role,
+            "instance_id": self.instance_id,
+            "hostname": socket.gethostname(),
+            "pid": os.getpid(),
+            "is_leader": self._conn is not None,
+        })
+
+    def _evict_stale_leader(self, conn):
+        """Terminate the backend of a leader whose heartbeat stopped (frees its lock)."""
+        row = conn.execute(text(
+            """
+            SELECT instance_id, backend_pid FROM worker_heartbeats
+            WHERE role = :role AND is_leader AND last_seen < now() - make_interval(secs => :ttl)
+            ORDER BY last_seen DESC LIMIT 1
+            """
+        ), {"role": self.role, "ttl": self.ttl}).first()
+        if row is None:
+            return
+        holder = conn.execute(text(
+            """
+            SELECT pid FROM pg_locks
+            WHERE locktype = 'advisory' AND granted AND objsubid = 1
+              AND ((classid::bigint << 32) | objid::bigint) = (:k)::bigint
+            LIMIT 1
+            """
+        ), {"k": self.key}).scalar()
+        if holder is not None and holder == row.backend_pid:
+            print(f"leader[{self.role}]: evicting stale leader {row.instance_id} (backend {holder})")
+            conn.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": holder})
+        conn.execute(text(
+            "UPDATE worker_heartbeats SET is_leader = FALSE WHERE role = :role AND instance_id = :iid"
+        ), {"role": self.role, "iid": row.instance_id})
+
+    def _release(self, broken=False):
+        was_leader = self.is_leader
+        self._leader.clear()
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            if broken:
+                conn.invalidate()
+            else:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": self.key})
+        except Exception:
+            pass
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if was_leader and not broken:
+            print(f"leader[{self.role}]: {self.instance_id} released leadership")
+
+
+def start_election(role):
+    """Start an elector for `role`, or return None when `LEADER_ELECTION` is off."""
+    if not LEADER_ELECTION:
+        return None
+    return LeaderElector(role).start()
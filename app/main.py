@@ -1,111 +1,637 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Form
+from fastapi import FastAPI, Depends, HTTPException, Request, Form, Query
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
-from .db import init_db, SessionLocal
-from .models import Alert, ApiKey
+from .db import (
+    init_db, SessionLocal, AsyncReadSessionLocal, engine, async_engine, async_read_engine, get_read_db, pool_status,
+)
+from .models import (
+    Alert, ApiKey, VtecEvent, AlertOutlookOverlap, AlertRollupHourly, AlertStateRollupHourly, SpcDailyRollup,
+)
+from .vtec import INACTIVE_ACTIONS
+from .partitions import stored_sent
+from .active import ActiveSnapshot
+from .spc_risk import RiskCache
+from .hazards import HazardCache
+from .geometry import make_valid, tier_for, as_geojson, geojson_sql, parse_bbox, bbox_filter
 from .schemas import AlertIn, AlertOut, ApiKeyCreate
 from .auth import verify_api_key, verify_admin
+from .profiling import span, install as install_profiling
+from . import export, metrics, search
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
-from starlette.responses import RedirectResponse
+from starlette.responses import RedirectResponse, Response, StreamingResponse
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import func
+from sqlalchemy import func, literal_column, or_
+from typing import Optional
+from datetime import date, datetime, timedelta, timezone
 import json
 
 app = FastAPI(title="Weather Alert Router")
+# Server-Timing / slow-request profiling (no-op unless REQUEST_TIMING or REQUEST_PROFILE_MS is set)
+install_profiling(app, (engine, async_engine, async_read_engine))
+metrics.register_pool_collector()
+
+
+SPC_RUNS_SQL = """
+    SELECT r.id, r.scheduled_for, r.created_by, r.status, r.total, r.created_at, r.finished_at,
+           count(j.id) FILTER (WHERE j.status = 'succeeded') AS succeeded,
+           count(j.id) FILTER (WHERE j.status = 'failed') AS failed,
+           count(j.id) FILTER (WHERE j.status = 'queued') AS queued,
+           count(j.id) FILTER (WHERE j.status = 'running') AS running,
+           coalesce(sum(j.attempts), 0) AS attempts,
+           avg(j.fetch_ms) AS avg_fetch_ms,
+           max(j.fetch_ms) AS max_fetch_ms,
+           avg(j.store_ms) AS avg_store_ms,
+           sum(j.features) AS features,
+           sum(j.bytes) AS bytes
+    FROM spc_runs r LEFT JOIN spc_jobs j ON j.run_id = r.id
+    {where}
+    GROUP BY r.id
+    ORDER BY r.id DESC
+    LIMIT :limit
+"""
+
+
+def _spc_run_to_dict(r):
+    return {
+        "id": r.id,
+        "scheduledFor": r.scheduled_for,
+        "createdBy": r.created_by,
+        "status": r.status,
+        "total": r.total,
+        "succeeded": r.succeeded,
+        "failed": r.failed,
+        "queued": r.queued,
+        "running": r.running,
+        "attempts": r.attempts,
+        "avgFetchMs": round(float(r.avg_fetch_ms), 1) if r.avg_fetch_ms is not None else None,
+        "maxFetchMs": r.max_fetch_ms,
+        "avgStoreMs": round(float(r.avg_store_ms), 1) if r.avg_store_ms is not None else None,
+        "features": r.features,
+        "bytes": r.bytes,
+        "createdAt": r.created_at,
+        "finishedAt": r.finished_at,
+    }
 
 
 @app.get("/spc_status")
-def spc_status():
-    db = SessionLocal()
+async def spc_status(db: AsyncSession = Depends(get_read_db)):
+    try:
+        row = (await db.execute(text("SELECT source, last_run, last_success, convective_count, fire_count, message, updated_at FROM spc_ingest_status WHERE source='spc' LIMIT 1"))).first()
+    except Exception:
+        return {"status": "unknown", "message": "spc_ingest_status table not present"}
+    try:
+        run = (await db.execute(text(SPC_RUNS_SQL.format(where="")), {"limit": 1})).first()
+    except Exception:
+        await db.rollback()
+        run = None
+    latest_run = _spc_run_to_dict(run) if run is not None else None
+    if not row:
+        return {"status": "no-data", "latest_run": latest_run}
+    return {
+        "source": row.source,
+        "last_run": row.last_run,
+        "last_success": row.last_success,
+        "convective_count": row.convective_count,
+        "fire_count": row.fire_count,
+        "message": row.message,
+        "updated_at": row.updated_at,
+        "latest_run": latest_run,
+    }
+
+
+@app.get("/spc/runs", response_class=JSONResponse)
+async def list_spc_runs(limit: int = 24, db: AsyncSession = Depends(get_read_db)):
+    """Recent SPC fetch runs with per-run job aggregates."""
+    rows = (await db.execute(text(SPC_RUNS_SQL.format(where="")), {"limit": max(1, min(limit, 500))})).all()
+    return [_spc_run_to_dict(r) for r in rows]
+
+
+@app.get("/spc/schedule", response_class=JSONResponse)
+async def spc_schedule_status(db: AsyncSession = Depends(get_read_db)):
+    """Per-product SPC check schedule (next check, last ISSUE seen, check count)."""
+    rows = (await db.execute(text(
+        """
+        SELECT product, next_check_at, last_checked_at, last_issue, last_new_issue_at, checks
+        FROM spc_product_schedule ORDER BY next_check_at, product
+        """
+    ))).all()
+    return [
+        {
+            "product": r.product,
+            "nextCheckAt": r.next_check_at,
+            "lastCheckedAt": r.last_checked_at,
+            "lastIssue": r.last_issue,
+            "lastNewIssueAt": r.last_new_issue_at,
+            "checks": r.checks,
+        }
+        for r in rows
+    ]
+
+
+@app.get("/spc/runs/{run_id}", response_class=JSONResponse)
+async def get_spc_run(run_id: int, db: AsyncSession = Depends(get_read_db)):
+    """One SPC run and its per-product jobs (attempts, lease, timings, last error)."""
+    run = (await db.execute(text(SPC_RUNS_SQL.format(where="WHERE r.id = :id")), {"id": run_id, "limit": 1})).first()
+    if run is None:
+        raise HTTPException(status_code=404, detail="run not found")
+    jobs = (await db.execute(text(
+        """
+        SELECT id, name, product, status, attempts, max_attempts, lease_owner, lease_expires_at,
+               started_at, finished_at, fetch_ms, store_ms, bytes, features, last_error
+        FROM spc_jobs WHERE run_id = :id ORDER BY id
+        """
+    ), {"id": run_id})).all()
+    out = _spc_run_to_dict(run)
+    out["jobs"] = [
+        {
+            "id": j.id,
+            "name": j.name,
+            "product": j.product,
+            "status": j.status,
+            "attempts": j.attempts,
+            "maxAttempts": j.max_attempts,
+            "leaseOwner": j.lease_owner,
+            "leaseExpiresAt": j.lease_expires_at,
+            "startedAt": j.started_at,
+            "finishedAt": j.finished_at,
+            "fetchMs": j.fetch_ms,
+            "storeMs": j.store_ms,
+            "bytes": j.bytes,
+            "features": j.features,
+            "lastError": j.last_error,
+        }
+        for j in jobs
+    ]
+    return out
+
+
+SPC_OUTLOOK_TABLES = {"convective": "convective_outlooks", "fire": "fire_outlooks"}
+
+
+@app.get("/spc/outlooks", response_class=JSONResponse)
+async def spc_outlooks(
+    product: Optional[str] = None,
+    kind: Optional[str] = None,
+    zoom: Optional[int] = None,
+    tolerance: Optional[float] = None,
+    bbox: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Latest issuance of SPC outlook products as a GeoJSON FeatureCollection.
+
+    `product` (e.g. `day1otlk_cat_nolyr`, comma-separated) and `kind`
+    (`convective` / `fire`) narrow the products; `zoom` / `tolerance` pick a
+    simplified geometry tier and `bbox` a map window.
+    """
+    tier = tier_for(zoom, tolerance)
+    geom_col = "geom" if tier == 0 else f"geom_s{tier}"
+    products = [p.strip() for p in product.split(",") if p.strip()] if product else None
+    window = parse_bbox(bbox)
+    tables = [SPC_OUTLOOK_TABLES[kind]] if kind in SPC_OUTLOOK_TABLES else list(SPC_OUTLOOK_TABLES.values())
+
+    features = []
+    for table in tables:
+        kind_name = "fire" if table == "fire_outlooks" else "convective"
+        where = ["(o.product, o.issue) IN (SELECT product, issue FROM spc_product_latest WHERE kind = :kind{pf})".format(
+            pf=" AND product = ANY(:products)" if products else "")]
+        params = {"kind": kind_name}
+        if products:
+            params["products"] = products
+        if window is not None:
+            where.append("o.geom_bbox && ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326)")
+            params.update(minx=window[0], miny=window[1], maxx=window[2], maxy=window[3])
+        rows = (await db.execute(text(
+            f"""
+            SELECT o.product, o.issue, o.valid, o.expire, o.feature_index, o.dn, o.label, o.label2,
+                   o.stroke, o.fill, o.properties, {geojson_sql('o.' + geom_col, tier)} AS geometry
+            FROM {table} o
+            WHERE {" AND ".join(where)}
+            ORDER BY o.product, o.feature_index
+            """
+        ), params)).all()
+        for r in rows:
+            props = dict(r.properties or {})
+            props.update(product=r.product, issue=r.issue, valid=r.valid, expire=r.expire,
+                         featureIndex=r.feature_index, dn=r.dn, label=r.label, label2=r.label2,
+                         stroke=r.stroke, fill=r.fill)
+            features.append({
+                "type": "Feature",
+                "geometry": json.loads(r.geometry) if r.geometry else None,
+                "properties": props,
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+@app.get("/spc/risk", response_class=JSONResponse)
+async def spc_risk(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Highest DN/LABEL of the latest issuance of every SPC product at a point."""
+    point, products, hit = await risk_cache.lookup(db, lat, lon)
+    return {"lat": point[0], "lon": point[1], "cached": hit, "products": products}
+
+
+def _csv_param(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+@app.get("/overlaps", response_class=JSONResponse)
+async def list_overlaps(
+    event: Optional[str] = None,
+    product: Optional[str] = None,
+    label: Optional[str] = None,
+    kind: Optional[str] = None,
+    alert_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    min_fraction: Optional[float] = None,
+    limit: int = 1000,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Alerts that fell inside SPC outlook areas, e.g. `?event=Tornado Warning&label=MDT,HIGH`.
+
+    `event`, `product` and `label` accept comma-separated lists; `since` /
+    `until` bound the alert's sent time.
+    """
+    table = AlertOutlookOverlap.__table__
+    stmt = select(table)
+    for col, value in ((table.c.event, event), (table.c.product, product), (table.c.label, label)):
+        values = _csv_param(value)
+        if values:
+            stmt = stmt.where(col.in_(values))
+    if kind:
+        stmt = stmt.where(table.c.kind == kind)
+    if alert_id:
+        stmt = stmt.where(table.c.alert_id == alert_id)
+    if since is not None:
+        stmt = stmt.where(table.c.alert_sent >= since)
+    if until is not None:
+        stmt = stmt.where(table.c.alert_sent < until)
+    if min_fraction is not None:
+        stmt = stmt.where(table.c.alert_fraction >= min_fraction)
+    stmt = stmt.order_by(table.c.alert_sent.desc()).limit(max(1, min(limit, 10000)))
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "alertId": r.alert_id,
+            "alertSent": r.alert_sent,
+            "event": r.event,
+            "kind": r.kind,
+            "outlookId": r.outlook_id,
+            "product": r.product,
+            "issue": r.issue,
+            "valid": r.valid,
+            "expire": r.expire,
+            "dn": r.dn,
+            "label": r.label,
+            "alertFraction": float(r.alert_fraction) if r.alert_fraction is not None else None,
+        }
+        for r in rows
+    ]
+
+
+@app.get("/overlaps/summary", response_class=JSONResponse)
+async def overlap_summary(
+    product: Optional[str] = None,
+    event: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Distinct alert counts per (event, product, label)."""
+    table = AlertOutlookOverlap.__table__
+    stmt = select(
+        table.c.event, table.c.product, table.c.label,
+        func.count(func.distinct(table.c.alert_id)).label('alerts'),
+    ).group_by(table.c.event, table.c.product, table.c.label)
+    for col, value in ((table.c.event, event), (table.c.product, product)):
+        values = _csv_param(value)
+        if values:
+            stmt = stmt.where(col.in_(values))
+    if since is not None:
+        stmt = stmt.where(table.c.alert_sent >= since)
+    if until is not None:
+        stmt = stmt.where(table.c.alert_sent < until)
+    stmt = stmt.order_by(func.count(func.distinct(table.c.alert_id)).desc())
+    rows = (await db.execute(stmt)).all()
+    return [{"event": r.event, "product": r.product, "label": r.label, "alerts": r.alerts} for r in rows]
+
+
+STATS_DEFAULT_DAYS = 7
+
+
+def _alert_rollup(by, state, office):
+    """Hourly rollup to answer from: per state when grouping or filtering by state."""
+    by_state = by == "state" or bool(_csv_param(state))
+    if by_state and office:
+        raise HTTPException(status_code=400, detail="office and state cannot be combined")
+    return (AlertStateRollupHourly if by_state else AlertRollupHourly).__table__
+
+
+def _alert_stats_filter(stmt, table, since, until, event, severity, office, state):
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=STATS_DEFAULT_DAYS)
+    stmt = stmt.where(table.c.bucket >= since, table.c.bucket < until)
+    for col, value in (("event", event), ("severity", severity), ("office", office), ("state", state)):
+        values = _csv_param(value)
+        if values:
+            stmt = stmt.where(table.c[col].in_(values))
+    return stmt
+
+
+@app.get("/stats/alerts/timeseries", response_class=JSONResponse)
+async def alert_stats_timeseries(
+    interval: str = Query("hour", pattern="^(hour|day|week|month)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event: Optional[str] = None,
+    severity: Optional[str] = None,
+    office: Optional[str] = None,
+    state: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """New alerts (Actual, messageType Alert) per `interval` (UTC buckets), from the hourly rollups.
+
+    Defaults to the last 7 days; `event` / `severity` / `office` (sender name) /
+    `state` (UGC state) are comma-separated filters. `office` and `state` can't be combined.
+    """
+    table = _alert_rollup(None, state, office)
+    # `interval` is one of the allowed literals above
+    bucket = func.date_trunc(literal_column(f"'{interval}'"), table.c.bucket, literal_column("'UTC'"))
+    stmt = select(bucket.label("bucket"), func.sum(table.c.alerts).label("alerts")).group_by(bucket).order_by(bucket)
+    stmt = _alert_stats_filter(stmt, table, since, until, event, severity, office, state)
+    rows = (await db.execute(stmt)).all()
+    return [{"bucket": r.bucket, "alerts": int(r.alerts)} for r in rows]
+
+
+@app.get("/stats/alerts/top", response_class=JSONResponse)
+async def alert_stats_top(
+    by: str = Query("event", pattern="^(event|severity|office|state)$"),
+    limit: int = Query(10, ge=1, le=500),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event: Optional[str] = None,
+    severity: Optional[str] = None,
+    office: Optional[str] = None,
+    state: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Top `limit` events / severities / offices / states by new alerts (last 7 days by default)."""
+    table = _alert_rollup(by, state, office)
+    key = table.c[by]
+    total = func.sum(table.c.alerts)
+    stmt = select(key.label("key"), total.label("alerts")).group_by(key).order_by(total.desc(), key).limit(limit)
+    stmt = _alert_stats_filter(stmt, table, since, until, event, severity, office, state)
+    rows = (await db.execute(stmt)).all()
+    return [{"key": r.key, "alerts": int(r.alerts)} for r in rows]
+
+
+@app.get("/stats/spc/daily", response_class=JSONResponse)
+async def spc_stats_daily(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    kind: Optional[str] = Query(None, pattern="^(convective|fire)$"),
+    product: Optional[str] = None,
+    label: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """SPC categories per convective day (12Z-12Z): issuances, features, largest area (km²).
+
+    Defaults to the last 30 days; `product` / `label` are comma-separated.
+    """
+    table = SpcDailyRollup.__table__
+    until = until or datetime.now(timezone.utc).date() + timedelta(days=1)
+    since = since or until - timedelta(days=30)
+    stmt = select(table).where(table.c.day >= since, table.c.day < until)
+    if kind:
+        stmt = stmt.where(table.c.kind == kind)
+    for col, value in ((table.c.product, product), (table.c.label, label)):
+        values = _csv_param(value)
+        if values:
+            stmt = stmt.where(col.in_(values))
+    rows = (await db.execute(stmt.order_by(table.c.day, table.c.product, table.c.label))).all()
+    return [
+        {
+            "day": r.day,
+            "kind": r.kind,
+            "product": r.product,
+            "label": r.label,
+            "issuances": r.issuances,
+            "features": r.features,
+            "maxAreaKm2": float(r.max_area_km2) if r.max_area_km2 is not None else None,
+        }
+        for r in rows
+    ]
+
+
+@app.get("/stats/spc/categories", response_class=JSONResponse)
+async def spc_stats_categories(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    kind: Optional[str] = Query(None, pattern="^(convective|fire)$"),
+    product: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Number of convective days each (product, category) appeared on (last 365 days by default)."""
+    table = SpcDailyRollup.__table__
+    until = until or datetime.now(timezone.utc).date() + timedelta(days=1)
+    since = since or until - timedelta(days=365)
+    days = func.count().label("days")
+    stmt = (
+        select(table.c.product, table.c.label, days, func.max(table.c.day).label("last_day"))
+        .where(table.c.day >= since, table.c.day < until)
+        .group_by(table.c.product, table.c.label)
+    )
+    if kind:
+        stmt = stmt.where(table.c.kind == kind)
+    products = _csv_param(product)
+    if products:
+        stmt = stmt.where(table.c.product.in_(products))
+    rows = (await db.execute(stmt.order_by(table.c.product, days.desc()))).all()
+    return [{"product": r.product, "label": r.label, "days": r.days, "lastDay": r.last_day} for r in rows]
+
+
+def _export_response(name, spec, default, fmt, columns, build_query):
+    if not export.available():
+        raise HTTPException(status_code=501, detail="exports need the pyarrow package")
+    if fmt not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(export.FORMATS)}")
     try:
+        cols = export.select_columns(spec, default, _csv_param(columns))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query, params = build_query(cols)
+    media_type, ext = export.FORMATS[fmt]
+    return StreamingResponse(
+        export.stream_export(async_read_engine, query, params, export.schema(spec, cols), fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{ext}"'},
+    )
+
+
+@app.get("/export/alerts")
+async def export_alerts(
+    fmt: str = Query("parquet", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    columns: Optional[str] = None,
+    event: Optional[str] = None,
+):
+    """Alerts as Arrow IPC stream or GeoParquet (WKB geometry), filtered on `sent`."""
+    return _export_response(
+        "alerts", export.ALERT_COLUMNS, export.ALERT_DEFAULT, fmt, columns,
+        lambda cols: export.alerts_query(cols, since, until, _csv_param(event)),
+    )
+
+
+@app.get("/export/outlooks")
+async def export_outlooks(
+    fmt: str = Query("parquet", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    columns: Optional[str] = None,
+    product: Optional[str] = None,
+    kind: Optional[str] = Query(None, pattern="^(convective|fire)$"),
+):
+    """SPC outlook features (both tables) as Arrow IPC stream or GeoParquet, filtered on `issue`."""
+    return _export_response(
+        "outlooks", export.OUTLOOK_COLUMNS, export.OUTLOOK_DEFAULT, fmt, columns,
+        lambda cols: export.outlooks_query(cols, since, until, _csv_param(product), kind),
+    )
+
+
+@app.get("/metrics")
+async def metrics_endpoint(db: AsyncSession = Depends(get_read_db)):
+    """Prometheus metrics of this API process (pools, newest alert age)."""
+    # max(sent) touches every partition; scrapes in between reuse the last value
+    if metrics.newest_sent_due():
         try:
-            row = db.execute(text("SELECT source, last_run, last_success, convective_count, fire_count, message, updated_at FROM spc_ingest_status WHERE source='spc' LIMIT 1")).first()
+            metrics.observe_newest_sent((await db.execute(text("SELECT max(sent) FROM alerts"))).scalar())
         except Exception:
-            return {"status": "unknown", "message": "spc_ingest_status table not present"}
-        if not row:
-            return {"status": "no-data"}
-        return {
-            "source": row.source,
-            "last_run": row.last_run,
-            "last_success": row.last_success,
-            "convective_count": row.convective_count,
-            "fire_count": row.fire_count,
-            "message": row.message,
-            "updated_at": row.updated_at,
-        }
-    finally:
-        db.close()
+            await db.rollback()
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
+
+@app.get("/pool_status")
+def get_pool_status():
+    """Connection pool checkout wait, saturation and connection counts."""
+    return pool_status()
 
 templates = Jinja2Templates(directory="app/templates")
 
+active_snapshot = ActiveSnapshot(AsyncReadSessionLocal)
+risk_cache = RiskCache()
+hazard_cache = HazardCache()
+
 
 @app.on_event("startup")
 def on_startup():
     init_db()
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+
 @app.get("/alerts", response_class=JSONResponse)
-def list_alerts():
-    db = SessionLocal()
+async def list_alerts(
+    keyword: Optional[str] = None,
+    color: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    zoom: Optional[int] = None,
+    tolerance: Optional[float] = None,
+    bbox: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    table = Alert.__table__
+    # Simplified geometry tier for the requested zoom / tolerance (degrees)
+    tier = tier_for(zoom, tolerance)
+    # Return selected columns including geometry as GeoJSON
+    # Rebuilt from residual + extracted columns for compact rows (see app.properties)
+    properties = func.alert_properties(literal_column(table.name), type_=table.c.properties.type).label('properties')
+    stmt = select(
+        table.c.id,
+        properties,
+        as_geojson(table, 'geometry', tier).label('geometry'),
+        table.c.sent,
+        table.c.effective,
+        table.c.onset,
+        table.c.expires,
+        table.c.ends,
+        table.c.status,
+        table.c.message_type,
+        table.c.category,
+        table.c.severity,
+        table.c.certainty,
+        table.c.urgency,
+        table.c.event,
+        table.c.sender_name,
+        table.c.headline,
+        table.c.area_desc,
+        table.c.description,
+        table.c.instruction,
+        table.c.response,
+        table.c.geocode,
+        table.c.geocode_ugc,
+        table.c.geocode_same,
+        table.c.parameters,
+        table.c.parameters_awipsidentifier,
+        table.c.parameters_blockchannel,
+        table.c.parameters_cmamlongtext,
+        table.c.parameters_cmamtext,
+        table.c.parameters_eas_org,
+        table.c.parameters_eventendingtime,
+        table.c.parameters_eventmotiondescription,
+        table.c.parameters_expiredreferences,
+        table.c.parameters_hailthreat,
+        table.c.parameters_maxhailsize,
+        table.c.parameters_maxwindgust,
+        table.c.parameters_nwsheadline,
+        table.c.parameters_tornadodetection,
+        table.c.parameters_vtec,
+        table.c.parameters_waterspoutdetection,
+        table.c.parameters_weahandling,
+        table.c.parameters_windthreat,
+        table.c.parameters_wmoidentifier,
+        table.c.affected_zones,
+        table.c.references,
+        table.c.type_emoji,
+        table.c.keywords,
+        table.c.keyword_colors,
+    )
+    # Time bounds on `sent` let the planner prune monthly partitions
+    if since is not None:
+        stmt = stmt.where(table.c.sent >= since)
+    if until is not None:
+        stmt = stmt.where(table.c.sent < until)
+    # Keyword / color filters use JSONB containment (GIN-indexed)
+    if keyword:
+        stmt = stmt.where(table.c.keywords.contains([keyword]))
+    if color:
+        stmt = stmt.where(table.c.keyword_colors.contains([color]))
+    # Map window: `minx,miny,maxx,maxy` against the GiST-indexed bbox column
+    window = parse_bbox(bbox)
+    if window is not None:
+        stmt = stmt.where(bbox_filter(table, 'geometry', window))
     try:
-        table = Alert.__table__
-        # Return selected columns including geometry as GeoJSON
-        stmt = select(
-            table.c.id,
-            table.c.properties,
-            func.ST_AsGeoJSON(table.c.geometry).label('geometry'),
-            table.c.sent,
-            table.c.effective,
-            table.c.onset,
-            table.c.expires,
-            table.c.ends,
-            table.c.status,
-            table.c.message_type,
-            table.c.category,
-            table.c.severity,
-            table.c.certainty,
-            table.c.urgency,
-            table.c.event,
-            table.c.sender_name,
-            table.c.headline,
-            table.c.area_desc,
-            table.c.description,
-            table.c.instruction,
-            table.c.response,
-            table.c.geocode,
-            table.c.geocode_ugc,
-            table.c.geocode_same,
-            table.c.parameters,
-            table.c.parameters_awipsidentifier,
-            table.c.parameters_blockchannel,
-            table.c.parameters_cmamlongtext,
-            table.c.parameters_cmamtext,
-            table.c.parameters_eas_org,
-            table.c.parameters_eventendingtime,
-            table.c.parameters_eventmotiondescription,
-            table.c.parameters_expiredreferences,
-            table.c.parameters_hailthreat,
-            table.c.parameters_maxhailsize,
-            table.c.parameters_maxwindgust,
-            table.c.parameters_nwsheadline,
-            table.c.parameters_tornadodetection,
-            table.c.parameters_vtec,
-            table.c.parameters_waterspoutdetection,
-            table.c.parameters_weahandling,
-            table.c.parameters_windthreat,
-            table.c.parameters_wmoidentifier,
-            table.c.affected_zones,
-            table.c.references,
-        )
-        try:
-            rows = db.execute(stmt).all()
-        except Exception:
-            # If the extracted columns don't exist yet (older DB), fall back
-            # to a minimal query to avoid crashing the app.
-            fallback = select(table.c.id, table.c.properties, func.ST_AsGeoJSON(table.c.geometry).label('geometry'))
-            rows = db.execute(fallback).all()
-        out = []
+        rows = (await db.execute(stmt)).all()
+    except Exception:
+        # If the extracted columns don't exist yet (older DB), fall back
+        # to a minimal query to avoid crashing the app.
+        await db.rollback()
+        fallback = select(table.c.id, properties, func.ST_AsGeoJSON(table.c.geometry).label('geometry'))
+        rows = (await db.execute(fallback)).all()
+    out = []
+    with span('build'):
         for r in rows:
             geom = r.geometry
             if geom is not None:
@@ -159,10 +685,153 @@ def list_alerts():
                 "parameters_wmoidentifier": r.parameters_wmoidentifier,
                 "affectedZones": r.affected_zones,
                 "references": r.references,
+                "typeEmoji": r.type_emoji,
+                "keywords": r.keywords,
+                "keywordColors": r.keyword_colors,
             })
-        return out
-    finally:
-        db.close()
+    return out
+
+
+@app.get("/alerts/search", response_class=JSONResponse)
+async def search_alerts(
+    q: str = Query(..., min_length=1, max_length=256),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event: Optional[str] = None,
+    sort: str = Query("rank", pattern="^(rank|sent)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Full-text search over headline, NWS headline, description and instruction.
+
+    `q` uses web-search syntax (`"tornado emergency"`, `flood or flash`,
+    `-test`). Results are ranked (or newest first with `sort=sent`) and carry
+    `<mark>`-highlighted snippets; `since` / `until` / `event` narrow the search.
+    """
+    query, params = search.search_query(q, since, until, _csv_param(event), limit, offset, sort)
+    rows = (await db.execute(query, params)).all()
+    return [
+        {
+            "id": r.id,
+            "sent": r.sent,
+            "expires": r.expires,
+            "event": r.event,
+            "severity": r.severity,
+            "urgency": r.urgency,
+            "senderName": r.sender_name,
+            "areaDesc": r.area_desc,
+            "headline": r.headline,
+            "rank": r.rank,
+            "headlineSnippet": r.headline_snippet,
+            "snippet": r.snippet,
+        }
+        for r in rows
+    ]
+
+
+@app.get("/alerts/active", response_class=JSONResponse)
+async def list_active_alerts(
+    event: Optional[str] = None,
+    severity: Optional[str] = None,
+    keyword: Optional[str] = None,
+    zoom: Optional[int] = None,
+    tolerance: Optional[float] = None,
+    bbox: Optional[str] = None,
+):
+    """Alerts in effect right now, served from the in-process active snapshot."""
+    rows = await active_snapshot.rows(tier=tier_for(zoom, tolerance), bbox=parse_bbox(bbox))
+    if event:
+        rows = [r for r in rows if r["event"] == event]
+    if severity:
+        rows = [r for r in rows if r["severity"] == severity]
+    if keyword:
+        rows = [r for r in rows if keyword in (r["keywords"] or [])]
+    return rows
+
+
+def _etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+@app.get("/hazards")
+async def hazard_layers(
+    request: Request,
+    source: Optional[str] = Query(None, pattern="^(nws|spc)$"),
+    name: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Dissolved layers as a GeoJSON FeatureCollection: one feature per active
+    event type (`source=nws`) and per SPC product category (`source=spc`).
+
+    `name` (comma-separated event types / products) narrows the layers. The
+    response carries an ETag; a matching `If-None-Match` gets 304.
+    """
+    body, etag = await hazard_cache.body(db, source, _csv_param(name))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/geo+json", headers=headers)
+
+
+@app.get("/vtec/events", response_class=JSONResponse)
+async def list_vtec_events(
+    office: Optional[str] = None,
+    phenomena: Optional[str] = None,
+    significance: Optional[str] = None,
+    etn: Optional[int] = None,
+    year: Optional[int] = None,
+    active: bool = True,
+    limit: int = 500,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Current state of VTEC events, e.g. `?office=OUN&phenomena=TO&significance=W&etn=42`."""
+    table = VtecEvent.__table__
+    stmt = select(table)
+    if office:
+        office = office.upper()
+        # Accept both 3-letter (OUN) and 4-letter (KOUN) office ids
+        candidates = [office] if len(office) == 4 else [office] + [p + office for p in ('K', 'P', 'T')]
+        stmt = stmt.where(table.c.office.in_(candidates))
+    if phenomena:
+        stmt = stmt.where(table.c.phenomena == phenomena.upper())
+    if significance:
+        stmt = stmt.where(table.c.significance == significance.upper())
+    if etn is not None:
+        stmt = stmt.where(table.c.etn == etn)
+    if year is not None:
+        stmt = stmt.where(table.c.year == year)
+    if active:
+        stmt = stmt.where(
+            table.c.action.notin_(INACTIVE_ACTIONS),
+            or_(table.c.end_time.is_(None), table.c.end_time > func.now()),
+        )
+    stmt = stmt.order_by(table.c.sent.desc().nulls_last()).limit(max(1, min(limit, 5000)))
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "office": r.office,
+            "phenomena": r.phenomena,
+            "significance": r.significance,
+            "etn": r.etn,
+            "year": r.year,
+            "productClass": r.product_class,
+            "action": r.action,
+            "begin": r.begin_time,
+            "end": r.end_time,
+            "vtec": r.raw,
+            "alertId": r.alert_id,
+            "event": r.event,
+            "sent": r.sent,
+            "expires": r.expires,
+            "updatedAt": r.updated_at,
+        }
+        for r in rows
+    ]
 
 
 @app.post("/alerts", dependencies=[Depends(verify_api_key)])
@@ -177,23 +846,26 @@ def post_alert(alert: AlertIn):
             aid = aid[len(prefix):]
 
         properties = alert.properties or {}
+        # `sent` is the partition key (and part of the primary key); without
+        # one, reuse the stored row's so re-posting an id updates it
+        sent = properties.get('sent') or stored_sent(db, aid) or datetime.now(timezone.utc).isoformat()
         geom = getattr(alert, 'geometry', None)
         geom_expr = None
         if geom:
             geom_json = json.dumps(geom)
-            geom_expr = func.ST_SetSRID(func.ST_GeomFromGeoJSON(geom_json), 4326)
+            geom_expr = make_valid(func.ST_SetSRID(func.ST_GeomFromGeoJSON(geom_json), 4326))
 
         if geom_expr is not None:
-            stmt = pg_insert(table).values(id=aid, properties=properties, geometry=geom_expr)
+            stmt = pg_insert(table).values(id=aid, sent=sent, properties=properties, geometry=geom_expr)
         else:
-            stmt = pg_insert(table).values(id=aid, properties=properties)
+            stmt = pg_insert(table).values(id=aid, sent=sent, properties=properties)
 
         update_dict = { 'properties': stmt.excluded.properties }
         if geom_expr is not None:
             update_dict['geometry'] = stmt.excluded.geometry
 
         stmt = stmt.on_conflict_do_update(
-            index_elements=[table.c.id],
+            index_elements=[table.c.id, table.c.sent],
             set_=update_dict
         )
 
@@ -0,0 +1,161 @@
+"""Prometheus metrics for the API and the ingest processes.
+
+The app serves them on `GET /metrics`; `ingest` and `spc_ingest` start a
+metrics HTTP server on `METRICS_PORT` (0 = off). Every process exposes its
+own connection pool stats.
+
+- `wxrouter_ingest_stage_seconds{source,product,stage}`: fetch, parse, upsert
+  and end-to-end (`total`) time per NWS poll / SPC product;
+- `wxrouter_ingest_features_total{source,product,result}`: inserted, updated,
+  skipped and failed features;
+- `wxrouter_ingest_derived_failures_total{step}`: stored alerts whose derived
+  state (`vtec`, `active`, `overlaps`, `rollups`) failed to update;
+- `wxrouter_ingest_fetch_bytes_total`, `wxrouter_ingest_fetch_errors_total`;
+- `wxrouter_newest_alert_age_seconds`: seconds since the `sent` time of the
+  newest stored alert;
+- `wxrouter_alert_ingest_lag_seconds{kind}`: sent -> ingest delay of new
+  alerts (`urgent` / `other`), and `wxrouter_nws_poll_interval_seconds`;
+- `wxrouter_db_pool_*{pool}`: see `app.db.pool_status`.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest, start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+# How often the API re-reads max(sent) from the database for the newest-alert gauges
+NEWEST_SENT_TTL_SECONDS = float(os.getenv('METRICS_NEWEST_SENT_TTL_SECONDS', '60'))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    'wxrouter_ingest_stage_seconds', 'Ingest stage duration',
+    ['source', 'product', 'stage'], buckets=STAGE_BUCKETS,
+)
+FEATURES = Counter(
+    'wxrouter_ingest_features', 'Features handled by ingest', ['source', 'product', 'result'],
+)
+DERIVED_FAILURES = Counter(
+    'wxrouter_ingest_derived_failures', 'Derived-state updates that failed for a stored alert', ['step'],
+)
+FETCH_BYTES = Counter('wxrouter_ingest_fetch_bytes', 'Bytes downloaded', ['source', 'product'])
+FETCH_ERRORS = Counter('wxrouter_ingest_fetch_errors', 'Failed fetches', ['source', 'product'])
+NEWEST_ALERT_SENT = Gauge(
+    'wxrouter_newest_alert_sent_timestamp_seconds', 'sent time of the newest stored alert (unix seconds)',
+)
+NEWEST_ALERT_AGE = Gauge('wxrouter_newest_alert_age_seconds', 'Seconds since the newest stored alert was sent')
+INGEST_LAG = Histogram(
+    'wxrouter_alert_ingest_lag_seconds', 'Delay from an alert\'s sent time to its first upsert here',
+    ['kind'], buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 1800),
+)
+POLL_INTERVAL = Gauge('wxrouter_nws_poll_interval_seconds', 'Delay chosen before the next NWS poll')
+
+
+# Unix time of the newest `sent` seen by this process (0 = none yet)
+_newest_sent = 0.0
+_newest_checked = None
+
+NEWEST_ALERT_SENT.set_function(lambda: _newest_sent or float('nan'))
+NEWEST_ALERT_AGE.set_function(lambda: time.time() - _newest_sent if _newest_sent else float('nan'))
+
+
+@contextmanager
+def stage(source, product, name):
+    """Observe the enclosed block as `name` in the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(source, product, name).observe(time.perf_counter() - start)
+
+
+def count_features(source, product, inserted=0, updated=0, skipped=0, failed=0):
+    for result, n in (('inserted', inserted), ('updated', updated), ('skipped', skipped), ('failed', failed)):
+        if n:
+            FEATURES.labels(source, product, result).inc(n)
+
+
+def count_derived_failure(step):
+    DERIVED_FAILURES.labels(step).inc()
+
+
+def newest_sent_due():
+    """Whether the newest `sent` should be re-read (at most every `NEWEST_SENT_TTL_SECONDS`)."""
+    global _newest_checked
+    now = time.monotonic()
+    if _newest_checked is not None and now - _newest_checked < NEWEST_SENT_TTL_SECONDS:
+        return False
+    _newest_checked = now
+    return True
+
+
+def observe_newest_sent(sent):
+    """Advance the newest-alert gauge to `sent` (a datetime) if it is newer."""
+    global _newest_sent
+    if sent is not None:
+        _newest_sent = max(_newest_sent, sent.timestamp())
+
+
+class PoolCollector:
+    """Exposes `app.db.pool_status()` at scrape time."""
+
+    GAUGES = {
+        'checked_out': 'Connections checked out',
+        'idle': 'Idle connections in the pool',
+        'overflow': 'Connections above pool_size',
+        'capacity': 'pool_size + max_overflow',
+        'checkout_wait_p99_ms': 'p99 checkout wait over recent checkouts (ms)',
+    }
+    COUNTERS = {
+        'checkouts': 'Connection checkouts',
+        'checkout_timeouts': 'Checkouts that timed out',
+        'connections_opened': 'New DB connections opened',
+    }
+
+    def collect(self):
+        from .db import pool_status
+
+        pools = pool_status()
+        for key, doc in self.GAUGES.items():
+            g = GaugeMetricFamily(f'wxrouter_db_pool_{key}', doc, labels=['pool'])
+            for p in pools:
+                g.add_metric([p['name']], p[key] or 0)
+            yield g
+        for key, doc in self.COUNTERS.items():
+            c = CounterMetricFamily(f'wxrouter_db_pool_{key}', doc, labels=['pool'])
+            for p in pools:
+                c.add_metric([p['name']], p[key])
+            yield c
+
+
+_pool_lock = threading.Lock()
+_pool_registered = False
+
+
+def register_pool_collector():
+    global _pool_registered
+    with _pool_lock:
+        if not _pool_registered:
+            REGISTRY.register(PoolCollector())
+            _pool_registered = True
+
+
+def start_server(port=None):
+    """Serve metrics on `port` (default `METRICS_PORT`) in a background thread; no-op if 0."""
+    port = METRICS_PORT if port is None else port
+    register_pool_collector()
+    if port > 0:
+        start_http_server(port)
+        print(f"metrics: serving on :{port}/metrics")
+
+
+def render():
+    """(body, content type) of the current metrics, for the app's `/metrics` endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,467 @@
+"""Versioned schema migrations recorded in a `schema_migrations` ledger.
+
+Each migration is a numbered, idempotent function applied exactly once, in
+its own transaction, while holding a PostgreSQL advisory lock so concurrent
+app/ingest containers never run the same step twice. A warm start (nothing
+pending) costs a single `SELECT version FROM schema_migrations`.
+
+Add new migrations to the end of `MIGRATIONS`; never renumber or edit an
+applied one.
+"""
+
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Arbitrary constant shared by every process that runs migrations
+MIGRATION_LOCK_KEY = 727_301_001
+
+
+def _best_effort(conn, statements):
+    """Run statements in a savepoint each, ignoring failures (e.g. missing privileges)."""
+    for stmt in statements:
+        try:
+            with conn.begin_nested():
+                conn.exec_driver_sql(stmt)
+        except DBAPIError:
+            pass
+
+
+def m001_postgis(conn):
+    # May require superuser; the postgis/postgis image already has it
+    _best_effort(conn, ["CREATE EXTENSION IF NOT EXISTS postgis"])
+
+
+def m002_create_tables(conn):
+    from .db import Base
+    from . import models  # noqa: F401  (register models on Base.metadata)
+    Base.metadata.create_all(bind=conn)
+
+
+def m003_partition_alerts(conn):
+    from .partitions import ensure_alerts_partitioned, ensure_partitions
+    ensure_alerts_partitioned(conn)
+    ensure_partitions(conn)
+
+
+def m004_alerts_extracted_columns(conn):
+    _best_effort(conn, [
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sent timestamptz",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS effective timestamptz",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS onset timestamptz",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS expires timestamptz",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS ends timestamptz",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS status varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS message_type varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS category varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS severity varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS certainty varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS urgency varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS event varchar(512)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sender_name varchar(256)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS headline varchar(512)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS area_desc varchar(1024)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS description text",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS instruction text",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS response varchar(128)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS geocode jsonb",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS parameters jsonb",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS affected_zones jsonb",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS references jsonb",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS type_emoji varchar(64)",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS keywords jsonb",
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS keyword_colors jsonb",
+        # We no longer persist `sender` separately
+        "ALTER TABLE alerts DROP COLUMN IF EXISTS sender",
+    ])
+
+
+def m005_alerts_indexes(conn):
+    _best_effort(conn, [
+        "CREATE INDEX IF NOT EXISTS idx_alerts_geometry ON alerts USING GIST (geometry)",
+        # Faster time-range queries
+        "CREATE INDEX IF NOT EXISTS idx_alerts_sent ON alerts (sent)",
+        # GIN indexes so keyword / color filters (`@>`) are plain index scans
+        "CREATE INDEX IF NOT EXISTS idx_alerts_keywords ON alerts USING GIN (keywords jsonb_path_ops)",
+        "CREATE INDEX IF NOT EXISTS idx_alerts_keyword_colors ON alerts USING GIN (keyword_colors jsonb_path_ops)",
+    ])
+
+
+def m006_spc_outlook_schema(conn):
+    sql_file = ROOT / 'db_init' / '03_spc_outlooks.sql'
+    if sql_file.exists():
+        conn.exec_driver_sql(sql_file.read_text())
+    _best_effort(conn, [
+        "ALTER TABLE convective_outlooks ADD COLUMN IF NOT EXISTS issue timestamptz",
+        "ALTER TABLE fire_outlooks ADD COLUMN IF NOT EXISTS issue timestamptz",
+        # Drop legacy unique indexes that included dn
+        "DROP INDEX IF EXISTS uq_convective_product_issue_dn",
+        "DROP INDEX IF EXISTS uq_fire_product_issue_dn",
+        # Unique product + issue + feature_index supports idempotent upserts
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_convective_product_issue_featidx ON convective_outlooks (product, issue, feature_index)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_fire_product_issue_featidx ON fire_outlooks (product, issue, feature_index)",
+        # dn is text (convert existing integer values)
+        "ALTER TABLE convective_outlooks ALTER COLUMN dn TYPE text USING dn::text",
+        "ALTER TABLE fire_outlooks ALTER COLUMN dn TYPE text USING dn::text",
+    ])
+
+
+LEGACY_CONVECTIVE_FEATURES_SQL = """
+INSERT INTO convective_outlooks (
+  product, url, payload, fetched_hour, feature_index, properties, dn, valid, expire, issue,
+  forecaster, label, label2, stroke, fill, geom, created_at
+)
+SELECT o.product, o.url, o.payload, COALESCE(o.fetched_hour, now()), f.feature_index, f.properties, f.dn, f.valid, f.expire,
+       COALESCE(f.issue, o.issue), f.forecaster, f.label, f.label2, f.stroke, f.fill, f.geom, f.created_at
+FROM convective_outlooks o JOIN convective_features f ON f.outlook_id = o.id
+ON CONFLICT (product, issue, feature_index) DO UPDATE
+  SET payload = EXCLUDED.payload,
+      properties = EXCLUDED.properties,
+      dn = EXCLUDED.dn,
+      valid = EXCLUDED.valid,
+      expire = EXCLUDED.expire,
+      forecaster = EXCLUDED.forecaster,
+      label = EXCLUDED.label,
+      label2 = EXCLUDED.label2,
+      stroke = EXCLUDED.stroke,
+      fill = EXCLUDED.fill,
+      geom = EXCLUDED.geom,
+      created_at = EXCLUDED.created_at;
+"""
+
+LEGACY_FIRE_FEATURES_SQL = """
+INSERT INTO fire_outlooks (
+  product, url, payload, fetched_hour, feature_index, properties, dn, valid, expire, issue,
+  forecaster, label, label2, stroke, fill, geom, created_at
+)
+SELECT o.product, o.url, o.payload, COALESCE(o.fetched_hour, now()), f.feature_index, f.properties, f.dn, f.valid, f.expire,
+       COALESCE(f.issue, o.issue), f.forecaster, f.label, f.label2, f.stroke, f.fill, f.geom, f.created_at
+FROM fire_outlooks o JOIN fire_features f ON f.outlook_id = o.id
+ON CONFLICT (product, issue, feature_index) DO UPDATE
+  SET payload = EXCLUDED.payload,
+      properties = EXCLUDED.properties,
+      dn = EXCLUDED.dn,
+      valid = EXCLUDED.valid,
+      expire = EXCLUDED.expire,
+      forecaster = EXCLUDED.forecaster,
+      label = EXCLUDED.label,
+      label2 = EXCLUDED.label2,
+      stroke = EXCLUDED.stroke,
+      fill = EXCLUDED.fill,
+      geom = EXCLUDED.geom,
+      created_at = EXCLUDED.created_at;
+"""
+
+# Rows created with only `payload` populated: extract the first feature's
+# properties/geometry into typed columns.
+BACKFILL_FROM_PAYLOAD_SQL = """
+-- Populate convective_outlooks typed columns from payload->features[0]
+UPDATE convective_outlooks SET
+    properties = payload->'features'->0->'properties',
+    dn = COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),'') , 'NA'),
+    valid = NULLIF(payload->'features'->0->'properties'->>'VALID_ISO','')::timestamptz,
+    expire = NULLIF(payload->'features'->0->'properties'->>'EXPIRE_ISO','')::timestamptz,
+    issue = NULLIF(payload->'features'->0->'properties'->>'ISSUE_ISO','')::timestamptz,
+    forecaster = payload->'features'->0->'properties'->>'FORECASTER',
+    label = payload->'features'->0->'properties'->>'LABEL',
+    label2 = payload->'features'->0->'properties'->>'LABEL2',
+    stroke = payload->'features'->0->'properties'->>'stroke',
+    fill = payload->'features'->0->'properties'->>'fill',
+    geom = CASE WHEN (payload->'features'->0->'geometry') IS NULL OR (payload->'features'->0->'geometry') = 'null' THEN geom ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((payload->'features'->0->'geometry')::text)),4326) END
+WHERE (payload->'features'->0->'properties') IS NOT NULL;
+
+-- Populate fire_outlooks typed columns from payload->features[0]
+UPDATE fire_outlooks SET
+    properties = payload->'features'->0->'properties',
+    dn = COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),'') , 'NA'),
+    valid = NULLIF(payload->'features'->0->'properties'->>'VALID_ISO','')::timestamptz,
+    expire = NULLIF(payload->'features'->0->'properties'->>'EXPIRE_ISO','')::timestamptz,
+    issue = NULLIF(payload->'features'->0->'properties'->>'ISSUE_ISO','')::timestamptz,
+    forecaster = payload->'features'->0->'properties'->>'FORECASTER',
+    label = payload->'features'->0->'properties'->>'LABEL',
+    label2 = payload->'features'->0->'properties'->>'LABEL2',
+    stroke = payload->'features'->0->'properties'->>'stroke',
+    fill = payload->'features'->0->'properties'->>'fill',
+    geom = CASE WHEN (payload->'features'->0->'geometry') IS NULL OR (payload->'features'->0->'geometry') = 'null' THEN geom ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((payload->'features'->0->'geometry')::text)),4326) END
+WHERE (payload->'features'->0->'properties') IS NOT NULL;
+"""
+
+# DN matches the stored properties (no suffixes); recompute feature_index
+# from the ordinal of the matching properties JSON in the payload features.
+RECOMPUTE_DN_FEATURE_INDEX_SQL = """
+UPDATE convective_outlooks SET dn = COALESCE(NULLIF(properties->>'DN',''), COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),''),'NA'));
+UPDATE fire_outlooks SET dn = COALESCE(NULLIF(properties->>'DN',''), COALESCE(NULLIF((payload->'features'->0->'properties'->>'DN'),''),'NA'));
+-- Recompute feature_index by finding the ordinal of the matching properties JSON in the payload features
+UPDATE convective_outlooks c SET feature_index = sub.idx
+FROM (
+    SELECT c2.id,
+        (SELECT (fe.ord - 1)
+         FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
+         WHERE fe.elem->'properties' = c2.properties
+         LIMIT 1) AS idx
+    FROM convective_outlooks c2
+    WHERE c2.feature_index IS NULL OR c2.feature_index = 0
+) sub
+WHERE c.id = sub.id AND sub.idx IS NOT NULL;
+
+UPDATE fire_outlooks c SET feature_index = sub.idx
+FROM (
+    SELECT c2.id,
+        (SELECT (fe.ord - 1)
+         FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
+         WHERE fe.elem->'properties' = c2.properties
+         LIMIT 1) AS idx
+    FROM fire_outlooks c2
+    WHERE c2.feature_index IS NULL OR c2.feature_index = 0
+) sub
+WHERE c.id = sub.id AND sub.idx IS NOT NULL;
+
+-- fallback: ensure no NULLs remain
+UPDATE convective_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
+UPDATE fire_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
+"""
+
+# Clean DN suffixes ('-<id>') introduced earlier and recompute feature_index
+# by matching properties/DN to payload features.
+CLEAN_DN_SUFFIXES_SQL = """
+-- Remove appended -<id> suffixes from dn if present
+UPDATE convective_outlooks SET dn = regexp_replace(dn, '-[0-9]+$','') WHERE dn ~ '-[0-9]+$';
+UPDATE fire_outlooks SET dn = regexp_replace(dn, '-[0-9]+$','') WHERE dn ~ '-[0-9]+$';
+
+-- Recompute feature_index by matching properties JSON or DN within the payload features
+UPDATE convective_outlooks c SET feature_index = sub.idx
+FROM (
+    SELECT c2.id,
+        (SELECT (fe.ord - 1)
+         FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
+         WHERE (fe.elem->'properties') IS NOT NULL
+             AND ((fe.elem->'properties') = c2.properties OR (fe.elem->'properties'->>'DN') = c2.properties->>'DN')
+         LIMIT 1) AS idx
+    FROM convective_outlooks c2
+    WHERE c2.feature_index IS NULL
+) sub
+WHERE c.id = sub.id AND sub.idx IS NOT NULL;
+
+UPDATE fire_outlooks c SET feature_index = sub.idx
+FROM (
+    SELECT c2.id,
+        (SELECT (fe.ord - 1)
+         FROM jsonb_array_elements(c2.payload->'features') WITH ORDINALITY AS fe(elem, ord)
+         WHERE (fe.elem->'properties') IS NOT NULL
+             AND ((fe.elem->'properties') = c2.properties OR (fe.elem->'properties'->>'DN') = c2.properties->>'DN')
+         LIMIT 1) AS idx
+    FROM fire_outlooks c2
+    WHERE c2.feature_index IS NULL
+) sub
+WHERE c.id = sub.id AND sub.idx IS NOT NULL;
+
+-- fallback: set any remaining NULL indices to 0
+UPDATE convective_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
+UPDATE fire_outlooks SET feature_index = 0 WHERE feature_index IS NULL;
+"""
+
+
+def m007_spc_legacy_data_fixes(conn):
+    """One-off data repairs formerly re-run on every startup.
+
+    Migrates legacy *_features tables into the single-feature outlook tables
+    (renaming the old tables to *_old), normalizes geometries to Multi* and
+    repairs dn / feature_index values.
+    """
+    if conn.execute(text("SELECT to_regclass('public.convective_features')")).scalar():
+        _best_effort(conn, [
+            LEGACY_CONVECTIVE_FEATURES_SQL,
+            "ALTER TABLE IF EXISTS convective_features RENAME TO convective_features_old",
+        ])
+    if conn.execute(text("SELECT to_regclass('public.fire_features')")).scalar():
+        _best_effort(conn, [
+            LEGACY_FIRE_FEATURES_SQL,
+            "ALTER TABLE IF EXISTS fire_features RENAME TO fire_features_old",
+        ])
+    _best_effort(conn, [
+        "UPDATE convective_outlooks SET geom = ST_Multi(geom) WHERE geom IS NOT NULL AND left(GeometryType(geom), 5) <> 'MULTI'",
+        "UPDATE fire_outlooks SET geom = ST_Multi(geom) WHERE geom IS NOT NULL AND left(GeometryType(geom), 5) <> 'MULTI'",
+        BACKFILL_FROM_PAYLOAD_SQL,
+        RECOMPUTE_DN_FEATURE_INDEX_SQL,
+        CLEAN_DN_SUFFIXES_SQL,
+    ])
+
+
+def m008_worker_heartbeats(conn):
+    from .models import WorkerHeartbeat
+    WorkerHeartbeat.__table__.create(bind=conn, checkfirst=True)
+
+
+def m009_spc_job_queue(conn):
+    from .models import SpcRun, SpcJob
+    SpcRun.__table__.create(bind=conn, checkfirst=True)
+    SpcJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def m010_geometry_tiers(conn):
+    """Repair invalid geometries and add generated bbox / simplified tier columns."""
+    from .geometry import TIERED_COLUMNS, TIER_TOLERANCES, bbox_sql, tier_sql
+    for table, col in TIERED_COLUMNS:
+        stmts = [
+            f"UPDATE {table} SET {col} = ST_MakeValid({col}) WHERE {col} IS NOT NULL AND NOT ST_IsValid({col})",
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col}_bbox geometry(Geometry,4326) "
+            f"GENERATED ALWAYS AS ({bbox_sql(col)}) STORED",
+        ]
+        for tier in sorted(TIER_TOLERANCES):
+            stmts.append(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col}_s{tier} geometry(Geometry,4326) "
+                f"GENERATED ALWAYS AS ({tier_sql(col, tier)}) STORED"
+            )
+        stmts.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col}_bbox ON {table} USING GIST ({col}_bbox)")
+        # Every tiered read selects these columns: fail (and retry) rather than record a partial schema
+        for stmt in stmts:
+            conn.exec_driver_sql(stmt)
+
+
+def m011_spc_product_latest(conn):
+    from .models import SpcProductLatest
+    SpcProductLatest.__table__.create(bind=conn, checkfirst=True)
+    for kind, table in (('convective', 'convective_outlooks'), ('fire', 'fire_outlooks')):
+        conn.execute(text(
+            f"""
+            INSERT INTO spc_product_latest (product, kind, issue, updated_at)
+            SELECT product, '{kind}', max(issue), now() FROM {table} GROUP BY product
+            ON CONFLICT (product) DO NOTHING
+            """
+        ))
+
+
+def m012_alert_outlook_overlap(conn):
+    from .models import AlertOutlookOverlap
+    AlertOutlookOverlap.__table__.create(bind=conn, checkfirst=True)
+    # NULL fingerprints mark every existing row as not yet joined (`python -m app.overlap`)
+    _best_effort(conn, [
+        "ALTER TABLE alerts ADD COLUMN IF NOT EXISTS overlap_md5 varchar(32)",
+        "ALTER TABLE convective_outlooks ADD COLUMN IF NOT EXISTS overlap_md5 varchar(32)",
+        "ALTER TABLE fire_outlooks ADD COLUMN IF NOT EXISTS overlap_md5 varchar(32)",
+    ])
+
+
+def m013_raw_archive(conn):
+    from .models import RawArchiveEntry
+    RawArchiveEntry.__table__.create(bind=conn, checkfirst=True)
+
+
+def m014_spc_product_schedule(conn):
+    from .models import SpcProductSchedule
+    SpcProductSchedule.__table__.create(bind=conn, checkfirst=True)
+
+
+def m015_alerts_search_tsv(conn):
+    """Weighted full-text vector over the alert text, with a GIN index."""
+    from .search import tsvector_sql
+    # Rewrites alerts (every partition) once to fill the column
+    conn.exec_driver_sql(
+        f"ALTER TABLE alerts ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS ({tsvector_sql()}) STORED"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_alerts_search_tsv ON alerts USING GIN (search_tsv)")
+
+
+def m016_alert_properties_function(conn):
+    """`alert_properties(alerts)`: the full properties document of full or compact rows."""
+    from .properties import FUNCTION_SQL
+    conn.exec_driver_sql(FUNCTION_SQL)
+
+
+def m017_rollups(conn):
+    from .models import AlertRollupHourly, AlertStateRollupHourly, SpcDailyRollup
+    from .rollups import rebuild
+    for model in (AlertRollupHourly, AlertStateRollupHourly, SpcDailyRollup):
+        model.__table__.create(bind=conn, checkfirst=True)
+    # One aggregate pass over the stored history; ingest keeps them current from here
+    rebuild(conn)
+
+
+def m018_hazard_layers(conn):
+    from .models import DataVersion, HazardLayer
+    from .hazards import rebuild_all
+    # Change counters of the API caches (SPC risk, hazard layers, active alerts);
+    # rebuild_all bumps the layers' one
+    DataVersion.__table__.create(bind=conn, checkfirst=True)
+    HazardLayer.__table__.create(bind=conn, checkfirst=True)
+    rebuild_all(conn)
+
+
+def m020_rollups_new_alerts_only(conn):
+    """Recount the alert rollups without Update / Cancel messages."""
+    from .rollups import rebuild
+    rebuild(conn)
+
+
+MIGRATIONS = [
+    (1, 'postgis', m001_postgis),
+    (2, 'create_tables', m002_create_tables),
+    (3, 'partition_alerts', m003_partition_alerts),
+    (4, 'alerts_extracted_columns', m004_alerts_extracted_columns),
+    (5, 'alerts_indexes', m005_alerts_indexes),
+    (6, 'spc_outlook_schema', m006_spc_outlook_schema),
+    (7, 'spc_legacy_data_fixes', m007_spc_legacy_data_fixes),
+    (8, 'worker_heartbeats', m008_worker_heartbeats),
+    (9, 'spc_job_queue', m009_spc_job_queue),
+    (10, 'geometry_tiers', m010_geometry_tiers),
+    (11, 'spc_product_latest', m011_spc_product_latest),
+    (12, 'alert_outlook_overlap', m012_alert_outlook_overlap),
+    (13, 'raw_archive', m013_raw_archive),
+    (14, 'spc_product_schedule', m014_spc_product_schedule),
+    (15, 'alerts_search_tsv', m015_alerts_search_tsv),
+    (16, 'alert_properties_function', m016_alert_properties_function),
+    (17, 'rollups', m017_rollups),
+    (18, 'hazard_layers', m018_hazard_layers),
+    # 19 (data_versions) was folded into 18, which already had to create the table
+    (20, 'rollups_new_alerts_only', m020_rollups_new_alerts_only),
+]
+
+
+def applied_versions(engine):
+    """Return the set of applied versions, or None if the ledger doesn't exist yet."""
+    with engine.connect() as conn:
+        try:
+            return {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+        except DBAPIError:
+            return None
+
+
+def migrate(engine):
+    """Apply pending migrations. Returns the list of versions applied by this call."""
+    applied = applied_versions(engine)
+    if applied is not None and all(v in applied for v, _, _ in MIGRATIONS):
+        return []
+
+    done = []
+    for version, name, fn in MIGRATIONS:
+        if applied is not None and version in applied:
+            continue
+        with engine.begin() as conn:
+            # Serialize migrators; re-check the ledger once we hold the lock
+            conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": MIGRATION_LOCK_KEY})
+            conn.execute(text(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                  version integer PRIMARY KEY,
+                  name text NOT NULL,
+                  applied_at timestamptz NOT NULL DEFAULT now()
+                )
+                """
+            ))
+            already = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :v"), {"v": version}
+            ).scalar()
+            if already:
+                continue
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        print(f"migrations: applied {version:03d}_{name}")
+        done.append(version)
+    return done
@@ -1,18 +1,28 @@
-from sqlalchemy import Column, String, Integer, DateTime, func, Text, Numeric
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Date, func, Text, Numeric, Index, PrimaryKeyConstraint, Boolean, ForeignKey, Computed
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from geoalchemy2 import Geometry
 from sqlalchemy.sql import func as sqlfunc
 from .db import Base
+from .geometry import bbox_sql, tier_sql
+from .search import tsvector_sql
 
 class Alert(Base):
     __tablename__ = 'alerts'
+    # Range-partitioned by month of `sent` (see app.partitions); the partition
+    # key has to be part of the primary key.
+    __table_args__ = {'postgresql_partition_by': 'RANGE (sent)'}
     id = Column(String, primary_key=True)
     properties = Column(JSONB)
     geometry = Column(Geometry(geometry_type='GEOMETRY', srid=4326))
+    # Generated bbox and simplified tiers of `geometry` (see app.geometry)
+    geometry_bbox = Column(Geometry(geometry_type='GEOMETRY', srid=4326), Computed(bbox_sql('geometry'), persisted=True))
+    geometry_s1 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 1), persisted=True))
+    geometry_s2 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 2), persisted=True))
+    geometry_s3 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 3), persisted=True))
     received_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
 
     # Extracted top-level CAP / NWS properties for easier querying
-    sent = Column(DateTime(timezone=True), nullable=True)
+    sent = Column(DateTime(timezone=True), primary_key=True)
     effective = Column(DateTime(timezone=True), nullable=True)
     onset = Column(DateTime(timezone=True), nullable=True)
     expires = Column(DateTime(timezone=True), nullable=True)
@@ -61,9 +71,302 @@ class Alert(Base):
     affected_zones = Column(JSONB, nullable=True)
     references = Column(JSONB, nullable=True)
 
+    # Enrichment from alert_types / alert_keywords (see app.enrich)
+    type_emoji = Column(String(64), nullable=True)
+    keywords = Column(JSONB, nullable=True)
+    keyword_colors = Column(JSONB, nullable=True)
+    # Fingerprint of what alert_outlook_overlap was last computed from (see app.overlap)
+    overlap_md5 = Column(String(32), nullable=True)
+    # Weighted full-text vector of the alert text (GIN-indexed, see app.search)
+    search_tsv = Column(TSVECTOR, Computed(tsvector_sql(), persisted=True))
+
 class ApiKey(Base):
     __tablename__ = 'api_keys'
     id = Column(Integer, primary_key=True, autoincrement=True)
     key = Column(String, unique=True, index=True, nullable=False)
     owner = Column(String, nullable=True)
     active = Column(Integer, default=1)
+
+
+class VtecEvent(Base):
+    """Current state of a P-VTEC event, one row per office/phenomena/significance/ETN/year."""
+    __tablename__ = 'vtec_events'
+    office = Column(String(4), nullable=False)
+    phenomena = Column(String(2), nullable=False)
+    significance = Column(String(1), nullable=False)
+    etn = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False)
+
+    product_class = Column(String(1), nullable=True)
+    action = Column(String(3), nullable=True)
+    begin_time = Column(DateTime(timezone=True), nullable=True)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    raw = Column(String(64), nullable=True)
+
+    # Latest alert message that touched this event
+    alert_id = Column(String, nullable=True)
+    event = Column(String(512), nullable=True)
+    sent = Column(DateTime(timezone=True), nullable=True)
+    expires = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now(), onupdate=sqlfunc.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('office', 'phenomena', 'significance', 'etn', 'year'),
+        Index('idx_vtec_events_phen_sig_end', 'phenomena', 'significance', 'end_time'),
+        Index('idx_vtec_events_office_end', 'office', 'end_time'),
+        Index('idx_vtec_events_alert_id', 'alert_id'),
+    )
+
+
+class ActiveAlert(Base):
+    """Compact copy of the alerts currently in effect (maintained by ingest)."""
+    __tablename__ = 'active_alerts'
+    id = Column(String, primary_key=True)
+    geometry = Column(Geometry(geometry_type='GEOMETRY', srid=4326))
+    geometry_bbox = Column(Geometry(geometry_type='GEOMETRY', srid=4326), Computed(bbox_sql('geometry'), persisted=True))
+    geometry_s1 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 1), persisted=True))
+    geometry_s2 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 2), persisted=True))
+    geometry_s3 = Column(Geometry(geometry_type='GEOMETRY', srid=4326, spatial_index=False), Computed(tier_sql('geometry', 3), persisted=True))
+
+    sent = Column(DateTime(timezone=True), nullable=True)
+    effective = Column(DateTime(timezone=True), nullable=True)
+    onset = Column(DateTime(timezone=True), nullable=True)
+    expires = Column(DateTime(timezone=True), nullable=True)
+    ends = Column(DateTime(timezone=True), nullable=True)
+
+    status = Column(String(128), nullable=True)
+    message_type = Column(String(128), nullable=True)
+    category = Column(String(128), nullable=True)
+    severity = Column(String(128), nullable=True)
+    certainty = Column(String(128), nullable=True)
+    urgency = Column(String(128), nullable=True)
+    event = Column(String(512), nullable=True)
+    sender_name = Column(String(256), nullable=True)
+    headline = Column(String(512), nullable=True)
+    area_desc = Column(String(1024), nullable=True)
+    geocode_ugc = Column(JSONB, nullable=True)
+
+    type_emoji = Column(String(64), nullable=True)
+    keywords = Column(JSONB, nullable=True)
+    keyword_colors = Column(JSONB, nullable=True)
+
+    # Ids of the messages this alert updates/cancels (used to drop stale re-fetches)
+    ref_ids = Column(JSONB, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        Index('idx_active_alerts_event', 'event'),
+        Index('idx_active_alerts_ref_ids', 'ref_ids', postgresql_using='gin', postgresql_ops={'ref_ids': 'jsonb_path_ops'}),
+    )
+
+
+class WorkerHeartbeat(Base):
+    """Liveness of poller instances, per role (see app.leader)."""
+    __tablename__ = 'worker_heartbeats'
+    role = Column(String(64), primary_key=True)
+    instance_id = Column(String(256), primary_key=True)
+    hostname = Column(String(256), nullable=True)
+    pid = Column(Integer, nullable=True)
+    backend_pid = Column(Integer, nullable=True)
+    is_leader = Column(Boolean, nullable=False, default=False)
+    started_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+    last_seen = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+
+class SpcRun(Base):
+    """One scheduled SPC fetch cycle; its products are `SpcJob` rows."""
+    __tablename__ = 'spc_runs'
+    id = Column(BigInteger, primary_key=True)
+    # Schedule slot (e.g. the top of the hour); unique so a failover never enqueues a slot twice
+    scheduled_for = Column(DateTime(timezone=True), nullable=False, unique=True)
+    created_by = Column(String(256), nullable=True)
+    # queued -> running -> succeeded | partial | failed
+    status = Column(String(16), nullable=False, default='queued')
+    total = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class SpcJob(Base):
+    """One SPC product fetch, claimed by workers with FOR UPDATE SKIP LOCKED (see app.spc_jobs)."""
+    __tablename__ = 'spc_jobs'
+    id = Column(BigInteger, primary_key=True)
+    run_id = Column(BigInteger, ForeignKey('spc_runs.id', ondelete='CASCADE'), nullable=False)
+    name = Column(String(128), nullable=False)
+    url = Column(Text, nullable=False)
+    product = Column(String(128), nullable=False)
+
+    # queued -> running -> succeeded | failed (running jobs with an expired lease are reclaimable)
+    status = Column(String(16), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+    lease_owner = Column(String(256), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    # Timing of the last attempt
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    fetch_ms = Column(Integer, nullable=True)
+    store_ms = Column(Integer, nullable=True)
+    bytes = Column(Integer, nullable=True)
+    features = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('idx_spc_jobs_claim', 'status', 'available_at'),
+        Index('idx_spc_jobs_run_id', 'run_id'),
+    )
+
+
+class SpcProductLatest(Base):
+    """Latest stored issuance per SPC product (maintained by app.spc_ingest)."""
+    __tablename__ = 'spc_product_latest'
+    product = Column(String(128), primary_key=True)
+    # 'convective' or 'fire' (which *_outlooks table holds the features)
+    kind = Column(String(16), nullable=False)
+    issue = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+
+class SpcProductSchedule(Base):
+    """When each SPC product is next checked (maintained by app.spc_schedule)."""
+    __tablename__ = 'spc_product_schedule'
+    product = Column(String(128), primary_key=True)
+    name = Column(String(128), nullable=False)
+    url = Column(Text, nullable=False)
+    next_check_at = Column(DateTime(timezone=True), nullable=False, server_default=sqlfunc.now())
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)
+    # Latest ISSUE seen after a check, and when it last changed
+    last_issue = Column(DateTime(timezone=True), nullable=True)
+    last_new_issue_at = Column(DateTime(timezone=True), nullable=True)
+    checks = Column(BigInteger, nullable=False, server_default='0')
+    __table_args__ = (
+        Index('idx_spc_product_schedule_next_check', 'next_check_at'),
+    )
+
+
+class AlertOutlookOverlap(Base):
+    """Alert / SPC outlook feature pairs that intersect while the outlook was valid (see app.overlap)."""
+    __tablename__ = 'alert_outlook_overlap'
+    alert_id = Column(String, nullable=False)
+    alert_sent = Column(DateTime(timezone=True), nullable=False)
+    # 'convective' or 'fire'; outlook_id is the id in the matching *_outlooks table
+    kind = Column(String(16), nullable=False)
+    outlook_id = Column(Integer, nullable=False)
+
+    product = Column(String(128), nullable=True)
+    issue = Column(DateTime(timezone=True), nullable=True)
+    valid = Column(DateTime(timezone=True), nullable=True)
+    expire = Column(DateTime(timezone=True), nullable=True)
+    dn = Column(Text, nullable=True)
+    label = Column(Text, nullable=True)
+    event = Column(String(512), nullable=True)
+    # Share of the alert's area inside the outlook feature
+    alert_fraction = Column(Numeric, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('alert_id', 'alert_sent', 'kind', 'outlook_id'),
+        Index('idx_alert_outlook_overlap_event_label', 'event', 'label', 'alert_sent'),
+        Index('idx_alert_outlook_overlap_product_label', 'product', 'label', 'alert_sent'),
+        Index('idx_alert_outlook_overlap_outlook', 'kind', 'outlook_id'),
+        Index('idx_alert_outlook_overlap_sent', 'alert_sent'),
+    )
+
+
+class RawArchiveEntry(Base):
+    """Time index of archived raw payloads (objects live on disk, see app.archive)."""
+    __tablename__ = 'raw_archive'
+    id = Column(BigInteger, primary_key=True)
+    # 'nws' or 'spc'; name is 'alerts' or the SPC product
+    source = Column(String(16), nullable=False)
+    name = Column(String(128), nullable=False)
+    url = Column(Text, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    codec = Column(String(8), nullable=False)
+    size = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_raw_archive_fetched_at', 'fetched_at'),
+        Index('idx_raw_archive_source_fetched_at', 'source', 'fetched_at'),
+        Index('idx_raw_archive_sha256', 'sha256'),
+    )
+
+
+class AlertRollupHourly(Base):
+    """New Actual alerts per hour of `sent` (maintained by app.rollups)."""
+    __tablename__ = 'alert_rollup_hourly'
+    bucket = Column(DateTime(timezone=True), nullable=False)
+    event = Column(String(512), nullable=False)
+    severity = Column(String(128), nullable=False)
+    # sender_name, e.g. 'NWS Norman OK'
+    office = Column(String(256), nullable=False)
+    alerts = Column(BigInteger, nullable=False, server_default='0')
+
+    __table_args__ = (
+        PrimaryKeyConstraint('bucket', 'event', 'severity', 'office'),
+    )
+
+
+class AlertStateRollupHourly(Base):
+    """New Actual alerts per hour and UGC state (an alert counts once in each of its states)."""
+    __tablename__ = 'alert_state_rollup_hourly'
+    bucket = Column(DateTime(timezone=True), nullable=False)
+    state = Column(String(2), nullable=False)
+    event = Column(String(512), nullable=False)
+    severity = Column(String(128), nullable=False)
+    alerts = Column(BigInteger, nullable=False, server_default='0')
+
+    __table_args__ = (
+        PrimaryKeyConstraint('bucket', 'state', 'event', 'severity'),
+    )
+
+
+class SpcDailyRollup(Base):
+    """SPC outlook categories per convective day (maintained by app.rollups)."""
+    __tablename__ = 'spc_daily_rollup'
+    # Convective day: 12Z to 12Z, named by its starting date
+    day = Column(Date, nullable=False)
+    kind = Column(String(16), nullable=False)
+    product = Column(String(128), nullable=False)
+    # LABEL (e.g. 'MDT', '0.10'), else DN
+    label = Column(Text, nullable=False)
+    issuances = Column(Integer, nullable=False)
+    features = Column(Integer, nullable=False)
+    max_area_km2 = Column(Numeric, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('day', 'kind', 'product', 'label'),
+        Index('idx_spc_daily_rollup_product_day', 'product', 'day'),
+    )
+
+
+class HazardLayer(Base):
+    """Dissolved geometry per active NWS event type / SPC product category (see app.hazards)."""
+    __tablename__ = 'hazard_layers'
+    # 'nws': name is the event type, category ''; 'spc': name is the product, category its LABEL / DN
+    source = Column(String(8), nullable=False)
+    name = Column(String(512), nullable=False)
+    category = Column(Text, nullable=False, server_default='')
+    # Alerts / outlook features in the layer (zone-only alerts count but add no area)
+    members = Column(Integer, nullable=False)
+    geom = Column(Geometry(geometry_type='MULTIPOLYGON', srid=4326, spatial_index=False), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint('source', 'name', 'category'),
+    )
+
+
+class DataVersion(Base):
+    """Per-dataset change counters behind the API caches (see app.versions)."""
+    __tablename__ = 'data_versions'
+    name = Column(String(64), primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default='0')
+    updated_at = Column(DateTime(timezone=True), server_default=sqlfunc.now())
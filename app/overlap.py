@@ -0,0 +1,143 @@
+"""Incrementally maintained alert <-> SPC outlook overlaps.
+
+`alert_outlook_overlap` holds one row per (alert, outlook feature) pair whose
+geometries intersect while the outlook was valid (`valid <= alert.sent <
+expire`). Both sides keep an `overlap_md5` fingerprint of what the pairs were
+last computed from (geometry plus event / DN / label):
+
+- ingest calls `refresh_alert_overlaps` after each alert upsert;
+- spc_ingest calls `refresh_outlook_overlaps` after storing a product.
+
+Only rows whose fingerprint changed are re-joined, through the GiST indexes;
+unchanged re-fetches cost one indexed UPDATE that matches nothing.
+
+Backfill existing data with `python -m app.overlap`.
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+
+OUTLOOK_TABLES = {'convective': 'convective_outlooks', 'fire': 'fire_outlooks'}
+
+ALERT_MD5 = "md5(concat(ST_AsBinary({t}.geometry)::text, '|', {t}.event))"
+OUTLOOK_MD5 = "md5(concat(ST_AsBinary({t}.geom)::text, '|', {t}.dn, '|', {t}.label))"
+
+# Share of the alert's area inside the outlook polygon (NULL for zero-area alerts)
+FRACTION_SQL = "ST_Area(ST_Intersection(a.geometry, o.geom)) / NULLIF(ST_Area(a.geometry), 0)"
+
+# Outlook valid when the alert was sent
+VALID_AT_SENT = "(o.valid IS NULL OR o.valid <= a.sent) AND (o.expire IS NULL OR a.sent < o.expire)"
+
+INSERT_COLUMNS = """
+    alert_id, alert_sent, kind, outlook_id, product, issue, valid, expire, dn, label,
+    event, alert_fraction
+"""
+
+
+def _select_pairs(kind, table, where):
+    return f"""
+        SELECT a.id, a.sent, '{kind}', o.id, o.product, o.issue, o.valid, o.expire, o.dn, o.label,
+               a.event, {FRACTION_SQL}
+        FROM alerts a JOIN {table} o ON ST_Intersects(a.geometry, o.geom) AND {VALID_AT_SENT}
+        WHERE {where}
+    """
+
+
+def refresh_alert_overlaps(db, alert_id, sent):
+    """Re-join one alert against all outlooks if it changed since last time. Returns pairs written."""
+    changed = db.execute(text(
+        f"""
+        UPDATE alerts SET overlap_md5 = {ALERT_MD5.format(t='alerts')}
+        WHERE id = :id AND sent = :sent
+          AND overlap_md5 IS DISTINCT FROM {ALERT_MD5.format(t='alerts')}
+        RETURNING id
+        """
+    ), {"id": alert_id, "sent": sent}).first()
+    if changed is None:
+        return 0
+    db.execute(text(
+        "DELETE FROM alert_outlook_overlap WHERE alert_id = :id AND alert_sent = :sent"
+    ), {"id": alert_id, "sent": sent})
+    written = 0
+    for kind, table in OUTLOOK_TABLES.items():
+        res = db.execute(text(
+            f"""
+            INSERT INTO alert_outlook_overlap ({INSERT_COLUMNS})
+            {_select_pairs(kind, table, "a.id = :id AND a.sent = :sent")}
+            ON CONFLICT DO NOTHING
+            """
+        ), {"id": alert_id, "sent": sent})
+        written += res.rowcount or 0
+    return written
+
+
+def refresh_outlook_overlaps(conn, kind, product=None, since_tx_start=True):
+    """Re-join changed outlook features of `kind` (optionally one product) against alerts.
+
+    With `since_tx_start` only rows written by the current transaction are
+    considered (the SPC upsert stamps `created_at = now()`), which keeps the
+    per-fetch check to the product's fresh rows. Returns pairs written.
+    """
+    table = OUTLOOK_TABLES[kind]
+    where = [f"overlap_md5 IS DISTINCT FROM {OUTLOOK_MD5.format(t=table)}"]
+    params = {}
+    if product is not None:
+        where.append("product = :product")
+        params["product"] = product
+    if since_tx_start:
+        where.append("created_at = now()")
+    ids = [r.id for r in conn.execute(text(
+        f"""
+        UPDATE {table} SET overlap_md5 = {OUTLOOK_MD5.format(t=table)}
+        WHERE {" AND ".join(where)}
+        RETURNING id
+        """
+    ), params)]
+    if not ids:
+        return 0
+    conn.execute(text(
+        "DELETE FROM alert_outlook_overlap WHERE kind = :kind AND outlook_id = ANY(:ids)"
+    ), {"kind": kind, "ids": ids})
+    res = conn.execute(text(
+        f"""
+        INSERT INTO alert_outlook_overlap ({INSERT_COLUMNS})
+        {_select_pairs(kind, table, "o.id = ANY(:ids)")}
+        ON CONFLICT DO NOTHING
+        """
+    ), {"ids": ids})
+    return res.rowcount or 0
+
+
+def backfill(engine):
+    """Compute overlaps for all existing data (outlook side), then mark alerts in sync."""
+    total = 0
+    for kind, table in OUTLOOK_TABLES.items():
+        with engine.connect() as conn:
+            products = [r.product for r in conn.execute(text(f"SELECT DISTINCT product FROM {table}"))]
+        for product in products:
+            with engine.begin() as conn:
+                n = refresh_outlook_overlaps(conn, kind, product, since_tx_start=False)
+            total += n
+            print(f"overlap: {kind} {product}: {n} pairs")
+    # Every pair involving an existing alert was found from the outlook side
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"""
+            UPDATE alerts SET overlap_md5 = {ALERT_MD5.format(t='alerts')}
+            WHERE overlap_md5 IS DISTINCT FROM {ALERT_MD5.format(t='alerts')}
+            """
+        ))
+    return total
+
+
+def main():
+    argparse.ArgumentParser(description="Backfill alert_outlook_overlap from existing alerts and outlooks").parse_args()
+    from .db import engine
+    total = backfill(engine)
+    print(f"overlap: backfill wrote {total} pairs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Monthly range partitioning of `alerts` by `sent`, with retention/archival.
+
+- `ensure_alerts_partitioned` converts a legacy (unpartitioned) `alerts`
+  table once; the old table is kept as `alerts_unpartitioned`.
+- `ensure_partitions` creates month partitions from the oldest data (but
+  never before the retention cutoff) up to `ALERTS_PARTITION_MONTHS_AHEAD`
+  months ahead, plus a default partition.
+- `apply_retention` detaches partitions older than `ALERTS_RETENTION_MONTHS`,
+  exports them to gzip'd CSV under `ALERTS_ARCHIVE_DIR` and drops them. An
+  existing archive is never overwritten; a later export of the same month
+  gets a timestamped file name.
+
+Run maintenance manually with `python -m app.partitions [--retention]`.
+"""
+
+import argparse
+import gzip
+import os
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+MONTHS_AHEAD = int(os.getenv('ALERTS_PARTITION_MONTHS_AHEAD', '3'))
+# 0 disables retention (keep everything)
+RETENTION_MONTHS = int(os.getenv('ALERTS_RETENTION_MONTHS', '0'))
+ARCHIVE_DIR = Path(os.getenv('ALERTS_ARCHIVE_DIR', str(ROOT / 'archive' / 'alerts')))
+# How often the ingest loop re-runs maintenance
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv('ALERTS_PARTITION_CHECK_SECONDS', '3600'))
+
+DEFAULT_PARTITION = 'alerts_default'
+
+
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d, n):
+    m = d.month - 1 + n
+    return date(d.year + m // 12, m % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"alerts_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(conn):
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('public.alerts')")).scalar()
+    return kind == 'p'
+
+
+def existing_partitions(conn):
+    rows = conn.execute(text(
+        """
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.alerts'::regclass
+        """
+    )).all()
+    return {r.relname for r in rows}
+
+
+def _columns(conn, table):
+    rows = conn.execute(text(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass(:t) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """
+    ), {"t": table}).all()
+    return [r.attname for r in rows]
+
+
+def stored_sent(conn, alert_id):
+    """`sent` of the stored row(s) for `alert_id` (newest), or None.
+
+    Writers fall back to this when a message has no `sent`, so re-sending the
+    same id upserts its row instead of adding one per partition key.
+    """
+    return conn.execute(text("SELECT max(sent) FROM alerts WHERE id = :id"), {"id": alert_id}).scalar()
+
+
+def ensure_alerts_partitioned(conn):
+    """Convert an ordinary `alerts` table into a partitioned one (idempotent).
+
+    The legacy table and its indexes are renamed (non-destructive) and its
+    rows copied into the new partitions. Drop `alerts_unpartitioned` manually
+    once the copy has been verified.
+    """
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('public.alerts')")).scalar()
+    if kind != 'r':
+        return False
+
+    conn.execute(text("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sent timestamptz"))
+    conn.execute(text("UPDATE alerts SET sent = COALESCE(received_at, now()) WHERE sent IS NULL"))
+    conn.execute(text("ALTER TABLE alerts RENAME TO alerts_unpartitioned"))
+    # Index (and PK) names are schema-global; free them up for the new table
+    for r in conn.execute(text("SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = 'alerts_unpartitioned'")).all():
+        new_name = (r.indexname.replace('alerts', 'alerts_unpartitioned', 1) if 'alerts' in r.indexname
+                    else r.indexname + '_unpartitioned')[:63]
+        conn.execute(text(f'ALTER INDEX "{r.indexname}" RENAME TO "{new_name}"'))
+
+    conn.execute(text(
+        "CREATE TABLE alerts (LIKE alerts_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY RANGE (sent)"
+    ))
+    conn.execute(text("ALTER TABLE alerts ALTER COLUMN sent SET NOT NULL"))
+    conn.execute(text("ALTER TABLE alerts ADD PRIMARY KEY (id, sent)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_alerts_geometry ON alerts USING GIST (geometry)"))
+
+    ensure_partitions(conn)
+    cols = ', '.join(f'"{c}"' for c in _columns(conn, 'public.alerts'))
+    conn.execute(text(f"INSERT INTO alerts ({cols}) SELECT {cols} FROM alerts_unpartitioned"))
+    print("partitions: converted alerts to a partitioned table (legacy rows kept in alerts_unpartitioned)")
+    return True
+
+
+def create_month_partition(conn, month):
+    """Create the partition for `month`, moving any matching rows out of the default partition."""
+    name = partition_name(month)
+    start, end = month, _add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE alerts INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    if conn.execute(text(f"SELECT to_regclass('public.{DEFAULT_PARTITION}')")).scalar():
+        cols = ', '.join(f'"{c}"' for c in _columns(conn, 'public.alerts'))
+        conn.execute(text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE sent >= :start AND sent < :end RETURNING *
+            )
+            INSERT INTO {name} ({cols}) SELECT {cols} FROM moved
+            """
+        ), {"start": start, "end": end})
+    conn.execute(text(
+        f"ALTER TABLE alerts ATTACH PARTITION {name} FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def retention_cutoff(retention_months=None):
+    """First month kept under the retention window (None when retention is off)."""
+    retention_months = RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0:
+        return None
+    return _add_months(_month_start(date.today()), -retention_months)
+
+
+def ensure_partitions(conn, months_ahead=None, retention_months=None):
+    """Make sure month partitions exist from the oldest data to `months_ahead` months out.
+
+    Months before the retention cutoff are never (re)created: they were
+    archived already, and late rows for them stay in the default partition.
+    """
+    if not is_partitioned(conn):
+        return []
+    months_ahead = MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = existing_partitions(conn)
+    if DEFAULT_PARTITION not in existing:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF alerts DEFAULT"))
+
+    this_month = _month_start(date.today())
+    first = this_month
+    # Cover the oldest row we might be asked to hold (legacy copy / default partition)
+    for source in ('alerts_unpartitioned', DEFAULT_PARTITION):
+        if conn.execute(text(f"SELECT to_regclass('public.{source}')")).scalar():
+            oldest = conn.execute(text(f"SELECT min(sent) FROM {source}")).scalar()
+            if oldest is not None:
+                first = min(first, _month_start(oldest))
+    cutoff = retention_cutoff(retention_months)
+    if cutoff is not None:
+        first = max(first, cutoff)
+
+    created = []
+    month = first
+    last = _add_months(this_month, months_ahead)
+    while month <= last:
+        if partition_name(month) not in existing:
+            create_month_partition(conn, month)
+            created.append(partition_name(month))
+        month = _add_months(month, 1)
+    return created
+
+
+def archive_path(archive_dir, name):
+    """`<name>.csv.gz` under `archive_dir`, or a timestamped name if that already exists."""
+    dest = Path(archive_dir) / f"{name}.csv.gz"
+    if not dest.exists():
+        return dest
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    n = 0
+    while True:
+        suffix = f"{stamp}" if n == 0 else f"{stamp}_{n}"
+        dest = Path(archive_dir) / f"{name}.{suffix}.csv.gz"
+        if not dest.exists():
+            return dest
+        n += 1
+
+
+def _export_partition(conn, name, dest):
+    """COPY a (detached) partition to a gzip'd CSV file. Returns rows written."""
+    if dest.exists():
+        raise FileExistsError(f"refusing to overwrite archive {dest}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_suffix(dest.suffix + '.tmp')
+    raw = conn.connection.driver_connection
+    with raw.cursor() as cur, gzip.open(tmp, 'wb') as fh:
+        with cur.copy(f"COPY (SELECT * FROM {name}) TO STDOUT WITH (FORMAT csv, HEADER true)") as copy:
+            for chunk in copy:
+                fh.write(chunk)
+    tmp.replace(dest)
+    return conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+
+
+def apply_retention(conn, retention_months=None, archive_dir=None):
+    """Detach, archive and drop partitions entirely older than the retention window."""
+    cutoff = retention_cutoff(retention_months)
+    if cutoff is None or not is_partitioned(conn):
+        return []
+    archive_dir = Path(archive_dir or ARCHIVE_DIR)
+
+    archived = []
+    for name in sorted(existing_partitions(conn)):
+        if not name.startswith('alerts_p'):
+            continue
+        try:
+            year, month = int(name[8:12]), int(name[13:15])
+        except ValueError:
+            continue
+        if _add_months(date(year, month, 1), 1) > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE alerts DETACH PARTITION {name}"))
+        if not conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            # Nothing to archive; don't leave header-only files behind
+            conn.execute(text(f"DROP TABLE {name}"))
+            continue
+        dest = archive_path(archive_dir, name)
+        rows = _export_partition(conn, name, dest)
+        conn.execute(text(f"DROP TABLE {name}"))
+        conn.execute(text(
+            "DELETE FROM alert_outlook_overlap WHERE alert_sent >= :start AND alert_sent < :end"
+        ), {"start": date(year, month, 1), "end": _add_months(date(year, month, 1), 1)})
+        archived.append((name, rows, str(dest)))
+        print(f"partitions: archived {name} ({rows} rows) -> {dest}")
+    return archived
+
+
+_last_maintenance = 0.0
+
+
+def maintain(engine, force=False):
+    """Create upcoming partitions and apply retention, at most once per interval."""
+    global _last_maintenance
+    now = time.monotonic()
+    if not force and _last_maintenance and now - _last_maintenance < MAINTENANCE_INTERVAL_SECONDS:
+        return
+    _last_maintenance = now
+    try:
+        with engine.begin() as conn:
+            ensure_partitions(conn)
+        with engine.begin() as conn:
+            apply_retention(conn)
+    except Exception as e:
+        print(f"partitions: maintenance failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alerts partition maintenance")
+    parser.add_argument("--months-ahead", type=int, default=None)
+    parser.add_argument("--retention", type=int, default=None, help="Months to keep (overrides ALERTS_RETENTION_MONTHS)")
+    args = parser.parse_args()
+
+    from .db import engine
+    with engine.begin() as conn:
+        ensure_alerts_partitioned(conn)
+        created = ensure_partitions(conn, args.months_ahead, args.retention)
+    print(f"partitions: created {len(created)} partition(s)")
+    if args.retention is not None or RETENTION_MONTHS > 0:
+        with engine.begin() as conn:
+            apply_retention(conn, args.retention)
+
+
+if __name__ == '__main__':
+    main()
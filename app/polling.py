@@ -0,0 +1,102 @@
+"""Adaptive NWS poll interval.
+
+After every poll `AdaptiveInterval.next_delay` picks the next sleep:
+
+- new Extreme/Severe + Immediate alerts -> `POLL_MIN_SECONDS` right away;
+- other changes (new/updated alerts, a new feed `updated` stamp) -> halve;
+- nothing changed (including 304 Not Modified) -> grow by `POLL_BACKOFF`
+  up to `POLL_MAX_SECONDS`;
+- errors -> double, and never sooner than a `Retry-After` header;
+- never sooner than the response's `Cache-Control: max-age`, since NWS
+  would serve the same cached document again.
+
+`POLL_JITTER` (fraction) spreads polls so replicas and restarts don't align.
+With `POLL_ADAPTIVE=0` the interval is fixed at `POLL_INTERVAL_SECONDS`
+(still honoring `Retry-After`).
+"""
+
+import os
+import random
+import re
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+ADAPTIVE = os.getenv('POLL_ADAPTIVE', '1') in ('1', 'true', 'True')
+INTERVAL_SECONDS = float(os.getenv('POLL_INTERVAL_SECONDS', '300'))
+MIN_SECONDS = float(os.getenv('POLL_MIN_SECONDS', '15'))
+MAX_SECONDS = float(os.getenv('POLL_MAX_SECONDS', str(INTERVAL_SECONDS)))
+BACKOFF = float(os.getenv('POLL_BACKOFF', '1.5'))
+JITTER = float(os.getenv('POLL_JITTER', '0.1'))
+
+URGENT_SEVERITIES = {'Extreme', 'Severe'}
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def is_urgent(properties):
+    """Alerts worth polling fast for: Extreme/Severe with Immediate urgency."""
+    return properties.get('severity') in URGENT_SEVERITIES and properties.get('urgency') == 'Immediate'
+
+
+def cache_max_age(headers):
+    """`max-age` of a Cache-Control header in seconds, or None."""
+    m = _MAX_AGE.search((headers or {}).get('Cache-Control', '') or '')
+    return int(m.group(1)) if m else None
+
+
+def retry_after(headers):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = ((headers or {}).get('Retry-After') or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveInterval:
+    """Chooses the delay before the next poll from the last poll's result."""
+
+    def __init__(self, min_seconds=MIN_SECONDS, max_seconds=MAX_SECONDS, backoff=BACKOFF, jitter=JITTER,
+                 adaptive=ADAPTIVE, fixed_seconds=INTERVAL_SECONDS, rng=None):
+        self.min = min(min_seconds, max_seconds)
+        self.max = max_seconds
+        self.backoff = backoff
+        self.jitter = jitter
+        self.adaptive = adaptive
+        self.fixed = fixed_seconds
+        self.current = self.max
+        self.last_updated = None
+        self.rng = rng or random.Random()
+
+    def next_delay(self, result):
+        """Seconds to sleep given a poll result dict (see `app.ingest.fetch_and_store`)."""
+        if not self.adaptive:
+            return max(self.fixed, result.get('retry_after') or 0)
+
+        updated = result.get('updated')
+        feed_changed = updated is not None and updated != self.last_updated
+        if updated is not None:
+            self.last_updated = updated
+
+        if result.get('error'):
+            self.current = min(self.max, self.current * 2)
+        elif result.get('urgent'):
+            self.current = self.min
+        elif result.get('changed') or feed_changed:
+            self.current = max(self.min, self.current / 2)
+        else:
+            self.current = min(self.max, self.current * self.backoff)
+
+        delay = self.current
+        if self.jitter > 0:
+            delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        # Upstream hints are floors; jitter never takes us below them
+        return max(delay, result.get('max_age') or 0, result.get('retry_after') or 0)
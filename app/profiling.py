@@ -0,0 +1,260 @@
+"""Per-request timing (SQL, serialization, response size) and sampling profiler.
+
+With `REQUEST_TIMING=1` an ASGI middleware tracks, for every request: SQL
+statement count, DB time and rows (via SQLAlchemy cursor events), named
+spans such as `build` (row -> dict) and `serialize` (everything after the
+endpoint returns: response model validation, `jsonable_encoder` and JSON
+rendering, timed by `TimedRoute`), and response bytes. The numbers go out in a `Server-Timing` header and requests
+slower than `REQUEST_SLOW_MS` are logged.
+
+With `REQUEST_PROFILE_MS` > 0 a share (`REQUEST_PROFILE_SAMPLE`) of requests
+is also sampled every `REQUEST_PROFILE_INTERVAL_MS`; requests slower than the
+threshold dump folded stacks (`flamegraph.pl` / speedscope format) to
+`REQUEST_PROFILE_DIR`. A profile covers the whole process while the request
+ran, not that request alone: async handlers of concurrent requests all run
+on the event-loop thread, so their stacks are mixed in (each stack is rooted
+at its thread name). Profile under low concurrency to isolate one endpoint.
+
+When both are off nothing is installed: no middleware, no event listeners,
+and `span()` is a single context-variable lookup.
+"""
+
+import functools
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+TIMING_ENABLED = os.getenv('REQUEST_TIMING', '0') in ('1', 'true', 'True')
+SLOW_MS = float(os.getenv('REQUEST_SLOW_MS', '1000'))
+# 0 disables the sampling profiler
+PROFILE_THRESHOLD_MS = float(os.getenv('REQUEST_PROFILE_MS', '0'))
+PROFILE_SAMPLE = float(os.getenv('REQUEST_PROFILE_SAMPLE', '1.0'))
+PROFILE_INTERVAL_MS = float(os.getenv('REQUEST_PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = Path(os.getenv('REQUEST_PROFILE_DIR', str(ROOT / 'profiles')))
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    __slots__ = ('start', 'sql_count', 'db_seconds', 'rows', 'spans', 'response_bytes', 'status', 'endpoint_done')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.spans = {}
+        self.response_bytes = 0
+        self.status = None
+        # perf_counter() when the endpoint returned (set by TimedRoute)
+        self.endpoint_done = None
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        elapsed = time.perf_counter() - self.start
+        parts = [f'db;dur={1000 * self.db_seconds:.2f};desc="{self.sql_count} queries, {self.rows} rows"']
+        parts += [f"{name};dur={1000 * s:.2f}" for name, s in self.spans.items()]
+        parts.append(f"app;dur={1000 * elapsed:.2f}")
+        return ", ".join(parts)
+
+
+def current():
+    """Timing of the request being handled, or None (timing off / outside a request)."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Add the enclosed block's wall time to the current request under `name`."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_span(name, time.perf_counter() - start)
+
+
+def _mark_endpoint_done(endpoint):
+    """Wrap `endpoint` to note when it returns (signature kept for FastAPI)."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _note_endpoint_done()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _note_endpoint_done()
+    return wrapper
+
+
+def _note_endpoint_done():
+    timing = _current.get()
+    if timing is not None:
+        timing.endpoint_done = time.perf_counter()
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that reports the time from the endpoint's return to the finished
+    response (validation, `jsonable_encoder`, rendering) as the `serialize` span."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timing = _current.get()
+            if timing is not None and timing.endpoint_done is not None:
+                timing.add_span('serialize', time.perf_counter() - timing.endpoint_done)
+                timing.endpoint_done = None
+            return response
+
+        return timed_handler
+
+
+def instrument_engine(eng):
+    """Count statements, DB time and rows of requests running on `eng`."""
+    eng = getattr(eng, 'sync_engine', eng)
+    if getattr(eng, '_request_timing', False):
+        return
+    eng._request_timing = True
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault('request_timing_start', []).append(time.perf_counter())
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        timing = _current.get()
+        starts = conn.info.get('request_timing_start')
+        if timing is None or not starts:
+            return
+        timing.db_seconds += time.perf_counter() - starts.pop()
+        timing.sql_count += 1
+        if cursor.rowcount and cursor.rowcount > 0:
+            timing.rows += cursor.rowcount
+
+
+class _Sampler(threading.Thread):
+    """Collects folded stacks of all other threads until stopped."""
+
+    def __init__(self, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def _dump_profile(scope, elapsed_ms, stacks):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    route = scope.get('path', '/').strip('/').replace('/', '_') or 'root'
+    path = PROFILE_DIR / f"{stamp}-{scope.get('method', 'GET')}-{route}-{int(elapsed_ms)}ms.folded"
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+    return path
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware (no extra task per request, unlike BaseHTTPMiddleware)."""
+
+    def __init__(self, app, timing=True, profile_ms=0.0):
+        self.app = app
+        self.timing = timing
+        self.profile_ms = profile_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        sampler = None
+        if self.profile_ms > 0 and random.random() < PROFILE_SAMPLE:
+            sampler = _Sampler(PROFILE_INTERVAL_MS / 1000.0)
+            sampler.start()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                timing.status = message['status']
+                if self.timing:
+                    MutableHeaders(scope=message).append('Server-Timing', timing.server_timing())
+            elif message['type'] == 'http.response.body':
+                timing.response_bytes += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed_ms = 1000 * (time.perf_counter() - timing.start)
+            if sampler is not None:
+                sampler.stop()
+                if elapsed_ms >= self.profile_ms and sampler.stacks:
+                    try:
+                        path = _dump_profile(scope, elapsed_ms, sampler.stacks)
+                        print(f"profiling: {scope.get('method')} {scope.get('path')} took {elapsed_ms:.0f}ms, stacks in {path}")
+                    except OSError as e:
+                        print(f"profiling: failed to write profile: {e}")
+            if self.timing and elapsed_ms >= SLOW_MS:
+                spans = " ".join(f"{k}={1000 * v:.1f}ms" for k, v in timing.spans.items())
+                print(f"slow request: {scope.get('method')} {scope.get('path')} status={timing.status} "
+                      f"total={elapsed_ms:.1f}ms db={1000 * timing.db_seconds:.1f}ms sql={timing.sql_count} "
+                      f"rows={timing.rows} bytes={timing.response_bytes} {spans}")
+
+
+def install(app, engines):
+    """Add the middleware and SQL hooks if timing or profiling is enabled."""
+    if not (TIMING_ENABLED or PROFILE_THRESHOLD_MS > 0):
+        return
+    for eng in engines:
+        instrument_engine(eng)
+    # Routes declared after this point are timed (install before the route decorators)
+    app.router.route_class = TimedRoute
+    app.add_middleware(TimingMiddleware, timing=TIMING_ENABLED, profile_ms=PROFILE_THRESHOLD_MS)
@@ -0,0 +1,186 @@
+"""Compact storage of alert `properties`.
+
+Ingest extracts most alert properties into typed columns (`headline`,
+`description`, `parameters`, ...). With `ALERTS_PROPERTIES_MODE=compact`,
+`alerts.properties` only keeps the residual keys: a key is dropped when its
+value is stored verbatim in its column. Timestamps always stay in
+`properties` (the columns normalize their offsets).
+
+Reads rebuild the original document with the `alert_properties(alerts)` SQL
+function (migration 16): the non-NULL columns overlaid with whatever the
+residual holds, so full and compact rows both come back unchanged.
+
+Existing rows are converted (or restored) per partition in batches with
+`python -m app.properties --compact` / `--expand`; `--report` shows the
+per-partition `properties` size and how many rows can still be compacted.
+"""
+
+import argparse
+import os
+
+from sqlalchemy import text
+
+
+# full (default): keep the whole document; compact: residual keys only
+MODE = os.getenv('ALERTS_PROPERTIES_MODE', 'full')
+BATCH_ROWS = int(os.getenv('ALERTS_COMPACT_BATCH_ROWS', '5000'))
+
+# property key -> (column, kind); text columns only hold JSON strings
+EXTRACTED_PROPERTIES = {
+    'status': ('status', 'text'),
+    'messageType': ('message_type', 'text'),
+    'category': ('category', 'text'),
+    'severity': ('severity', 'text'),
+    'certainty': ('certainty', 'text'),
+    'urgency': ('urgency', 'text'),
+    'event': ('event', 'text'),
+    'senderName': ('sender_name', 'text'),
+    'headline': ('headline', 'text'),
+    'areaDesc': ('area_desc', 'text'),
+    'description': ('description', 'text'),
+    'instruction': ('instruction', 'text'),
+    'response': ('response', 'text'),
+    'geocode': ('geocode', 'json'),
+    'parameters': ('parameters', 'json'),
+    'affectedZones': ('affected_zones', 'json'),
+    'references': ('references', 'json'),
+}
+
+
+def compact_properties(properties):
+    """`properties` without the keys whose values go verbatim into extracted columns."""
+    out = {}
+    for key, value in properties.items():
+        kind = EXTRACTED_PROPERTIES.get(key, (None, None))[1]
+        if value is not None and (kind == 'json' or (kind == 'text' and isinstance(value, str))):
+            continue
+        out[key] = value
+    return out
+
+
+def stored_properties(properties):
+    """What ingest writes to `alerts.properties` in the configured mode."""
+    return compact_properties(properties) if MODE == 'compact' else properties
+
+
+def full_properties_sql(prefix=''):
+    """SQL rebuilding the original document from a row (`prefix` qualifies columns, e.g. `a.`)."""
+    parts = [
+        f"CASE WHEN {prefix}\"{col}\" IS NULL THEN CAST('{{}}' AS jsonb) "
+        f"ELSE jsonb_build_object('{key}', {prefix}\"{col}\") END"
+        for key, (col, _) in EXTRACTED_PROPERTIES.items()
+    ]
+    # Residual keys win, so rows stored in full mode come back as stored
+    return (
+        f"CASE WHEN {prefix}properties IS NULL THEN NULL "
+        f"ELSE {' || '.join(parts)} || {prefix}properties END"
+    )
+
+
+def strippable_keys_sql(prefix=''):
+    """SQL array of the keys a row's `properties` holds verbatim in a column."""
+    checks = [
+        f"CASE WHEN {prefix}properties -> '{key}' = to_jsonb({prefix}\"{col}\") THEN '{key}' END"
+        for key, (col, _) in EXTRACTED_PROPERTIES.items()
+    ]
+    return f"array_remove(ARRAY[{', '.join(checks)}], NULL)"
+
+
+FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION alert_properties(a alerts) RETURNS jsonb
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT {full_properties_sql('a.')}
+$$
+"""
+
+
+def _tables(conn):
+    from .partitions import existing_partitions, is_partitioned
+    return sorted(existing_partitions(conn)) if is_partitioned(conn) else ['alerts']
+
+
+def partition_report(conn, table):
+    """Rows, rows still holding extracted keys, `properties` bytes and total size of one table."""
+    r = conn.execute(text(
+        f"""
+        SELECT count(*) AS rows,
+               count(*) FILTER (WHERE cardinality({strippable_keys_sql()}) > 0) AS compactable,
+               coalesce(sum(pg_column_size(properties)), 0) AS properties_bytes,
+               pg_total_relation_size(CAST(:t AS regclass)) AS total_bytes
+        FROM {table}
+        """
+    ), {"t": table}).one()
+    return {"table": table, "rows": r.rows, "compactable": r.compactable,
+            "properties_bytes": r.properties_bytes, "total_bytes": r.total_bytes}
+
+
+def _rewrite(engine, table, set_sql, where_sql, batch_rows):
+    """Apply `SET properties = <set_sql>` to rows matching `where_sql`, one batch per transaction."""
+    done = 0
+    while True:
+        with engine.begin() as conn:
+            n = conn.execute(text(
+                f"""
+                UPDATE {table} SET properties = {set_sql}
+                WHERE ctid = ANY(ARRAY(SELECT ctid FROM {table} WHERE {where_sql} LIMIT :n))
+                """
+            ), {"n": batch_rows}).rowcount
+        done += n
+        if n < batch_rows:
+            return done
+
+
+def compact_table(engine, table, batch_rows=None):
+    """Drop extracted keys from `properties` of existing rows. Returns rows rewritten."""
+    keys = strippable_keys_sql()
+    return _rewrite(engine, table, f"properties - {keys}", f"cardinality({keys}) > 0", batch_rows or BATCH_ROWS)
+
+
+def expand_table(engine, table, batch_rows=None):
+    """Restore full `properties` documents (e.g. before going back to full mode)."""
+    full = full_properties_sql(f"{table}.")
+    return _rewrite(engine, table, full, f"properties IS DISTINCT FROM {full}", batch_rows or BATCH_ROWS)
+
+
+def _mb(n):
+    return f"{n / 1e6:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact or expand stored alert properties")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--report", action="store_true", help="Only report sizes (default)")
+    group.add_argument("--compact", action="store_true", help="Strip extracted keys from existing rows")
+    group.add_argument("--expand", action="store_true", help="Restore full documents in existing rows")
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM each table afterwards so the space can be reused")
+    args = parser.parse_args()
+
+    from .db import engine
+    with engine.connect() as conn:
+        tables = _tables(conn)
+    saved = 0
+    for table in tables:
+        with engine.connect() as conn:
+            before = partition_report(conn, table)
+        if not (args.compact or args.expand):
+            print(f"{table}: {before['rows']} rows, {before['compactable']} compactable, "
+                  f"properties {_mb(before['properties_bytes'])}, table {_mb(before['total_bytes'])}")
+            continue
+        rewritten = (compact_table if args.compact else expand_table)(engine, table, args.batch)
+        if args.vacuum and rewritten:
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(f"VACUUM (ANALYZE) {table}"))
+        with engine.connect() as conn:
+            after = partition_report(conn, table)
+        delta = before['properties_bytes'] - after['properties_bytes']
+        saved += delta
+        print(f"{table}: rewrote {rewritten} rows, properties {_mb(before['properties_bytes'])} -> "
+              f"{_mb(after['properties_bytes'])} ({_mb(delta)} reclaimed), table {_mb(after['total_bytes'])}")
+    if args.compact or args.expand:
+        print(f"properties: {_mb(saved)} reclaimed in total "
+              f"(reusable after VACUUM; VACUUM FULL returns it to the OS)")
+
+
+if __name__ == '__main__':
+    main()
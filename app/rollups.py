@@ -0,0 +1,170 @@
+"""Incrementally maintained rollups behind the `/stats` endpoints.
+
+- `alert_rollup_hourly`: new alerts per hour of `sent`, event, severity and
+  office (`sender_name`);
+- `alert_state_rollup_hourly`: the same per state, taken from the first two
+  letters of the alert's UGC codes (marine areas such as `GM` included); an
+  alert counts once in each state it covers;
+- `spc_daily_rollup`: per convective day (12Z-12Z), SPC product and
+  category: issuances, features and the largest area (km²).
+
+Only Actual messages of type Alert count: Updates and Cancels continue an
+existing alert and would count it again. Ingest adds each newly inserted
+alert in its own upsert transaction; spc_ingest recomputes the days touched
+by a product's latest issuance.
+Rebuild from history with `python -m app.rollups [--since ...]`.
+"""
+
+import argparse
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+
+UNKNOWN = 'Unknown'
+
+OUTLOOK_TABLES = {'convective': 'convective_outlooks', 'fire': 'fire_outlooks'}
+
+# Convective day of an outlook feature (12Z to 12Z, named by its start date)
+SPC_DAY_SQL = "CAST((coalesce(valid, issue) - interval '12 hours') AT TIME ZONE 'UTC' AS date)"
+SPC_LABEL_SQL = "coalesce(label, dn, 'NA')"
+
+# Distinct UGC states of the row `a`
+STATES_SQL = """
+    SELECT DISTINCT upper(left(u, 2)) AS state
+    FROM jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(a.geocode_ugc) = 'array' THEN a.geocode_ugc ELSE CAST('[]' AS jsonb) END
+    ) u
+    WHERE length(u) >= 2
+"""
+
+ALERT_ROLLUP_SQL = text(
+    """
+    INSERT INTO alert_rollup_hourly (bucket, event, severity, office, alerts)
+    VALUES (date_trunc('hour', CAST(:sent AS timestamptz), 'UTC'), :event, :severity, :office, 1)
+    ON CONFLICT (bucket, event, severity, office) DO UPDATE SET alerts = alert_rollup_hourly.alerts + 1
+    """
+)
+
+STATE_ROLLUP_SQL = text(
+    """
+    INSERT INTO alert_state_rollup_hourly (bucket, state, event, severity, alerts)
+    VALUES (date_trunc('hour', CAST(:sent AS timestamptz), 'UTC'), :state, :event, :severity, 1)
+    ON CONFLICT (bucket, state, event, severity) DO UPDATE SET alerts = alert_state_rollup_hourly.alerts + 1
+    """
+)
+
+
+def is_counted(values):
+    """Whether an alert message counts (keep in step with `counted_sql`)."""
+    return values.get('status') == 'Actual' and values.get('message_type') == 'Alert'
+
+
+def counted_sql(prefix=''):
+    return f"{prefix}status = 'Actual' AND {prefix}message_type = 'Alert'"
+
+
+def ugc_states(ugc):
+    """Distinct two-letter states / marine areas of a list of UGC codes."""
+    return sorted({u[:2].upper() for u in ugc or [] if isinstance(u, str) and len(u) >= 2})
+
+
+def record_alert(db, values):
+    """Count one newly inserted alert (`values` are its `alerts` upsert columns)."""
+    if not is_counted(values):
+        return
+    params = {
+        "sent": values['sent'],
+        "event": values.get('event') or UNKNOWN,
+        "severity": values.get('severity') or UNKNOWN,
+    }
+    db.execute(ALERT_ROLLUP_SQL, {**params, "office": values.get('sender_name') or UNKNOWN})
+    states = ugc_states(values.get('geocode_ugc'))
+    if states:
+        db.execute(STATE_ROLLUP_SQL, [{**params, "state": s} for s in states])
+
+
+def refresh_spc_days(conn, kind, product):
+    """Recompute the rollup days covered by a product's latest stored issuance."""
+    table = OUTLOOK_TABLES[kind]
+    days = [r.day for r in conn.execute(text(
+        f"""
+        SELECT DISTINCT {SPC_DAY_SQL} AS day FROM {table}
+        WHERE product = :product AND issue = (SELECT issue FROM spc_product_latest WHERE product = :product)
+        """
+    ), {"product": product})]
+    days = [d for d in days if d is not None]
+    if days:
+        _rebuild_spc(conn, kind, "product = :product AND day = ANY(:days)",
+                     {"product": product, "days": days})
+    return days
+
+
+def _rebuild_spc(conn, kind, where, params):
+    """Replace spc_daily_rollup rows of `kind` matching `where` (over columns day / product)."""
+    table = OUTLOOK_TABLES[kind]
+    conn.execute(text(f"DELETE FROM spc_daily_rollup WHERE kind = :kind AND {where}"), {**params, "kind": kind})
+    conn.execute(text(
+        f"""
+        INSERT INTO spc_daily_rollup (day, kind, product, label, issuances, features, max_area_km2, updated_at)
+        SELECT day, :kind, product, label, count(DISTINCT issue), count(*), max(area_km2), now()
+        FROM (
+            SELECT {SPC_DAY_SQL} AS day, product, {SPC_LABEL_SQL} AS label, issue,
+                   ST_Area(CAST(geom AS geography)) / 1e6 AS area_km2
+            FROM {table}
+        ) f
+        WHERE day IS NOT NULL AND {where}
+        GROUP BY day, product, label
+        """
+    ), {**params, "kind": kind})
+
+
+def rebuild(conn, since=None):
+    """Recompute every rollup from `since` (default: all history)."""
+    since = since or datetime(1970, 1, 1, tzinfo=timezone.utc)
+    params = {"since": since}
+    conn.execute(text("DELETE FROM alert_rollup_hourly WHERE bucket >= date_trunc('hour', CAST(:since AS timestamptz), 'UTC')"), params)
+    conn.execute(text("DELETE FROM alert_state_rollup_hourly WHERE bucket >= date_trunc('hour', CAST(:since AS timestamptz), 'UTC')"), params)
+    # Whole hours only, so the first bucket is not half counted
+    conn.execute(text(
+        f"""
+        INSERT INTO alert_rollup_hourly (bucket, event, severity, office, alerts)
+        SELECT date_trunc('hour', sent, 'UTC'), coalesce(event, :unknown), coalesce(severity, :unknown),
+               coalesce(sender_name, :unknown), count(*)
+        FROM alerts
+        WHERE {counted_sql()} AND sent >= date_trunc('hour', CAST(:since AS timestamptz), 'UTC')
+        GROUP BY 1, 2, 3, 4
+        """
+    ), {**params, "unknown": UNKNOWN})
+    conn.execute(text(
+        f"""
+        INSERT INTO alert_state_rollup_hourly (bucket, state, event, severity, alerts)
+        SELECT date_trunc('hour', a.sent, 'UTC'), s.state, coalesce(a.event, :unknown),
+               coalesce(a.severity, :unknown), count(*)
+        FROM alerts a CROSS JOIN LATERAL ({STATES_SQL}) s
+        WHERE {counted_sql('a.')} AND a.sent >= date_trunc('hour', CAST(:since AS timestamptz), 'UTC')
+        GROUP BY 1, 2, 3, 4
+        """
+    ), {**params, "unknown": UNKNOWN})
+    day = since.date() if isinstance(since, datetime) else since
+    for kind in OUTLOOK_TABLES:
+        _rebuild_spc(conn, kind, "day >= :day", {"day": day})
+
+
+def _parse_time(value):
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the alert / SPC rollups from stored history")
+    parser.add_argument("--since", type=_parse_time, default=None, help="ISO time (UTC if no offset); default: everything")
+    args = parser.parse_args()
+    from .db import engine
+    with engine.begin() as conn:
+        rebuild(conn, args.since)
+    print(f"rollups: rebuilt since {args.since or 'the beginning'}")
+
+
+if __name__ == '__main__':
+    main()
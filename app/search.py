@@ -0,0 +1,77 @@
+"""Full-text search over alert text.
+
+`alerts.search_tsv` is a stored generated `tsvector` (GIN-indexed), so
+PostgreSQL keeps it current on every ingest upsert. Fields are weighted:
+
+- `headline`: A
+- `parameters_nwsheadline`: B
+- `description`: C
+- `instruction`: D
+
+`search_query` builds the `GET /alerts/search` query: the text is parsed
+with `websearch_to_tsquery` (quoted phrases, `or`, `-word`), matches are
+ranked with `ts_rank`, and `ts_headline` snippets are only computed for the
+returned page.
+"""
+
+from sqlalchemy import text
+
+
+# Text search configuration baked into the generated column
+SEARCH_CONFIG = 'english'
+
+SEARCH_WEIGHTS = [
+    ('headline', 'A'),
+    ('parameters_nwsheadline', 'B'),
+    ('description', 'C'),
+    ('instruction', 'D'),
+]
+
+# ts_headline options for the returned snippets
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'
+
+SORTS = ('rank', 'sent')
+
+
+def tsvector_sql():
+    """Expression of the generated `search_tsv` column."""
+    return " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({col}, '')), '{weight}')"
+        for col, weight in SEARCH_WEIGHTS
+    )
+
+
+def search_query(q, since=None, until=None, events=None, limit=50, offset=0, sort='rank'):
+    """(text clause, params) for one page of matches of the web-search string `q`."""
+    where = ["a.search_tsv @@ q.query"]
+    params = {"q": q, "limit": limit, "offset": offset, "opts": HEADLINE_OPTIONS}
+    # Bounds on `sent` prune partitions before the index is consulted
+    if since is not None:
+        where.append("a.sent >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("a.sent < :until")
+        params["until"] = until
+    if events:
+        where.append("a.event = ANY(:events)")
+        params["events"] = list(events)
+    order = "rank DESC, sent DESC" if sort == 'rank' else "sent DESC, rank DESC"
+    sql = f"""
+        WITH q AS (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', :q) AS query)
+        SELECT hit.*,
+               ts_headline('{SEARCH_CONFIG}', coalesce(hit.headline, ''), q.query, :opts) AS headline_snippet,
+               ts_headline('{SEARCH_CONFIG}',
+                           concat_ws(' ', hit.parameters_nwsheadline, hit.description, hit.instruction),
+                           q.query, :opts) AS snippet
+        FROM (
+            SELECT a.id, a.sent, a.expires, a.event, a.severity, a.urgency, a.sender_name, a.area_desc,
+                   a.headline, a.parameters_nwsheadline, a.description, a.instruction,
+                   ts_rank(a.search_tsv, q.query) AS rank
+            FROM alerts a, q
+            WHERE {' AND '.join(where)}
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        ) hit, q
+        ORDER BY {order}
+    """
+    return text(sql), params
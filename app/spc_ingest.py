@@ -3,8 +3,10 @@
 Run once: `python -m app.spc_ingest --once`
 Run in loop: `python -m app.spc_ingest --loop`
 
-This module fetches SPC GeoJSON products, saves examples to `examples/spc/`,
-and upserts each GeoJSON Feature as a single row in the *_outlooks tables.
+This module fetches SPC GeoJSON products, archives the raw payloads (see
+app.archive) and upserts each GeoJSON Feature as a single row in the
+*_outlooks tables. With `SPC_SAVE_EXAMPLES=1` the latest payload of each
+product is also written to `examples/spc/` (e.g. for bench.ingest_bench).
 """
 
 from __future__ import annotations
@@ -12,8 +14,9 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import requests
@@ -21,12 +24,18 @@ import sqlalchemy as sa
 from sqlalchemy import exc, text, bindparam
 
 from .db import engine, init_db, load_dotenv
+from .leader import start_election, INSTANCE_ID
+from . import archive, metrics, spc_jobs, spc_schedule
+from .overlap import refresh_outlook_overlaps
+from .rollups import refresh_spc_days
+from .hazards import refresh_outlook_layers
+from . import versions
 
 
-# Ensure examples/spc directory exists
 ROOT = Path(__file__).resolve().parents[1]
 EXAMPLES_DIR = ROOT / "examples" / "spc"
-EXAMPLES_DIR.mkdir(parents=True, exist_ok=True)
+# Off by default: the raw archive keeps every fetch
+SAVE_EXAMPLES = os.getenv("SPC_SAVE_EXAMPLES", "0").lower() in ("1", "true", "yes")
 
 
 # Minimal list of SPC endpoints (kept short here; original repo holds full list)
@@ -105,30 +114,88 @@ SPC_URLS = [_file_to_tuple(f) for f in SPC_FILES]
 
 
 def ensure_spc_feature_tables() -> None:
-    """Apply the single-feature SPC outlook schema (idempotent) and run DB init."""
-    sql_file = ROOT / "db_init" / "03_spc_outlooks.sql"
-    if sql_file.exists():
-        try:
-            with engine.begin() as conn:
-                conn.exec_driver_sql(sql_file.read_text())
-        except Exception:
-            pass
-
-    try:
-        init_db()
-    except Exception:
-        pass
+    """Apply pending schema migrations (includes the SPC outlook schema); raises on failure."""
+    init_db()
 
 
 def save_example(name: str, url: str, content: bytes) -> None:
+    EXAMPLES_DIR.mkdir(parents=True, exist_ok=True)
     fname = EXAMPLES_DIR / f"{name}.geojson"
     with open(fname, "wb") as f:
         f.write(content)
 
 
-def upsert_convective(product: str, url: str, payload: dict) -> None:
-    if not isinstance(payload, dict):
+LATEST_ISSUE_SQL = {
+    kind: text(
+        f"""
+        INSERT INTO spc_product_latest (product, kind, issue, updated_at)
+        SELECT :product, '{kind}', max(issue), now() FROM {table} WHERE product = :product
+        ON CONFLICT (product) DO UPDATE
+          SET kind = EXCLUDED.kind, issue = EXCLUDED.issue, updated_at = EXCLUDED.updated_at
+          WHERE spc_product_latest.issue IS DISTINCT FROM EXCLUDED.issue
+            AND (spc_product_latest.issue IS NULL OR EXCLUDED.issue > spc_product_latest.issue)
+        """
+    )
+    for kind, table in (("convective", "convective_outlooks"), ("fire", "fire_outlooks"))
+}
+
+
+def mark_latest_issue(conn, kind: str, product: str) -> None:
+    """Advance `spc_product_latest` for a product after its features were stored."""
+    advanced = conn.execute(LATEST_ISSUE_SQL[kind], {"product": product}).rowcount > 0
+    # Re-join changed features against alerts; never fail the product for it
+    try:
+        with conn.begin_nested():
+            refresh_outlook_overlaps(conn, kind, product)
+    except exc.DBAPIError as e:
+        print(f"Warning: overlap refresh failed for {product}: {e}")
+    try:
+        with conn.begin_nested():
+            refresh_spc_days(conn, kind, product)
+    except exc.DBAPIError as e:
+        print(f"Warning: daily rollup refresh failed for {product}: {e}")
+    try:
+        with conn.begin_nested():
+            refresh_outlook_layers(conn, kind, [product])
+    except exc.DBAPIError as e:
+        print(f"Warning: hazard layer refresh failed for {product}: {e}")
+    if advanced:
+        # Last: invalidates the API risk caches once this transaction commits
+        versions.bump(conn, "spc_product_latest")
+
+
+SEED_STATUS_INSERT = """
+    INSERT INTO spc_ingest_status (source, last_run, last_success, convective_count, fire_count, message, updated_at)
+    SELECT 'spc', date_trunc('second', now()), :success, (SELECT count(*) FROM convective_outlooks),
+           (SELECT count(*) FROM fire_outlooks), :message, now()
+"""
+
+SEED_STATUS_SQL = text(SEED_STATUS_INSERT + "ON CONFLICT (source) DO NOTHING")
+
+
+def add_status_count(conn, column: str, inserted: int) -> None:
+    """Add newly inserted outlook rows to the `spc_ingest_status` totals.
+
+    Counts are kept incrementally in the same transaction as the upsert; the
+    tables are only counted once, to seed the row when it does not exist yet.
+    """
+    if inserted <= 0:
         return
+    res = conn.execute(text(
+        f"UPDATE spc_ingest_status SET {column} = coalesce({column}, 0) + :n WHERE source = 'spc'"
+    ), {"n": inserted})
+    if res.rowcount == 0:
+        # The seed count already includes this transaction's rows; if a
+        # concurrent transaction seeded the row first, add ours to it instead
+        conn.execute(text(
+            SEED_STATUS_INSERT
+            + f"ON CONFLICT (source) DO UPDATE SET {column} = coalesce(spc_ingest_status.{column}, 0) + :n"
+        ), {"success": True, "message": None, "n": inserted})
+
+
+def upsert_convective(product: str, url: str, payload: dict) -> int:
+    if not isinstance(payload, dict):
+        return 0
 
     features = payload.get("features") or []
     issue_iso = payload.get("properties", {}).get("ISSUE_ISO") or payload.get("properties", {}).get("ISSUE") or ""
@@ -142,7 +209,7 @@ def upsert_convective(product: str, url: str, payload: dict) -> None:
             :product, :url, :payload, date_trunc('hour', now()), :feature_index, :properties, :dn,
             NULLIF(:valid_iso, '')::timestamptz, NULLIF(:expire_iso, '')::timestamptz, NULLIF(:issue_iso, '')::timestamptz,
             :forecaster, :label, :label2, :stroke, :fill,
-            CASE WHEN :geom_json IS NULL THEN NULL ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((:geom_json)::text)), 4326) END,
+            CASE WHEN :geom_json IS NULL THEN NULL ELSE ST_SetSRID(ST_Multi(ST_MakeValid(ST_GeomFromGeoJSON((:geom_json)::text))), 4326) END,
             now()
         )
         ON CONFLICT (product, issue, feature_index) DO UPDATE
@@ -161,9 +228,11 @@ def upsert_convective(product: str, url: str, payload: dict) -> None:
                 fill = EXCLUDED.fill,
                 geom = EXCLUDED.geom,
                 created_at = EXCLUDED.created_at
+        RETURNING (xmax = 0) AS inserted
         """
     ).bindparams(bindparam("geom_json", type_=sa.types.Text))
 
+    counts = {"inserted": 0, "updated": 0, "failed": 0}
     with engine.begin() as conn:
         for idx, feat in enumerate(features):
             geom = feat.get("geometry")
@@ -209,14 +278,20 @@ def upsert_convective(product: str, url: str, payload: dict) -> None:
                 except Exception:
                     pass
 
-                conn.execute(insert_stmt, params)
+                inserted = conn.execute(insert_stmt, params).scalar()
+                counts["inserted" if inserted else "updated"] += 1
             except exc.DatabaseError as e:
+                counts["failed"] += 1
                 print(f"Warning: failed to upsert convective feature {idx} for {url}: {e}")
+        add_status_count(conn, "convective_count", counts["inserted"])
+        mark_latest_issue(conn, "convective", product)
+    metrics.count_features("spc", product, **counts)
+    return len(features)
 
 
-def upsert_fire(product: str, url: str, payload: dict) -> None:
+def upsert_fire(product: str, url: str, payload: dict) -> int:
     if not isinstance(payload, dict):
-        return
+        return 0
 
     features = payload.get("features") or []
     issue_iso = payload.get("properties", {}).get("ISSUE_ISO") or payload.get("properties", {}).get("ISSUE") or ""
@@ -230,7 +305,7 @@ def upsert_fire(product: str, url: str, payload: dict) -> None:
             :product, :url, :payload, date_trunc('hour', now()), :feature_index, :properties, :dn,
             NULLIF(:valid_iso, '')::timestamptz, NULLIF(:expire_iso, '')::timestamptz, NULLIF(:issue_iso, '')::timestamptz,
             :forecaster, :label, :label2, :stroke, :fill,
-            CASE WHEN :geom_json IS NULL THEN NULL ELSE ST_SetSRID(ST_Multi(ST_GeomFromGeoJSON((:geom_json)::text)), 4326) END,
+            CASE WHEN :geom_json IS NULL THEN NULL ELSE ST_SetSRID(ST_Multi(ST_MakeValid(ST_GeomFromGeoJSON((:geom_json)::text))), 4326) END,
             now()
         )
         ON CONFLICT (product, issue, feature_index) DO UPDATE
@@ -249,9 +324,11 @@ def upsert_fire(product: str, url: str, payload: dict) -> None:
                 fill = EXCLUDED.fill,
                 geom = EXCLUDED.geom,
                 created_at = EXCLUDED.created_at
+        RETURNING (xmax = 0) AS inserted
         """
     ).bindparams(bindparam("geom_json", type_=sa.types.Text))
 
+    counts = {"inserted": 0, "updated": 0, "failed": 0}
     with engine.begin() as conn:
         for idx, feat in enumerate(features):
             geom = feat.get("geometry")
@@ -295,53 +372,169 @@ def upsert_fire(product: str, url: str, payload: dict) -> None:
                 except Exception:
                     pass
 
-                conn.execute(insert_stmt, params)
+                inserted = conn.execute(insert_stmt, params).scalar()
+                counts["inserted" if inserted else "updated"] += 1
             except exc.DatabaseError as e:
+                counts["failed"] += 1
                 print(f"Warning: failed to upsert fire feature {idx} for {url}: {e}")
+        add_status_count(conn, "fire_count", counts["inserted"])
+        mark_latest_issue(conn, "fire", product)
+    metrics.count_features("spc", product, **counts)
+    return len(features)
 
 
-def fetch_and_store(name: str, url: str, product: str) -> None:
+def store_product(name: str, url: str, product: str, payload: dict) -> int:
+    """Upsert one product's features into the matching outlook table. Returns the feature count."""
+    if "/fire_wx/" in url or "fire_wx" in name:
+        return upsert_fire(product, url, payload)
+    return upsert_convective(product, url, payload)
+
+
+def fetch_product(name: str, url: str, product: str) -> dict:
+    """Fetch and store one product, raising on failure. Returns timing stats."""
+    t0 = time.perf_counter()
     try:
-        r = requests.get(url, timeout=30)
-        r.raise_for_status()
-        content = r.content
+        with metrics.stage("spc", product, "fetch"):
+            r = requests.get(url, timeout=30)
+            r.raise_for_status()
+    except Exception:
+        metrics.FETCH_ERRORS.labels("spc", product).inc()
+        raise
+    content = r.content
+    metrics.FETCH_BYTES.labels("spc", product).inc(len(content))
+    t1 = time.perf_counter()
+    if SAVE_EXAMPLES:
         save_example(name, url, content)
+    archive.store(engine, "spc", product, url, content)
+    with metrics.stage("spc", product, "parse"):
         payload = r.json()
-        if "/fire_wx/" in url or "fire_wx" in name:
-            upsert_fire(product, url, payload)
-        else:
-            upsert_convective(product, url, payload)
+    with metrics.stage("spc", product, "upsert"):
+        features = store_product(name, url, product, payload)
+    t2 = time.perf_counter()
+    metrics.STAGE_SECONDS.labels("spc", product, "total").observe(t2 - t0)
+    return {
+        "fetch_ms": int((t1 - t0) * 1000),
+        "store_ms": int((t2 - t1) * 1000),
+        "bytes": len(content),
+        "features": features,
+    }
+
+
+def fetch_and_store(name: str, url: str, product: str) -> None:
+    try:
+        fetch_product(name, url, product)
         print(f"Stored {name} -> {url}")
     except Exception as e:
         print(f"Failed to fetch {url}: {e}")
 
 
-def fetch_all_once() -> None:
-    for name, url, product in SPC_URLS:
-        fetch_and_store(name, url, product)
+def update_ingest_status(success: bool = True, message: str | None = None) -> None:
+    """Refresh the single `spc_ingest_status` row (served by /spc_status).
 
-    # After a full run, update ingest status
+    Row counts are maintained by `add_status_count`; only run state is set here.
+    """
     try:
         with engine.begin() as conn:
-            conv_count = conn.execute(text("SELECT count(*) FROM convective_outlooks")).scalar()
-            fire_count = conn.execute(text("SELECT count(*) FROM fire_outlooks")).scalar()
-            upsert = text(
+            res = conn.execute(text(
                 """
-                INSERT INTO spc_ingest_status (source, last_run, last_success, convective_count, fire_count, updated_at)
-                VALUES ('spc', date_trunc('second', now()), TRUE, :conv_count, :fire_count, now())
-                ON CONFLICT (source) DO UPDATE SET
-                  last_run = EXCLUDED.last_run,
-                  last_success = EXCLUDED.last_success,
-                  convective_count = EXCLUDED.convective_count,
-                  fire_count = EXCLUDED.fire_count,
-                  updated_at = EXCLUDED.updated_at;
+                UPDATE spc_ingest_status
+                SET last_run = date_trunc('second', now()), last_success = :success, message = :message,
+                    updated_at = now()
+                WHERE source = 'spc'
                 """
-            )
-            conn.execute(upsert, {"conv_count": conv_count, "fire_count": fire_count})
+            ), {"success": success, "message": message})
+            if res.rowcount == 0:
+                conn.execute(SEED_STATUS_SQL, {"success": success, "message": message})
     except Exception:
         pass
 
 
+def fetch_all_once(urls=None) -> None:
+    """Fetch every product in this process (no job queue)."""
+    for name, url, product in (SPC_URLS if urls is None else urls):
+        fetch_and_store(name, url, product)
+    # After a full run, update ingest status
+    update_ingest_status()
+
+
+# Worker threads per process claiming jobs from the spc_jobs queue (0 = schedule only)
+SPC_WORKERS = int(os.getenv("SPC_WORKERS", "2"))
+# "issuance": per-product checks around expected issuance times (app.spc_schedule);
+# "interval": every product every SPC_INTERVAL_MINUTES or at the top of each hour
+SPC_SCHEDULE = os.getenv("SPC_SCHEDULE", "issuance").lower()
+
+
+def handle_job(job) -> dict:
+    stats = fetch_product(job.name, job.url, job.product)
+    try:
+        spc_schedule.record_check(engine, job.name, job.product)
+    except Exception as e:
+        # The claim expires and the product is simply checked again
+        print(f"SPC poller: failed to reschedule {job.product}: {e}")
+    return stats
+
+
+def on_run_finished(run_id: int, status: str) -> None:
+    print(f"SPC run {run_id} finished: {status}")
+    update_ingest_status(success=(status == "succeeded"), message=f"run {run_id}: {status}")
+
+
+def enqueue_run(scheduled_for=None, urls=None):
+    urls = SPC_URLS if urls is None else urls
+    run_id = spc_jobs.enqueue_run(urls, scheduled_for=scheduled_for, created_by=INSTANCE_ID)
+    if run_id is not None:
+        print(f"SPC poller: enqueued run {run_id} ({len(urls)} products)")
+    return run_id
+
+
+def start_workers(stop: threading.Event, count: int = SPC_WORKERS):
+    threads = []
+    for i in range(count):
+        t = threading.Thread(
+            target=spc_jobs.work,
+            args=(f"{INSTANCE_ID}/{i}", handle_job, stop, on_run_finished),
+            name=f"spc-worker-{i}",
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def schedule(elector, scheduled_for=None) -> None:
+    """Enqueue a run if this instance is the scheduler (leader)."""
+    if elector is not None and not elector.is_leader:
+        print("SPC poller: standby scheduler (another instance is the leader)")
+        return
+    try:
+        enqueue_run(scheduled_for)
+    except Exception as e:
+        print(f"SPC poller: failed to enqueue run: {e}")
+
+
+def schedule_due(elector) -> None:
+    """Leader only: enqueue the products whose issuance-aware check is due."""
+    if elector is not None and not elector.is_leader:
+        return
+    try:
+        due = spc_schedule.claim_due(engine, SPC_URLS)
+        if due:
+            enqueue_run(datetime.now(timezone.utc), urls=due)
+    except Exception as e:
+        print(f"SPC poller: failed to enqueue due products: {e}")
+
+
+def run_once() -> None:
+    """Enqueue one run and work it to completion in this process (other workers may help)."""
+    try:
+        run_id = enqueue_run()
+    except Exception as e:
+        print(f"SPC poller: job queue unavailable ({e}); fetching in-process")
+        fetch_all_once()
+        return
+    spc_jobs.work(f"{INSTANCE_ID}/once", handle_job, threading.Event(), on_run_finished, run_id=run_id)
+
+
 def sleep_until_top_of_hour() -> None:
     now = datetime.utcnow()
     next_hour = (now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
@@ -375,24 +568,35 @@ def main() -> None:
         except Exception:
             interval_minutes = None
 
+    metrics.start_server()
+
     if args.once or env_once:
         ensure_spc_feature_tables()
-        fetch_all_once()
+        run_once()
         return
 
     should_loop = args.loop or env_auto
     if should_loop:
-        print("SPC poller: running in loop mode")
+        print(f"SPC poller: running in loop mode ({SPC_SCHEDULE} schedule)")
         ensure_spc_feature_tables()
-        fetch_all_once()
+        # Every instance works jobs; only the elected leader schedules runs
+        start_workers(threading.Event())
+        elector = start_election("spc_ingest")
+        if SPC_SCHEDULE == "issuance":
+            while True:
+                schedule_due(elector)
+                time.sleep(spc_schedule.TICK_SECONDS)
+        schedule(elector)
         while True:
             if interval_minutes and interval_minutes > 0:
                 print(f"Sleeping {interval_minutes} minutes between fetches")
                 time.sleep(interval_minutes * 60)
-                fetch_all_once()
+                now = datetime.now(timezone.utc)
+                slot = now.replace(second=0, microsecond=0)
+                schedule(elector, slot - timedelta(minutes=slot.minute % interval_minutes))
             else:
                 sleep_until_top_of_hour()
-                fetch_all_once()
+                schedule(elector, datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0))
 
 
 if __name__ == "__main__":
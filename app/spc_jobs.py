@@ -0,0 +1,244 @@
+"""Database-backed job queue for SPC product fetches.
+
+Each scheduled fetch cycle is an `spc_runs` row with one `spc_jobs` row per
+product. Any number of worker threads/processes claim jobs with
+`SELECT ... FOR UPDATE SKIP LOCKED`, so they never block on or double-process
+each other's jobs:
+
+- a claim takes a lease (`SPC_JOB_LEASE_SECONDS`); a worker that dies leaves
+  its job `running` with an expired lease, and the job is claimed again;
+- a failed attempt goes back to `queued` with a linear backoff until
+  `max_attempts`, then `failed` — products retry independently;
+- when the last job of a run settles, the run's counts and status
+  (`succeeded` / `partial` / `failed`) are aggregated onto `spc_runs`.
+"""
+
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from .db import engine
+
+
+MAX_ATTEMPTS = int(os.getenv('SPC_JOB_MAX_ATTEMPTS', '3'))
+LEASE_SECONDS = float(os.getenv('SPC_JOB_LEASE_SECONDS', '300'))
+RETRY_SECONDS = float(os.getenv('SPC_JOB_RETRY_SECONDS', '30'))
+POLL_SECONDS = float(os.getenv('SPC_JOB_POLL_SECONDS', '2'))
+# 0 keeps every run
+RUN_RETENTION_DAYS = int(os.getenv('SPC_RUN_RETENTION_DAYS', '7'))
+
+
+CLAIM_SQL = text(
+    """
+    UPDATE spc_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        lease_owner = :worker,
+        lease_expires_at = now() + make_interval(secs => :lease),
+        started_at = now(),
+        finished_at = NULL
+    FROM (
+        SELECT id FROM spc_jobs
+        WHERE ((status = 'queued' AND available_at <= now())
+               OR (status = 'running' AND lease_expires_at < now()))
+          AND attempts < max_attempts
+        ORDER BY available_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) c
+    WHERE j.id = c.id
+    RETURNING j.id, j.run_id, j.name, j.url, j.product, j.attempts, j.max_attempts
+    """
+)
+
+
+def enqueue_run(urls, scheduled_for=None, created_by=None, max_attempts=None):
+    """Create a run with one job per `(name, url, product)`.
+
+    Returns the run id, or None if a run for `scheduled_for` already exists.
+    """
+    scheduled_for = scheduled_for or datetime.now(timezone.utc)
+    max_attempts = MAX_ATTEMPTS if max_attempts is None else max_attempts
+    with engine.begin() as conn:
+        run_id = conn.execute(text(
+            """
+            INSERT INTO spc_runs (scheduled_for, created_by, status, total, succeeded, failed)
+            VALUES (:slot, :by, 'queued', :total, 0, 0)
+            ON CONFLICT (scheduled_for) DO NOTHING
+            RETURNING id
+            """
+        ), {"slot": scheduled_for, "by": created_by, "total": len(urls)}).scalar()
+        if run_id is None:
+            return None
+        conn.execute(text(
+            """
+            INSERT INTO spc_jobs (run_id, name, url, product, status, attempts, max_attempts, available_at)
+            VALUES (:run_id, :name, :url, :product, 'queued', 0, :max_attempts, now())
+            """
+        ), [
+            {"run_id": run_id, "name": name, "url": url, "product": product, "max_attempts": max_attempts}
+            for name, url, product in urls
+        ])
+        if RUN_RETENTION_DAYS > 0:
+            conn.execute(text(
+                "DELETE FROM spc_runs WHERE created_at < now() - make_interval(days => :d)"
+            ), {"d": RUN_RETENTION_DAYS})
+    return run_id
+
+
+def claim_job(worker):
+    """Claim the next runnable job for `worker`, or return None."""
+    with engine.begin() as conn:
+        job = conn.execute(CLAIM_SQL, {"worker": worker, "lease": LEASE_SECONDS}).first()
+        if job is not None:
+            conn.execute(text(
+                "UPDATE spc_runs SET status = 'running' WHERE id = :r AND status = 'queued'"
+            ), {"r": job.run_id})
+    return job
+
+
+def _finalize_run(conn, run_id):
+    """Aggregate job outcomes onto the run. Returns the status if this call finished it."""
+    # Lock the run first so concurrent finishers see each other's committed jobs
+    prev = conn.execute(text(
+        "SELECT finished_at FROM spc_runs WHERE id = :r FOR UPDATE"
+    ), {"r": run_id}).first()
+    if prev is None:
+        return None
+    row = conn.execute(text(
+        """
+        WITH agg AS (
+            SELECT count(*) AS total,
+                   count(*) FILTER (WHERE status = 'succeeded') AS ok,
+                   count(*) FILTER (WHERE status = 'failed') AS bad
+            FROM spc_jobs WHERE run_id = :r
+        )
+        UPDATE spc_runs r
+        SET total = agg.total,
+            succeeded = agg.ok,
+            failed = agg.bad,
+            status = CASE
+                WHEN agg.ok + agg.bad < agg.total THEN 'running'
+                WHEN agg.bad = 0 THEN 'succeeded'
+                WHEN agg.ok = 0 THEN 'failed'
+                ELSE 'partial'
+            END,
+            finished_at = CASE WHEN agg.ok + agg.bad = agg.total THEN coalesce(r.finished_at, now()) END
+        FROM agg
+        WHERE r.id = :r
+        RETURNING r.status, r.finished_at
+        """
+    ), {"r": run_id}).first()
+    if prev.finished_at is None and row.finished_at is not None:
+        return row.status
+    return None
+
+
+def complete_job(job, worker, stats):
+    """Mark a claimed job succeeded. Returns the run status if the run just finished."""
+    with engine.begin() as conn:
+        res = conn.execute(text(
+            """
+            UPDATE spc_jobs
+            SET status = 'succeeded', finished_at = now(), last_error = NULL,
+                lease_owner = NULL, lease_expires_at = NULL,
+                fetch_ms = :fetch_ms, store_ms = :store_ms, bytes = :bytes, features = :features
+            WHERE id = :id AND status = 'running' AND lease_owner = :worker
+            """
+        ), {
+            "id": job.id,
+            "worker": worker,
+            "fetch_ms": stats.get("fetch_ms"),
+            "store_ms": stats.get("store_ms"),
+            "bytes": stats.get("bytes"),
+            "features": stats.get("features"),
+        })
+        if res.rowcount == 0:
+            # Lease expired and someone else took the job over
+            return None
+        return _finalize_run(conn, job.run_id)
+
+
+def retry_delay(attempts):
+    """Seconds before a job that failed its `attempts`-th attempt is runnable again."""
+    return RETRY_SECONDS * attempts
+
+
+def fail_job(job, worker, error):
+    """Requeue (with backoff) or fail a claimed job. Returns the run status if the run just finished."""
+    with engine.begin() as conn:
+        res = conn.execute(text(
+            """
+            UPDATE spc_jobs
+            SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                available_at = now() + make_interval(secs => :delay),
+                finished_at = now(), last_error = :error,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = :id AND status = 'running' AND lease_owner = :worker
+            """
+        ), {"id": job.id, "worker": worker, "delay": retry_delay(job.attempts), "error": str(error)[:2000]})
+        if res.rowcount == 0:
+            return None
+        return _finalize_run(conn, job.run_id)
+
+
+def reap_expired():
+    """Fail jobs whose lease expired on their last attempt. Returns [(run_id, status)] of runs finished."""
+    finished = []
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            """
+            UPDATE spc_jobs
+            SET status = 'failed', finished_at = now(), last_error = 'lease expired',
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id IN (
+                SELECT id FROM spc_jobs
+                WHERE status = 'running' AND lease_expires_at < now() AND attempts >= max_attempts
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING run_id
+            """
+        )).all()
+        for run_id in sorted({r.run_id for r in rows}):
+            status = _finalize_run(conn, run_id)
+            if status is not None:
+                finished.append((run_id, status))
+    return finished
+
+
+def run_status(conn, run_id):
+    return conn.execute(text("SELECT status FROM spc_runs WHERE id = :r"), {"r": run_id}).scalar()
+
+
+def process_job(job, worker, handler, on_run_finished=None):
+    """Run `handler(job)` (returns a stats dict) and record the outcome."""
+    try:
+        stats = handler(job) or {}
+    except Exception as e:
+        print(f"spc_jobs: {job.name} attempt {job.attempts}/{job.max_attempts} failed: {e}")
+        finished = fail_job(job, worker, e)
+    else:
+        finished = complete_job(job, worker, stats)
+    if finished is not None and on_run_finished is not None:
+        on_run_finished(job.run_id, finished)
+
+
+def work(worker, handler, stop, on_run_finished=None, run_id=None):
+    """Claim and process jobs until `stop` is set (or, with `run_id`, until that run finishes)."""
+    while not stop.is_set():
+        try:
+            job = claim_job(worker)
+            if job is not None:
+                process_job(job, worker, handler, on_run_finished)
+                continue
+            for rid, status in reap_expired():
+                if on_run_finished is not None:
+                    on_run_finished(rid, status)
+            if run_id is not None:
+                with engine.connect() as conn:
+                    if run_status(conn, run_id) in ('succeeded', 'partial', 'failed', None):
+                        return
+        except Exception as e:
+            print(f"spc_jobs: worker {worker} error: {e}")
+        stop.wait(POLL_SECONDS)
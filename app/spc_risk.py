@@ -0,0 +1,114 @@
+"""Point-in-outlook SPC risk lookups with a per-issuance cache.
+
+`lookup` answers "what is the risk here?" for the latest issuance of every
+SPC product in one query: `spc_product_latest` names the current
+(product, issue) pairs, the `(product, issue)` and GiST indexes find the
+polygons containing the point, and `DISTINCT ON` keeps the highest DN per
+product.
+
+Points are rounded to `SPC_RISK_ROUND_DECIMALS` before querying, so every
+request for the same rounded point shares a cache entry. The cache is keyed
+by the `spc_product_latest` version counter (app.versions), bumped in the
+transaction that advances a product's issue, and is dropped as soon as a
+new issuance lands (checked at most every `SPC_RISK_VERSION_TTL_SECONDS`).
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from .versions import VERSION_SQL
+
+
+ROUND_DECIMALS = int(os.getenv('SPC_RISK_ROUND_DECIMALS', '2'))
+CACHE_SIZE = int(os.getenv('SPC_RISK_CACHE_SIZE', '10000'))
+VERSION_TTL_SECONDS = float(os.getenv('SPC_RISK_VERSION_TTL_SECONDS', '30'))
+
+
+def _risk_select(kind, table):
+    # Numeric DNs (categorical levels, probabilities) rank highest-first; others (e.g. SIGN) after
+    return f"""
+        SELECT DISTINCT ON (o.product)
+               o.product, '{kind}' AS kind, o.issue, o.valid, o.expire, o.dn, o.label, o.label2,
+               o.stroke, o.fill
+        FROM spc_product_latest l
+        JOIN {table} o ON o.product = l.product AND o.issue = l.issue
+        WHERE l.kind = '{kind}'
+          AND ST_Intersects(o.geom, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326))
+        ORDER BY o.product,
+                 CASE WHEN o.dn ~ '^[0-9]+([.][0-9]+)?$' THEN o.dn::numeric END DESC NULLS LAST,
+                 o.feature_index
+    """
+
+
+RISK_SQL = text(
+    f"""
+    {_risk_select('convective', 'convective_outlooks')}
+    UNION ALL
+    {_risk_select('fire', 'fire_outlooks')}
+    """
+)
+
+# Bumped by spc_ingest whenever a product's latest issue advances (see app.versions)
+VERSION_NAME = 'spc_product_latest'
+
+
+def _risk_to_dict(r):
+    return {
+        "product": r.product,
+        "kind": r.kind,
+        "issue": r.issue,
+        "valid": r.valid,
+        "expire": r.expire,
+        "dn": r.dn,
+        "label": r.label,
+        "label2": r.label2,
+        "stroke": r.stroke,
+        "fill": r.fill,
+    }
+
+
+class RiskCache:
+    """LRU of risk lookups, valid for one SPC issue set."""
+
+    def __init__(self, size=CACHE_SIZE, ttl=VERSION_TTL_SECONDS, decimals=ROUND_DECIMALS):
+        self._size = size
+        self._ttl = ttl
+        self._decimals = decimals
+        self._lock = asyncio.Lock()
+        self._checked = 0.0
+        self._version = None
+        self._entries = OrderedDict()
+
+    def round_point(self, lat, lon):
+        return round(lat, self._decimals), round(lon, self._decimals)
+
+    async def _current_version(self, db):
+        if time.monotonic() - self._checked >= self._ttl:
+            async with self._lock:
+                if time.monotonic() - self._checked >= self._ttl:
+                    version = (await db.execute(VERSION_SQL, {"name": VERSION_NAME})).scalar()
+                    if version != self._version:
+                        # New issuance landed: everything cached is stale
+                        self._entries.clear()
+                        self._version = version
+                    self._checked = time.monotonic()
+        return self._version
+
+    async def lookup(self, db, lat, lon):
+        """Highest risk per product at (lat, lon). Returns (rounded point, rows, cache hit)."""
+        point = self.round_point(lat, lon)
+        version = await self._current_version(db)
+        key = (point, version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return point, self._entries[key], True
+        rows = (await db.execute(RISK_SQL, {"lat": point[0], "lon": point[1]})).all()
+        result = [_risk_to_dict(r) for r in rows]
+        self._entries[key] = result
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+        return point, result, False
@@ -0,0 +1,133 @@
+"""Issuance-aware per-product SPC poll schedule.
+
+SPC products are issued at known times (UTC), e.g. the Day 1 convective
+outlook at 0600/1300/1630/2000/0100Z. `spc_product_schedule` keeps one row
+per product with its `next_check_at`:
+
+- inside an issuance window (`SPC_WINDOW_BEFORE_MINUTES` before to
+  `SPC_WINDOW_AFTER_MINUTES` after the nominal time) while the window's new
+  ISSUE has not been stored yet: re-check every `SPC_FAST_POLL_SECONDS`;
+- otherwise: at the start of the next window, and at least every
+  `SPC_SLOW_POLL_SECONDS` (catches off-schedule updates).
+
+The `spc_ingest` leader claims due products every `SPC_SCHEDULE_TICK_SECONDS`
+and enqueues them as one `spc_jobs` run; workers call `record_check` after
+storing a product, which picks its next check time from the ISSUE now in
+`spc_product_latest`.
+
+Issuance times per product prefix can be overridden with
+`SPC_ISSUANCE_TIMES`, a JSON object such as `{"day3otlk": ["0830", "2030"]}`.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+
+# Nominal issuance times (UTC HHMM) by product name prefix
+ISSUANCE_TIMES = {
+    'day1otlk': ['0100', '0600', '1300', '1630', '2000'],
+    'day2otlk': ['0600', '1730'],
+    'day3otlk': ['0730', '1930'],
+    'day4prob': ['0900'],
+    'day1fw': ['0700', '1700'],
+    'day2fw': ['1000', '2000'],
+}
+ISSUANCE_TIMES.update(json.loads(os.getenv('SPC_ISSUANCE_TIMES') or '{}'))
+
+WINDOW_BEFORE = timedelta(minutes=float(os.getenv('SPC_WINDOW_BEFORE_MINUTES', '15')))
+WINDOW_AFTER = timedelta(minutes=float(os.getenv('SPC_WINDOW_AFTER_MINUTES', '90')))
+FAST_SECONDS = float(os.getenv('SPC_FAST_POLL_SECONDS', '30'))
+SLOW_SECONDS = float(os.getenv('SPC_SLOW_POLL_SECONDS', '3600'))
+TICK_SECONDS = float(os.getenv('SPC_SCHEDULE_TICK_SECONDS', '15'))
+# A claimed product is claimed again after this if its job never reports back
+CLAIM_SECONDS = float(os.getenv('SPC_SCHEDULE_CLAIM_SECONDS', '600'))
+
+
+def issuance_times(name):
+    """Nominal (hour, minute) issuance times for a product name."""
+    for prefix in sorted(ISSUANCE_TIMES, key=len, reverse=True):
+        if name.startswith(prefix):
+            return [(int(t[:2]), int(t[2:])) for t in ISSUANCE_TIMES[prefix]]
+    return []
+
+
+def _issuances_around(name, now):
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return sorted(
+        day + timedelta(days=d, hours=h, minutes=m)
+        for d in (-1, 0, 1) for h, m in issuance_times(name)
+    )
+
+
+def next_check(name, now, last_issue):
+    """When to check `name` next, given the newest stored ISSUE (or None)."""
+    slow = now + timedelta(seconds=SLOW_SECONDS)
+    upcoming = slow
+    for t in _issuances_around(name, now):
+        start, end = t - WINDOW_BEFORE, t + WINDOW_AFTER
+        # In a window and this issuance hasn't landed yet (products without
+        # any stored ISSUE, e.g. empty layers, just follow the slow cadence)
+        if start <= now < end and last_issue is not None and last_issue < start:
+            return now + timedelta(seconds=FAST_SECONDS)
+        if start > now:
+            upcoming = min(upcoming, start)
+    return upcoming
+
+
+def sync(conn, urls):
+    """Make sure every configured `(name, url, product)` has a schedule row (new ones due now)."""
+    conn.execute(text(
+        """
+        INSERT INTO spc_product_schedule (product, name, url, next_check_at)
+        VALUES (:product, :name, :url, now())
+        ON CONFLICT (product) DO UPDATE SET name = EXCLUDED.name, url = EXCLUDED.url
+          WHERE spc_product_schedule.name IS DISTINCT FROM EXCLUDED.name
+             OR spc_product_schedule.url IS DISTINCT FROM EXCLUDED.url
+        """
+    ), [{"product": product, "name": name, "url": url} for name, url, product in urls])
+
+
+def claim_due(engine, urls):
+    """Claim products whose check is due. Returns `(name, url, product)` tuples.
+
+    Claiming pushes `next_check_at` out by `SPC_SCHEDULE_CLAIM_SECONDS`, so a
+    product is not enqueued twice while its job is pending (even across a
+    leader change); `record_check` sets the real next time.
+    """
+    configured = {product for _, _, product in urls}
+    with engine.begin() as conn:
+        sync(conn, urls)
+        rows = conn.execute(text(
+            """
+            UPDATE spc_product_schedule
+            SET next_check_at = now() + make_interval(secs => :claim)
+            WHERE next_check_at <= now() AND product = ANY(:products)
+            RETURNING name, url, product
+            """
+        ), {"claim": CLAIM_SECONDS, "products": sorted(configured)}).all()
+    return [(r.name, r.url, r.product) for r in rows]
+
+
+def record_check(engine, name, product):
+    """After a successful fetch: note the stored ISSUE and schedule the next check."""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        issue = conn.execute(
+            text("SELECT issue FROM spc_product_latest WHERE product = :p"), {"p": product}
+        ).scalar()
+        conn.execute(text(
+            """
+            UPDATE spc_product_schedule
+            SET last_checked_at = now(),
+                last_new_issue_at = CASE WHEN CAST(:issue AS timestamptz) IS DISTINCT FROM last_issue
+                                         THEN now() ELSE last_new_issue_at END,
+                last_issue = :issue,
+                next_check_at = :next,
+                checks = checks + 1
+            WHERE product = :p
+            """
+        ), {"p": product, "issue": issue, "next": next_check(name, now, issue)})
+
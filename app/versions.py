@@ -0,0 +1,25 @@
+"""Change counters for in-process caches.
+
+Writers call `bump(conn, name)` in the transaction that changes the data; the
+row lock serializes concurrent writers, so the committed `version` strictly
+increases with every committed change. `count(*)` / `max(updated_at)`
+signatures can't promise that: `now()` is the transaction start, and a
+long transaction may commit after a newer one.
+"""
+
+from sqlalchemy import text
+
+
+BUMP_SQL = text(
+    """
+    INSERT INTO data_versions (name, version, updated_at) VALUES (:name, 1, clock_timestamp())
+    ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1, updated_at = clock_timestamp()
+    """
+)
+
+VERSION_SQL = text("SELECT version FROM data_versions WHERE name = :name")
+
+
+def bump(conn, name):
+    """Advance `name`'s version (take this late in the transaction; it holds a row lock until commit)."""
+    conn.execute(BUMP_SQL, {"name": name})
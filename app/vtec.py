@@ -0,0 +1,123 @@
+"""P-VTEC parsing and the `vtec_events` current-state table.
+
+A P-VTEC string looks like `/O.CAN.KTAE.TO.A.0008.000000T0000Z-260215T2200Z/`:
+product class, action, office, phenomena, significance, event tracking
+number (ETN) and begin/end times (`000000T0000Z` means "not specified").
+Ingest keeps one row per (office, phenomena, significance, etn, year),
+updated only by messages at least as new as the stored one.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import or_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .models import VtecEvent
+
+
+VTEC_RE = re.compile(
+    r'/?(?P<product_class>[OTEX])\.(?P<action>[A-Z]{3})\.(?P<office>[A-Z]{4})\.'
+    r'(?P<phenomena>[A-Z]{2})\.(?P<significance>[A-Z])\.(?P<etn>\d{4})\.'
+    r'(?P<begin>\d{6}T\d{4}Z)-(?P<end>\d{6}T\d{4}Z)/?'
+)
+
+# Actions after which an event is no longer in effect
+INACTIVE_ACTIONS = ('CAN', 'EXP', 'UPG')
+
+
+def _parse_time(value):
+    if not value or value.startswith('000000'):
+        return None
+    try:
+        return datetime.strptime(value, '%y%m%dT%H%MZ').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _parse_iso(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_vtec(value, sent=None):
+    """Parse one or more P-VTEC strings into dicts.
+
+    `value` may be a string or a list of strings (as in NWS `parameters.VTEC`).
+    `sent` (ISO string) supplies the year when the begin time is unspecified.
+    """
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = ' '.join([str(v) for v in value if v])
+    sent_dt = _parse_iso(sent)
+    out = []
+    for m in VTEC_RE.finditer(str(value)):
+        begin = _parse_time(m.group('begin'))
+        end = _parse_time(m.group('end'))
+        if begin is not None:
+            year = begin.year
+        elif sent_dt is not None:
+            year = sent_dt.astimezone(timezone.utc).year
+        else:
+            year = (end or datetime.now(timezone.utc)).year
+        out.append({
+            'product_class': m.group('product_class'),
+            'action': m.group('action'),
+            'office': m.group('office'),
+            'phenomena': m.group('phenomena'),
+            'significance': m.group('significance'),
+            'etn': int(m.group('etn')),
+            'year': year,
+            'begin_time': begin,
+            'end_time': end,
+            'raw': m.group(0).strip('/'),
+        })
+    return out
+
+
+def upsert_vtec_events(db, alert_id, properties):
+    """Upsert the current state of every VTEC event referenced by an alert.
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    parameters = properties.get('parameters') or {}
+    sent = properties.get('sent')
+    events = parse_vtec(parameters.get('VTEC') if isinstance(parameters, dict) else None, sent)
+    if not events:
+        return 0
+
+    table = VtecEvent.__table__
+    for ev in events:
+        values = dict(ev)
+        values.update(
+            alert_id=alert_id,
+            event=properties.get('event'),
+            sent=sent,
+            expires=properties.get('expires'),
+        )
+        stmt = pg_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.office, table.c.phenomena, table.c.significance, table.c.etn, table.c.year],
+            set_={
+                'product_class': stmt.excluded.product_class,
+                'action': stmt.excluded.action,
+                # CON/EXT messages usually omit the begin time; keep the original
+                'begin_time': func.coalesce(stmt.excluded.begin_time, table.c.begin_time),
+                'end_time': stmt.excluded.end_time,
+                'raw': stmt.excluded.raw,
+                'alert_id': stmt.excluded.alert_id,
+                'event': stmt.excluded.event,
+                'sent': stmt.excluded.sent,
+                'expires': stmt.excluded.expires,
+                'updated_at': func.now(),
+            },
+            # Only move forward: older (re-fetched) messages never overwrite newer state
+            where=or_(table.c.sent.is_(None), stmt.excluded.sent.is_(None), stmt.excluded.sent >= table.c.sent),
+        )
+        db.execute(stmt)
+    return len(events)
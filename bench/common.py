@@ -0,0 +1,32 @@
+"""Helpers shared by the benchmarks (stdlib only)."""
+
+
+# Rough CONUS box (min lon, min lat, max lon, max lat) for random points / polygons
+CONUS = (-124.0, 25.5, -67.5, 48.5)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def compare(results, baseline, compared):
+    """Print the relative change of each `(metric, higher_is_better)` in `compared` vs `baseline`."""
+    print("\nvs baseline:")
+    for name, metrics in results.items():
+        base = (baseline.get('results') or {}).get(name)
+        if not base:
+            print(f"  {name}: no baseline")
+            continue
+        parts = []
+        for key, higher_is_better in compared:
+            new, old = metrics.get(key), base.get(key)
+            if new is None or not old:
+                continue
+            change = 100.0 * (new - old) / old
+            worse = change < 0 if higher_is_better else change > 0
+            flag = ' !' if worse and abs(change) >= 10 else ''
+            parts.append(f"{key} {old} -> {new} ({change:+.1f}%){flag}")
+        print(f"  {name}: " + "; ".join(parts))
@@ -0,0 +1,84 @@
+"""Concurrent-request capacity test for a single API worker.
+
+Sweeps concurrency levels against one URL and reports throughput, latency
+percentiles and errors per level, so sync vs async handler changes can be
+compared on the same box:
+
+    python -m bench.concurrency --url http://localhost:31800/alerts --levels 10,40,80,160 --duration 15
+
+Run it against the stack before and after a change (same data, one uvicorn
+worker) and compare where req/s stops growing and p99 climbs.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from .common import percentile
+from .httpclient import request
+
+
+async def run_level(url, concurrency, duration, timeout):
+    latencies = []
+    errors = 0
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            try:
+                resp = await request(url, timeout=timeout)
+            except Exception:
+                errors += 1
+                continue
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            if resp.status >= 400:
+                errors += 1
+            else:
+                latencies.append(resp.elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "ok": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p90_ms": round(1000 * percentile(latencies, 90), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+    }
+
+
+async def main_async(args):
+    results = []
+    for level in [int(x) for x in args.levels.split(',') if x.strip()]:
+        res = await run_level(args.url, level, args.duration, args.timeout)
+        results.append(res)
+        print(f"c={res['concurrency']:>4}  rps={res['rps']:>8}  p50={res['p50_ms']:>8}ms  "
+              f"p99={res['p99_ms']:>8}ms  errors={res['errors']}")
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump({"url": args.url, "duration": args.duration, "results": results}, fh, indent=2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:31800/alerts')
+    parser.add_argument('--levels', default='10,40,80,160,320')
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per concurrency level')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--out', help='Write results as JSON')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
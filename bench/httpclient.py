@@ -0,0 +1,76 @@
+"""Tiny asyncio HTTP/1.1 client for load tests (stdlib only).
+
+One request per connection (`Connection: close`), which keeps the client
+simple and puts the full connect + request cost on the server under test.
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class Response:
+    def __init__(self, status, headers, body, elapsed):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+
+async def request(url, method='GET', body=None, headers=None, timeout=30.0):
+    """Send one request and return a `Response` (raises on network errors/timeouts)."""
+    parts = urlsplit(url)
+    host = parts.hostname or 'localhost'
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    if body is not None and not isinstance(body, (bytes, bytearray)):
+        body = json.dumps(body).encode('utf-8')
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json')
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+    for k, v in (headers or {}).items():
+        lines.append(f"{k}: {v}")
+    if body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+    raw = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b'')
+
+    start = time.perf_counter()
+
+    async def _do():
+        reader, writer = await asyncio.open_connection(host, port, ssl=parts.scheme == 'https' or None)
+        try:
+            writer.write(raw)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    data = await asyncio.wait_for(_do(), timeout)
+    elapsed = time.perf_counter() - start
+
+    head, _, payload = data.partition(b"\r\n\r\n")
+    head_lines = head.decode('latin-1').split("\r\n")
+    status = int(head_lines[0].split(' ', 2)[1])
+    resp_headers = {}
+    for line in head_lines[1:]:
+        k, _, v = line.partition(':')
+        resp_headers[k.strip().lower()] = v.strip()
+    if resp_headers.get('transfer-encoding', '').lower() == 'chunked':
+        payload = _dechunk(payload)
+    return Response(status, resp_headers, payload, elapsed)
+
+
+def _dechunk(data):
+    out = bytearray()
+    while data:
+        size_line, _, rest = data.partition(b"\r\n")
+        size = int(size_line.split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        out += rest[:size]
+        data = rest[size + 2:]
+    return bytes(out)
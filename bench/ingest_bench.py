@@ -0,0 +1,347 @@
+"""Ingest benchmark against a throwaway local PostGIS database.
+
+Runs the real write paths — `ingest._process_features` on
+`examples/alerts_snapshot.json` and `spc_ingest.store_product` on the saved
+`examples/spc/*.geojson` files — and reports per phase:
+
+- features/sec and p50/p99 latency per batch,
+- DB round trips (cursor executions) per feature,
+- WAL bytes written (`pg_current_wal_lsn()` before/after) per feature.
+
+    python -m bench.ingest_bench --pg-host localhost --pg-db alerts_bench --reset --scale 10 \\
+        --out bench_output.json --baseline ingest_baseline.json
+
+The target database is created (and migrated) if missing; `--reset`
+truncates the benchmark tables first so runs are comparable. It refuses to
+touch a database named like the production default unless `--force`.
+`--scale N` adds N-1 shifted copies of every input (new ids, issue and sent
+times, nudged geometry). SPC files only exist once `spc_ingest` has run
+with `SPC_SAVE_EXAMPLES=1` and saved them to `examples/spc/`.
+
+Save a baseline with `--save-baseline PATH` on the reference machine; later
+runs with `--baseline PATH` print the change of each metric. None is
+committed: the numbers only compare across runs on the same hardware.
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .common import compare, percentile
+
+
+ROOT = Path(__file__).resolve().parents[1]
+ALERTS_SNAPSHOT = ROOT / 'examples' / 'alerts_snapshot.json'
+SPC_DIR = ROOT / 'examples' / 'spc'
+
+BENCH_TABLES = [
+    'alerts', 'active_alerts', 'vtec_events', 'alert_outlook_overlap',
+    'convective_outlooks', 'fire_outlooks', 'spc_product_latest',
+    'alert_rollup_hourly', 'alert_state_rollup_hourly', 'spc_daily_rollup', 'hazard_layers',
+]
+
+# Metrics compared against a baseline: (key, higher_is_better)
+COMPARED = [
+    ('features_per_sec', True),
+    ('batch_p50_ms', False),
+    ('batch_p99_ms', False),
+    ('round_trips_per_feature', False),
+    ('wal_bytes_per_feature', False),
+]
+
+
+def add_pg_arguments(parser):
+    """Connection options for the throwaway benchmark database."""
+    parser.add_argument('--pg-host', default=os.getenv('BENCH_POSTGRES_HOST', 'localhost'))
+    parser.add_argument('--pg-port', type=int, default=int(os.getenv('BENCH_POSTGRES_PORT', '5432')))
+    parser.add_argument('--pg-db', default=os.getenv('BENCH_POSTGRES_DB', 'alerts_bench'))
+    parser.add_argument('--pg-user', default=os.getenv('POSTGRES_USER', 'alerts'))
+    parser.add_argument('--pg-password', default=os.getenv('POSTGRES_PASSWORD', 'alerts'))
+    parser.add_argument('--force', action='store_true', help='Allow a database named like the production default')
+
+
+def prepare_database(args):
+    """Refuse the production database name, point app.db at the target and create it if needed."""
+    if args.pg_db == os.getenv('POSTGRES_DB', 'alerts') and not args.force:
+        sys.exit(f"bench: refusing to run against '{args.pg_db}' (use a throwaway database or --force)")
+    configure_env(args)
+    ensure_database(args)
+
+
+def configure_env(args):
+    """Point app.db at the benchmark database (must run before importing app modules)."""
+    os.environ['POSTGRES_HOST'] = args.pg_host
+    os.environ['POSTGRES_PORT'] = str(args.pg_port)
+    os.environ['POSTGRES_DB'] = args.pg_db
+    os.environ['POSTGRES_USER'] = args.pg_user
+    os.environ['POSTGRES_PASSWORD'] = args.pg_password
+    os.environ.pop('DATABASE_READ_URL', None)
+    os.environ.pop('POSTGRES_READ_HOST', None)
+    # Keep benchmark inserts out of the raw payload archive
+    os.environ['RAW_ARCHIVE'] = '0'
+
+
+def ensure_database(args):
+    from sqlalchemy import create_engine, text
+    admin = create_engine(
+        f"postgresql+psycopg://{args.pg_user}:{args.pg_password}@{args.pg_host}:{args.pg_port}/postgres",
+        isolation_level="AUTOCOMMIT",
+    )
+    with admin.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :d"), {"d": args.pg_db}).scalar()
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{args.pg_db}"'))
+            print(f"bench: created database {args.pg_db}")
+    admin.dispose()
+
+
+class RoundTrips:
+    """Counts cursor executions on an engine (one per statement / executemany)."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def wal_lsn(engine):
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+
+
+def wal_bytes_between(engine, start, end):
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        return int(conn.execute(text("SELECT pg_wal_lsn_diff(CAST(:e AS pg_lsn), CAST(:s AS pg_lsn))"), {"s": start, "e": end}).scalar())
+
+
+def _shift_iso(value, delta):
+    if not value or not isinstance(value, str):
+        return value
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    return (dt + delta).isoformat()
+
+
+def _nudge(geometry, dx, dy):
+    def move(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            return [coords[0] + dx, coords[1] + dy] + list(coords[2:])
+        return [move(c) for c in coords]
+    if not geometry or 'coordinates' not in geometry:
+        return geometry
+    out = dict(geometry)
+    out['coordinates'] = move(geometry['coordinates'])
+    return out
+
+
+def scaled_alerts(features, scale, seed=0):
+    """The snapshot plus `scale - 1` copies with new ids, earlier sent times and nudged geometry."""
+    rng = random.Random(seed)
+    out = list(features)
+    for k in range(1, scale):
+        delta = timedelta(hours=-6 * k)
+        dx, dy = rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)
+        suffix = f".bench{k}"
+        for f in features:
+            g = copy.deepcopy(f)
+            props = g.setdefault('properties', {})
+            g['id'] = f"{g.get('id') or props.get('id')}{suffix}"
+            if props.get('id'):
+                props['id'] = f"{props['id']}{suffix}"
+            for key in ('sent', 'effective', 'onset', 'expires', 'ends'):
+                props[key] = _shift_iso(props.get(key), delta)
+            # Keep update/cancel chains inside the same copy
+            for ref in props.get('references') or []:
+                if isinstance(ref, dict):
+                    for key in ('identifier', '@id'):
+                        if ref.get(key):
+                            ref[key] = f"{ref[key]}{suffix}"
+            g['geometry'] = _nudge(g.get('geometry'), dx, dy)
+            out.append(g)
+    return out
+
+
+def load_alert_features(path):
+    """Features from a GeoJSON FeatureCollection or an NDJSON file of Features."""
+    path = Path(path)
+    if path.suffix in ('.ndjson', '.jsonl'):
+        with open(path) as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+    return json.loads(path.read_text()).get('features') or []
+
+
+def load_spc_payloads():
+    from app.spc_ingest import SPC_URLS
+    urls = {name: url for name, url, _ in SPC_URLS}
+    out = []
+    for path in sorted(SPC_DIR.glob('*.geojson')):
+        name = path.stem
+        if name in urls:
+            out.append((name, urls[name], json.loads(path.read_text())))
+    return out
+
+
+def load_spc_file(path):
+    """(name, url, payload) tuples from an NDJSON file of {name, url, product, payload} lines."""
+    out = []
+    with open(path) as fh:
+        for line in fh:
+            if line.strip():
+                item = json.loads(line)
+                out.append((item['name'], item['url'], item['payload']))
+    return out
+
+
+def scaled_spc(payloads, scale):
+    """Each product plus `scale - 1` copies re-issued 1 day earlier each (distinct issue keys)."""
+    out = list(payloads)
+    for k in range(1, scale):
+        delta = timedelta(days=-k)
+        for name, url, payload in payloads:
+            p = copy.deepcopy(payload)
+            for f in p.get('features') or []:
+                props = f.get('properties') or {}
+                # The upsert prefers *_ISO over the compact YYYYmmddHHMM stamps
+                for key in ('ISSUE_ISO', 'VALID_ISO', 'EXPIRE_ISO'):
+                    props[key] = _shift_iso(props.get(key), delta)
+            out.append((name, url, p))
+    return out
+
+
+def run_phase(name, engine, counter, batches, fn):
+    """Time `fn(batch)` per batch; returns the phase metrics."""
+    features = sum(size for size, _ in batches)
+    latencies = []
+    start_lsn = wal_lsn(engine)
+    trips0 = counter.count
+    t0 = time.perf_counter()
+    for size, batch in batches:
+        b0 = time.perf_counter()
+        fn(batch)
+        latencies.append(time.perf_counter() - b0)
+    elapsed = time.perf_counter() - t0
+    trips = counter.count - trips0
+    wal = wal_bytes_between(engine, start_lsn, wal_lsn(engine))
+    latencies.sort()
+    result = {
+        "features": features,
+        "batches": len(batches),
+        "seconds": round(elapsed, 3),
+        "features_per_sec": round(features / elapsed, 1) if elapsed else None,
+        "batch_p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "batch_p99_ms": round(1000 * percentile(latencies, 99), 2),
+        "round_trips": trips,
+        "round_trips_per_feature": round(trips / features, 2) if features else None,
+        "wal_bytes": wal,
+        "wal_bytes_per_feature": round(wal / features, 1) if features else None,
+    }
+    print(f"{name:>6}: {features} features in {elapsed:.2f}s  {result['features_per_sec']}/s  "
+          f"p50={result['batch_p50_ms']}ms p99={result['batch_p99_ms']}ms  "
+          f"trips/feat={result['round_trips_per_feature']}  wal/feat={result['wal_bytes_per_feature']}B")
+    return result
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_pg_arguments(parser)
+    parser.add_argument('--reset', action='store_true', help='Truncate benchmark tables before running')
+    parser.add_argument('--scale', type=int, default=1, help='Multiply inputs with shifted synthetic copies')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch', type=int, default=100, help='Alert features per batch')
+    parser.add_argument('--alerts-file', default=str(ALERTS_SNAPSHOT), help='GeoJSON FeatureCollection or NDJSON of Features')
+    parser.add_argument('--spc-file', help='NDJSON of {name, url, product, payload} (e.g. from bench.synth) instead of examples/spc')
+    parser.add_argument('--skip-alerts', action='store_true')
+    parser.add_argument('--skip-spc', action='store_true')
+    parser.add_argument('--out', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against a results JSON')
+    parser.add_argument('--save-baseline', help='Also write results to this path')
+    args = parser.parse_args()
+
+    prepare_database(args)
+
+    from sqlalchemy import text
+    from app.db import engine, SessionLocal
+    from app.migrations import migrate
+    from app.ingest import _process_features
+    from app.spc_ingest import store_product
+
+    migrate(engine)
+    if args.reset:
+        with engine.begin() as conn:
+            conn.execute(text("TRUNCATE " + ", ".join(BENCH_TABLES)))
+    counter = RoundTrips(engine)
+    with engine.connect() as conn:
+        server_version = conn.execute(text("SHOW server_version")).scalar()
+
+    results = {}
+    if not args.skip_alerts:
+        features = scaled_alerts(load_alert_features(args.alerts_file), args.scale, args.seed)
+        batches = [(len(features[i:i + args.batch]), features[i:i + args.batch])
+                   for i in range(0, len(features), args.batch)]
+
+        def ingest_batch(batch):
+            db = SessionLocal()
+            try:
+                _process_features(batch, db)
+            finally:
+                db.close()
+
+        results['alerts'] = run_phase('alerts', engine, counter, batches, ingest_batch)
+
+    if not args.skip_spc:
+        payloads = load_spc_file(args.spc_file) if args.spc_file else load_spc_payloads()
+        if not payloads:
+            print(f"   spc: skipped (no saved products in {SPC_DIR}; run `python -m app.spc_ingest --once` first)")
+        else:
+            payloads = scaled_spc(payloads, args.scale)
+            batches = [(len(p.get('features') or []), (name, url, p)) for name, url, p in payloads]
+            results['spc'] = run_phase('spc', engine, counter, batches,
+                                       lambda item: store_product(item[0], item[1], item[0], item[2]))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "scale": args.scale,
+            "batch": args.batch,
+            "seed": args.seed,
+            "alerts_file": os.path.relpath(args.alerts_file, ROOT),
+        },
+        "results": results,
+    }
+    for path in (args.out, args.save_baseline):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as fh:
+                json.dump(report, fh, indent=2)
+    if args.baseline and Path(args.baseline).exists():
+        compare(results, json.loads(Path(args.baseline).read_text()), COMPARED)
+
+
+if __name__ == '__main__':
+    main()
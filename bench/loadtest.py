@@ -0,0 +1,283 @@
+"""Scenario load generator for the API (asyncio, stdlib HTTP client).
+
+Runs one or more traffic profiles against a running stack and reports, per
+profile and per endpoint: throughput, latency percentiles, error rate and
+server-side DB time per request.
+
+    python -m bench.loadtest --base-url http://localhost:31800 --profiles polling,spatial \\
+        --concurrency 50 --duration 30 --out loadtest.json --baseline loadtest_baseline.json
+
+Profiles:
+
+- `polling`: dashboard-style reads (`/alerts` windows, `/alerts/active`, `/spc_status`);
+- `spatial`: point and bbox queries (`/spc/risk`, `/alerts/active?bbox=`, `/spc/outlooks?bbox=`);
+- `bulk`: `POST /alerts` with synthetic alerts (needs `--api-key`);
+- `auth`: `POST /alerts` with a mix of valid and invalid keys, so API-key checks dominate.
+
+DB time comes from the `db` entry of the `Server-Timing` response header when
+the API sends one; otherwise, with `--pg-url`, from the `pg_stat_statements`
+delta over the profile (all statements on the server, so run it on a quiet
+database).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+from .common import CONUS, compare, percentile
+from .httpclient import request
+
+
+# (metric, higher is better) compared against the baseline
+COMPARED = [('rps', True), ('p50_ms', False), ('p99_ms', False), ('error_rate', False), ('db_ms_per_req', False)]
+
+SERVER_TIMING_DB = re.compile(r'(?:^|,)\s*db\s*;[^,]*?dur=([0-9.]+)')
+
+
+def _point(rng):
+    return round(rng.uniform(CONUS[1], CONUS[3]), 4), round(rng.uniform(CONUS[0], CONUS[2]), 4)
+
+
+def _bbox(rng, size):
+    lat, lon = _point(rng)
+    return f"{lon:.3f},{lat:.3f},{lon + size:.3f},{lat + size * 0.6:.3f}"
+
+
+def _path(path, **params):
+    params = {k: v for k, v in params.items() if v is not None}
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+# Each scenario step: rng, ctx -> (label, method, path, body, headers, expected statuses)
+
+def _alerts_window(rng, ctx):
+    hours = rng.choice((1, 6, 24))
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+    return 'GET /alerts', 'GET', _path('/alerts', since=since), None, None, (200,)
+
+
+def _alerts_active(rng, ctx):
+    return 'GET /alerts/active', 'GET', _path('/alerts/active', zoom=rng.choice((None, 4, 6, 8))), None, None, (200,)
+
+
+def _spc_status(rng, ctx):
+    return 'GET /spc_status', 'GET', '/spc_status', None, None, (200,)
+
+
+def _spc_risk(rng, ctx):
+    lat, lon = _point(rng)
+    return 'GET /spc/risk', 'GET', _path('/spc/risk', lat=lat, lon=lon), None, None, (200,)
+
+
+def _active_bbox(rng, ctx):
+    path = _path('/alerts/active', bbox=_bbox(rng, rng.choice((1, 3, 8))), zoom=rng.choice((5, 7, 9)))
+    return 'GET /alerts/active?bbox', 'GET', path, None, None, (200,)
+
+
+def _outlooks_bbox(rng, ctx):
+    path = _path('/spc/outlooks', product='day1otlk_cat_nolyr', bbox=_bbox(rng, 10), zoom=5)
+    return 'GET /spc/outlooks?bbox', 'GET', path, None, None, (200,)
+
+
+def _post_alert(rng, ctx):
+    feature = next(ctx['alerts'])
+    body = {"id": feature['id'], "properties": feature['properties'], "geometry": feature.get('geometry')}
+    return 'POST /alerts', 'POST', '/alerts', body, {'X-API-Key': ctx['api_key']}, (200,)
+
+
+def _post_alert_auth(rng, ctx):
+    if rng.random() < ctx['invalid_share']:
+        body = {"id": "loadtest-invalid", "properties": {}}
+        headers = {'X-API-Key': f"invalid-{rng.getrandbits(64):016x}"}
+        return 'POST /alerts (bad key)', 'POST', '/alerts', body, headers, (401,)
+    return _post_alert(rng, ctx)
+
+
+PROFILES = {
+    'polling': [(5, _alerts_window), (4, _alerts_active), (1, _spc_status)],
+    'spatial': [(6, _spc_risk), (3, _active_bbox), (1, _outlooks_bbox)],
+    'bulk': [(1, _post_alert)],
+    'auth': [(1, _post_alert_auth)],
+}
+
+WRITE_PROFILES = {'bulk', 'auth'}
+
+
+def _alert_stream(seed):
+    """Endless synthetic alerts (each with a fresh id) for the write profiles."""
+    from .synth import AlertSynth, load_alert_templates
+
+    synth = AlertSynth(load_alert_templates(), random.Random(seed),
+                       datetime.now(timezone.utc) - timedelta(days=1), 1)
+    while True:
+        yield from synth.chain()
+
+
+class PgStats:
+    """Summed `pg_stat_statements` execution time, read before and after a profile."""
+
+    def __init__(self, url):
+        from sqlalchemy import create_engine
+        self.engine = create_engine(url, pool_size=1)
+
+    def total_ms(self):
+        from sqlalchemy import text
+        try:
+            with self.engine.connect() as conn:
+                return float(conn.execute(text(
+                    "SELECT coalesce(sum(total_exec_time), 0) FROM pg_stat_statements"
+                )).scalar())
+        except Exception as e:
+            print(f"loadtest: pg_stat_statements unavailable: {e}")
+            return None
+
+
+def _server_db_ms(headers):
+    m = SERVER_TIMING_DB.search(headers.get('server-timing', ''))
+    return float(m.group(1)) if m else None
+
+
+def _summary(latencies, errors, wall, db_ms):
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    out = {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p90_ms": round(1000 * percentile(latencies, 90), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+        "max_ms": round(1000 * latencies[-1], 2) if latencies else 0.0,
+    }
+    if db_ms is not None and total:
+        out["db_ms_per_req"] = round(db_ms / total, 3)
+    return out
+
+
+async def run_profile(base_url, name, ctx, concurrency, duration, timeout, seed, pg=None):
+    steps = PROFILES[name]
+    weights = [w for w, _ in steps]
+    per_label = {}
+    statuses = {}
+    deadline = time.perf_counter() + duration
+    pg_before = pg.total_ms() if pg else None
+
+    async def worker(i):
+        rng = random.Random(seed * 1000 + i)
+        while time.perf_counter() < deadline:
+            label, method, path, body, headers, expected = rng.choices(steps, weights=weights)[0][1](rng, ctx)
+            stats = per_label.setdefault(label, {"latencies": [], "errors": 0, "db_ms": 0.0, "db_seen": 0})
+            try:
+                resp = await request(base_url + path, method=method, body=body, headers=headers, timeout=timeout)
+            except Exception:
+                stats["errors"] += 1
+                statuses['exception'] = statuses.get('exception', 0) + 1
+                continue
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            if resp.status in expected:
+                stats["latencies"].append(resp.elapsed)
+            else:
+                stats["errors"] += 1
+            db = _server_db_ms(resp.headers)
+            if db is not None:
+                stats["db_ms"] += db
+                stats["db_seen"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    wall = time.perf_counter() - start
+
+    endpoints = {}
+    all_latencies, all_errors, header_db, header_seen = [], 0, 0.0, 0
+    for label, s in sorted(per_label.items()):
+        endpoints[label] = _summary(s["latencies"], s["errors"], wall, s["db_ms"] if s["db_seen"] else None)
+        all_latencies += s["latencies"]
+        all_errors += s["errors"]
+        header_db += s["db_ms"]
+        header_seen += s["db_seen"]
+
+    db_ms, db_source = None, None
+    if header_seen:
+        db_ms, db_source = header_db, 'server-timing'
+    elif pg is not None and pg_before is not None:
+        pg_after = pg.total_ms()
+        if pg_after is not None:
+            db_ms, db_source = pg_after - pg_before, 'pg_stat_statements'
+    result = _summary(all_latencies, all_errors, wall, db_ms)
+    result.update({"db_source": db_source, "statuses": {str(k): v for k, v in statuses.items()},
+                   "endpoints": endpoints})
+    return result
+
+
+async def main_async(args):
+    profiles = [p.strip() for p in args.profiles.split(',') if p.strip()]
+    unknown = [p for p in profiles if p not in PROFILES]
+    if unknown:
+        raise SystemExit(f"unknown profiles: {', '.join(unknown)} (choose from {', '.join(PROFILES)})")
+    if WRITE_PROFILES.intersection(profiles) and not args.api_key:
+        raise SystemExit("the bulk and auth profiles need --api-key")
+
+    ctx = {
+        "api_key": args.api_key,
+        "invalid_share": args.invalid_share,
+        "alerts": _alert_stream(args.seed) if WRITE_PROFILES.intersection(profiles) else None,
+    }
+    pg = PgStats(args.pg_url) if args.pg_url else None
+    base_url = args.base_url.rstrip('/')
+    results = {}
+    for name in profiles:
+        res = await run_profile(base_url, name, ctx, args.concurrency, args.duration, args.timeout, args.seed, pg)
+        results[name] = res
+        db = f"  db={res['db_ms_per_req']}ms/req ({res['db_source']})" if 'db_ms_per_req' in res else ''
+        print(f"{name:8}  rps={res['rps']:>8}  p50={res['p50_ms']:>8}ms  p99={res['p99_ms']:>8}ms  "
+              f"errors={res['error_rate']:.2%}{db}")
+        for label, ep in res['endpoints'].items():
+            print(f"    {label:28}  n={ep['requests']:>7}  p50={ep['p50_ms']:>8}ms  p99={ep['p99_ms']:>8}ms  "
+                  f"errors={ep['errors']}")
+
+    report = {
+        "base_url": base_url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.baseline and Path(args.baseline).exists():
+        compare(results, json.loads(Path(args.baseline).read_text()), COMPARED)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:31800')
+    parser.add_argument('--profiles', default='polling,spatial', help=f"Comma-separated: {', '.join(PROFILES)}")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per profile')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--api-key', default=None, help='X-API-Key for the bulk and auth profiles')
+    parser.add_argument('--invalid-share', type=float, default=0.5, help='Share of bad keys in the auth profile')
+    parser.add_argument('--pg-url', default=None,
+                        help='SQLAlchemy URL for pg_stat_statements DB time when no Server-Timing header is sent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--save-baseline', help='Also write results here')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""Synthetic alert and SPC outlook generator for scale testing.
+
+Uses the real snapshot (`examples/alerts_snapshot.json`) and any saved SPC
+products (`examples/spc/*.geojson`) as templates and produces:
+
+- alerts grouped in update/cancel chains (Alert -> Update... -> Cancel) with
+  consistent `references` and P-VTEC actions / ETNs, spread over a time
+  window with a diurnal peak, polygons moved and resized across CONUS and
+  UGC zone lists drawn from the snapshot's zones;
+- outlook issuance histories following the usual SPC issuance times per
+  product, with shifted geometry and ISSUE/VALID/EXPIRE stamps.
+
+Output is NDJSON (one Feature / one product payload per line) or a GeoJSON
+FeatureCollection, or is loaded straight into a database through the normal
+ingest code. The same `--seed` always yields the same data.
+
+    python -m bench.synth --alerts 1000000 --outlook-days 90 --start 2026-03-01 --days 90 \\
+        --seed 42 --out-dir synth
+    python -m bench.synth --alerts 200000 --outlook-days 30 --load-db --pg-db alerts_bench
+
+The NDJSON files feed straight into `bench.ingest_bench --alerts-file/--spc-file`.
+"""
+
+import argparse
+import copy
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .common import CONUS
+from .ingest_bench import ALERTS_SNAPSHOT, SPC_DIR, add_pg_arguments, prepare_database
+
+
+ALERT_URL_PREFIX = "https://api.weather.gov/alerts/"
+
+# Hourly weights (UTC) for message times: peak in the US late afternoon / evening
+DIURNAL = [3, 3, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4, 5, 6, 6, 5, 5, 4]
+
+# Number of follow-up Updates in a chain, and the share of chains ending in a Cancel
+UPDATE_WEIGHTS = [45, 30, 15, 10]
+CANCEL_SHARE = 0.15
+
+# Issuance times (UTC hour, minute) by product prefix
+ISSUANCE_TIMES = {
+    'day1otlk': [(1, 0), (6, 0), (13, 0), (16, 30), (20, 0)],
+    'day2otlk': [(6, 0), (17, 30)],
+    'day3otlk': [(7, 30), (19, 30)],
+    'day4prob': [(9, 0)],
+    'day1fw': [(7, 0), (17, 0)],
+    'day2fw': [(8, 0), (20, 0)],
+}
+
+# Categorical levels used when no saved SPC products are available
+FALLBACK_CATEGORIES = [('2', 'TSTM', 4.0), ('3', 'MRGL', 2.6), ('4', 'SLGT', 1.7), ('5', 'ENH', 1.0), ('6', 'MDT', 0.6)]
+
+
+def _rand_id(rng):
+    return f"urn:oid:2.49.0.1.840.0.{rng.getrandbits(160):040x}.001.1"
+
+
+def _iso(dt):
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def _parse_time(value):
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _map_coords(coords, fn):
+    if coords and isinstance(coords[0], (int, float)):
+        x, y = fn(coords[0], coords[1])
+        return [round(x, 4), round(y, 4)] + list(coords[2:])
+    return [_map_coords(c, fn) for c in coords]
+
+
+def _points(coords):
+    if coords and isinstance(coords[0], (int, float)):
+        yield coords
+    else:
+        for c in coords:
+            yield from _points(c)
+
+
+def _centroid(geometry):
+    pts = list(_points(geometry['coordinates']))
+    return sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts)
+
+
+def place(geometry, lon, lat, scale):
+    """`geometry` moved so its vertex centroid is at (lon, lat) and scaled by `scale`."""
+    if not geometry or not geometry.get('coordinates'):
+        return geometry
+    cx, cy = _centroid(geometry)
+    out = dict(geometry)
+    out['coordinates'] = _map_coords(
+        geometry['coordinates'], lambda x, y: (lon + (x - cx) * scale, lat + (y - cy) * scale)
+    )
+    return out
+
+
+def _vtec_office_phen(vtec):
+    # /O.NEW.KTAE.SV.W.0026.260215T2000Z-260215T2115Z/
+    parts = vtec.strip('/').split('.')
+    return (parts[2], parts[3], parts[4]) if len(parts) >= 7 else None
+
+
+def _vtec_stamp(dt):
+    return dt.astimezone(timezone.utc).strftime('%y%m%dT%H%MZ')
+
+
+class AlertSynth:
+    """Generates alert update/cancel chains from snapshot templates."""
+
+    def __init__(self, templates, rng, start, days):
+        self.rng = rng
+        self.templates = templates
+        self.polygons = [f['geometry'] for f in templates if f.get('geometry')]
+        self.ugc_pool = sorted({u for f in templates for u in ((f['properties'].get('geocode') or {}).get('UGC') or [])})
+        self.offices = sorted({
+            v[0] for f in templates
+            for s in ((f['properties'].get('parameters') or {}).get('VTEC') or [])
+            for v in [_vtec_office_phen(s)] if v
+        }) or ['KOUN']
+        self.start = start
+        self.days = days
+        self.etns = {}
+
+    def _time(self):
+        day = self.rng.randrange(max(1, int(self.days)))
+        hour = self.rng.choices(range(24), weights=DIURNAL)[0]
+        return self.start + timedelta(days=day, hours=hour, minutes=self.rng.randrange(60))
+
+    def _next_etn(self, office, phen, sig, year):
+        key = (office, phen, sig, year)
+        self.etns[key] = self.etns.get(key, 0) + 1
+        return self.etns[key]
+
+    def chain(self):
+        """One event: an Alert, 0-3 Updates and possibly a Cancel, oldest first."""
+        rng = self.rng
+        template = rng.choice(self.templates)
+        props0 = template['properties']
+        sent0 = _parse_time(props0['sent']) if props0.get('sent') else None
+        end0 = props0.get('ends') or props0.get('expires')
+        duration = (_parse_time(end0) - sent0) if (sent0 and end0) else timedelta(hours=1)
+        duration = max(duration, timedelta(minutes=15))
+
+        geometry = template.get('geometry')
+        if geometry is None and self.polygons and rng.random() < 0.1:
+            geometry = rng.choice(self.polygons)
+        if geometry is not None:
+            lon = rng.uniform(CONUS[0], CONUS[2])
+            lat = rng.uniform(CONUS[1], CONUS[3])
+            geometry = place(geometry, lon, lat, rng.uniform(0.5, 2.0))
+
+        ugc_count = len((props0.get('geocode') or {}).get('UGC') or []) or rng.randint(1, 8)
+        ugcs = sorted(rng.sample(self.ugc_pool, min(ugc_count, len(self.ugc_pool)))) if self.ugc_pool else []
+
+        vtec_tpl = ((props0.get('parameters') or {}).get('VTEC') or [None])[0]
+        office_phen = _vtec_office_phen(vtec_tpl) if vtec_tpl else None
+        begin = self._time()
+        end = begin + duration
+        etn = None
+        if office_phen:
+            office = rng.choice(self.offices)
+            phen, sig = office_phen[1], office_phen[2]
+            etn = self._next_etn(office, phen, sig, begin.year)
+
+        updates = rng.choices(range(len(UPDATE_WEIGHTS)), weights=UPDATE_WEIGHTS)[0]
+        cancel = rng.random() < CANCEL_SHARE
+        kinds = ['Alert'] + ['Update'] * updates + (['Cancel'] if cancel else [])
+
+        messages = []
+        sent = begin
+        for i, kind in enumerate(kinds):
+            if i:
+                sent = min(sent + timedelta(minutes=rng.randint(5, 60)), end - timedelta(minutes=1))
+                if kind == 'Update' and rng.random() < 0.3:
+                    end += timedelta(minutes=rng.choice((15, 30, 60)))
+            aid = _rand_id(rng)
+            f = copy.deepcopy(template)
+            p = f['properties']
+            f['id'] = p['@id'] = ALERT_URL_PREFIX + aid
+            p['id'] = aid
+            p['messageType'] = kind
+            p['sent'] = p['effective'] = _iso(sent)
+            p['onset'] = _iso(begin)
+            p['expires'] = _iso(min(end, sent + timedelta(hours=1)) if kind != 'Cancel' else sent + timedelta(minutes=10))
+            p['ends'] = _iso(end) if kind != 'Cancel' else _iso(sent)
+            p['references'] = [
+                {"@id": ALERT_URL_PREFIX + m['properties']['id'], "identifier": m['properties']['id'],
+                 "sender": p.get('sender'), "sent": m['properties']['sent']}
+                for m in messages
+            ]
+            p.setdefault('geocode', {})['UGC'] = ugcs
+            p['affectedZones'] = [f"https://api.weather.gov/zones/forecast/{u}" for u in ugcs]
+            f['geometry'] = geometry
+            if etn is not None:
+                action = 'NEW' if i == 0 else ('CAN' if kind == 'Cancel' else rng.choice(('CON', 'CON', 'EXT')))
+                b = _vtec_stamp(begin) if i == 0 else '000000T0000Z'
+                p.setdefault('parameters', {})['VTEC'] = [
+                    f"/O.{action}.{office}.{phen}.{sig}.{etn:04d}.{b}-{_vtec_stamp(end)}/"
+                ]
+            messages.append(f)
+        return messages
+
+    def alerts(self, count):
+        """Yield `count` alert Features, chain by chain."""
+        produced = 0
+        while produced < count:
+            for f in self.chain():
+                if produced >= count:
+                    return
+                produced += 1
+                yield f
+
+
+def _fallback_outlook(rng, product):
+    """A nested categorical outlook when no saved SPC products exist."""
+    lon = rng.uniform(CONUS[0] + 8, CONUS[2] - 8)
+    lat = rng.uniform(CONUS[1] + 4, CONUS[3] - 4)
+    features = []
+    for dn, label, radius in FALLBACK_CATEGORIES:
+        ring = [[round(lon + radius * 1.3 * math.cos(a), 4), round(lat + radius * math.sin(a), 4)]
+                for a in (2 * math.pi * k / 48 for k in range(48))]
+        ring.append(ring[0])
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "MultiPolygon", "coordinates": [[ring]]},
+            "properties": {"DN": int(dn), "LABEL": label, "LABEL2": label, "stroke": "#000000", "fill": "#ffffff"},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class OutlookSynth:
+    """Generates multi-issuance SPC outlook histories."""
+
+    def __init__(self, templates, rng):
+        # templates: [(name, url, payload)]
+        self.templates = templates
+        self.rng = rng
+
+    @staticmethod
+    def issuance_times(name):
+        for prefix, times in ISSUANCE_TIMES.items():
+            if name.startswith(prefix):
+                return times
+        return [(9, 0)]
+
+    def issuances(self, start, days):
+        """Yield {name, url, product, payload} per product issuance, in time order."""
+        rng = self.rng
+        for day in range(days):
+            date = start + timedelta(days=day)
+            slots = []
+            for name, url, payload in self.templates:
+                for hour, minute in self.issuance_times(name):
+                    slots.append((date.replace(hour=hour, minute=minute, second=0, microsecond=0), name, url, payload))
+            slots.sort(key=lambda s: (s[0], s[1]))
+            for issue, name, url, payload in slots:
+                lead = int(name[3]) - 1 if name[3:4].isdigit() else 0
+                valid = (issue + timedelta(days=lead)).replace(hour=12, minute=0)
+                if valid <= issue:
+                    valid = issue
+                expire = valid.replace(hour=12) + timedelta(days=1)
+                p = copy.deepcopy(payload) if payload is not None else _fallback_outlook(rng, name)
+                dx, dy = rng.uniform(-2, 2), rng.uniform(-1, 1)
+                for f in p.get('features') or []:
+                    g = f.get('geometry')
+                    if g and g.get('coordinates'):
+                        g['coordinates'] = _map_coords(g['coordinates'], lambda x, y: (x + dx, y + dy))
+                    props = f.setdefault('properties', {})
+                    for key, dt in (('ISSUE', issue), ('VALID', valid), ('EXPIRE', expire)):
+                        props[key] = dt.strftime('%Y%m%d%H%M')
+                        props[f"{key}_ISO"] = _iso(dt)
+                    props['FORECASTER'] = props.get('FORECASTER') or 'Synthetic'
+                yield {"name": name, "url": url, "product": name, "payload": p}
+
+
+def load_alert_templates():
+    return json.loads(ALERTS_SNAPSHOT.read_text()).get('features') or []
+
+
+def load_spc_templates():
+    from app.spc_ingest import SPC_URLS
+    spc = []
+    for name, url, _ in SPC_URLS:
+        path = SPC_DIR / f"{name}.geojson"
+        if path.exists():
+            spc.append((name, url, json.loads(path.read_text())))
+    if not spc:
+        # Categorical-only fallback products
+        spc = [(name, url, None) for name, url, _ in SPC_URLS if '_cat_' in name and name.endswith('_nolyr')]
+    return spc
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_alerts(path, features, fmt):
+    n = 0
+    with open(path, 'w') as fh:
+        if fmt == 'geojson':
+            fh.write('{"type": "FeatureCollection", "features": [\n')
+        for f in features:
+            if fmt == 'geojson' and n:
+                fh.write(',\n')
+            fh.write(json.dumps(f, separators=(',', ':')))
+            if fmt == 'ndjson':
+                fh.write('\n')
+            n += 1
+        if fmt == 'geojson':
+            fh.write('\n]}\n')
+    return n
+
+
+def write_outlooks(path, issuances):
+    n = 0
+    with open(path, 'w') as fh:
+        for item in issuances:
+            fh.write(json.dumps(item, separators=(',', ':')) + '\n')
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--alerts', type=int, default=100000, help='Number of alert messages')
+    parser.add_argument('--outlook-days', type=int, default=30, help='Days of SPC issuance history (0 = none)')
+    parser.add_argument('--start', type=_parse_time, default=None, help='First day (default: --days before today)')
+    parser.add_argument('--days', type=int, default=30, help='Days the alerts are spread over')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('ndjson', 'geojson'), default='ndjson', help='Alert file format')
+    parser.add_argument('--out-dir', default='synth', help='Where alerts.<fmt> / outlooks.ndjson are written')
+    parser.add_argument('--load-db', action='store_true', help='Ingest into a database instead of writing files')
+    parser.add_argument('--batch', type=int, default=1000, help='Alerts per ingest transaction batch (--load-db)')
+    add_pg_arguments(parser)
+    args = parser.parse_args()
+
+    if args.load_db:
+        prepare_database(args)
+    start = args.start or (datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+                           - timedelta(days=args.days))
+    rng = random.Random(args.seed)
+    alerts = AlertSynth(load_alert_templates(), rng, start, args.days).alerts(args.alerts)
+    # Separate stream so the outlook history does not depend on the alert count
+    outlooks = OutlookSynth(load_spc_templates() if args.outlook_days else [], random.Random(args.seed + 1)) \
+        .issuances(start, args.outlook_days)
+
+    t0 = time.perf_counter()
+    if not args.load_db:
+        out = Path(args.out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        n = write_alerts(out / f"alerts.{args.format}", alerts, args.format)
+        m = write_outlooks(out / "outlooks.ndjson", outlooks) if args.outlook_days else 0
+        print(f"synth: wrote {n} alerts and {m} outlook issuances to {out} in {time.perf_counter() - t0:.1f}s")
+        return
+
+    from app.db import engine, SessionLocal
+    from app.migrations import migrate
+    from app.ingest import _process_features
+    from app.spc_ingest import store_product
+
+    migrate(engine)
+    m = 0
+    if args.outlook_days:
+        # Outlooks first, so alert ingest also exercises the overlap join
+        for item in outlooks:
+            store_product(item['name'], item['url'], item['product'], item['payload'])
+            m += 1
+    n = 0
+    for batch in _batched(alerts, args.batch):
+        db = SessionLocal()
+        try:
+            _process_features(batch, db)
+        finally:
+            db.close()
+        n += len(batch)
+        print(f"synth: loaded {n}/{args.alerts} alerts ({n / (time.perf_counter() - t0):.0f}/s)", end='\r')
+    print(f"\nsynth: loaded {n} alerts and {m} outlook issuances in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Incremental `active_alerts` maintenance and the in-process snapshot (no database)."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('geoalchemy2')
+
+from app import active, versions  # noqa: E402
+
+NOW = datetime(2026, 5, 19, 21, 0, tzinfo=timezone.utc)
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self._rows = list(rows)
+        self._scalar = scalar
+
+    def all(self):
+        return self._rows
+
+    def scalar(self):
+        return self._scalar
+
+
+class _Db:
+    """Records sync_active_alert statements; DELETEs return `deleted` batches in order."""
+
+    def __init__(self, deleted=(), superseded=False):
+        self.deleted = [[SimpleNamespace(event=e) for e in batch] for batch in deleted]
+        self.superseded = superseded
+        self.kinds = []
+        self.committed = False
+
+    def execute(self, stmt, params=None):
+        if stmt is versions.BUMP_SQL:
+            assert params == {"name": active.VERSION_NAME}
+            self.kinds.append('bump')
+            return _Result()
+        if stmt.is_delete:
+            self.kinds.append('delete')
+            return _Result(self.deleted.pop(0) if self.deleted else [])
+        if stmt.is_select:
+            self.kinds.append('select')
+            return _Result(scalar=self.superseded)
+        assert stmt.is_insert
+        self.kinds.append('insert')
+        return _Result()
+
+    def commit(self):
+        self.committed = True
+
+
+def _alert(**kwargs):
+    values = dict(id='urn:oid:new', status='Actual', message_type='Update', event='Tornado Warning',
+                  expires=(NOW + timedelta(hours=1)).isoformat(), references=[])
+    values.update(kwargs)
+    return values
+
+
+def test_referenced_ids_normalizes_urls_and_skips_empties():
+    refs = [
+        {'identifier': 'urn:oid:a'},
+        {'@id': active.ALERT_ID_PREFIX + 'urn:oid:b'},
+        'urn:oid:c',
+        {'sender': 'w-nws.webmaster@noaa.gov'},
+        None,
+    ]
+    assert active.referenced_ids(refs) == ['urn:oid:a', 'urn:oid:b', 'urn:oid:c']
+    assert active.referenced_ids(None) == []
+
+
+def test_alert_end_time_prefers_ends_and_assumes_utc():
+    assert active.alert_end_time({'ends': '2026-05-19T22:00:00', 'expires': '2026-05-19T21:30:00+00:00'}) \
+        == datetime(2026, 5, 19, 22, 0, tzinfo=timezone.utc)
+    assert active.alert_end_time({'ends': 'soon', 'expires': NOW}) == NOW
+    assert active.alert_end_time({}) is None
+
+
+def test_update_supersedes_referenced_alerts_and_becomes_active():
+    db = _Db(deleted=[['Severe Thunderstorm Warning']])
+    changed = active.sync_active_alert(db, _alert(references=[{'identifier': 'urn:oid:old'}]), now=NOW)
+    assert changed == {'Severe Thunderstorm Warning', 'Tornado Warning'}
+    assert db.kinds == ['delete', 'select', 'insert', 'bump']
+
+
+def test_cancel_removes_the_alert_and_what_it_references():
+    db = _Db(deleted=[['Tornado Warning'], []])
+    changed = active.sync_active_alert(
+        db, _alert(message_type='Cancel', references=['urn:oid:old']), now=NOW)
+    assert changed == {'Tornado Warning'}
+    assert db.kinds == ['delete', 'delete', 'bump']
+
+
+def test_expired_or_non_actual_alert_without_active_rows_does_not_bump():
+    db = _Db()
+    assert active.sync_active_alert(db, _alert(expires=(NOW - timedelta(minutes=1)).isoformat()), now=NOW) == set()
+    assert db.kinds == ['delete']
+    db = _Db()
+    assert active.sync_active_alert(db, _alert(status='Test'), now=NOW) == set()
+    assert db.kinds == ['delete']
+
+
+def test_alert_already_superseded_by_a_newer_active_one_stays_out():
+    db = _Db(deleted=[['Tornado Warning']], superseded=True)
+    assert active.sync_active_alert(db, _alert(), now=NOW) == {'Tornado Warning'}
+    assert db.kinds == ['select', 'delete', 'bump']
+
+
+def test_sweep_expired_bumps_only_when_rows_were_removed():
+    db = _Db(deleted=[['Flood Warning', 'Flood Warning']])
+    assert active.sweep_expired(db) == {'Flood Warning'}
+    assert db.kinds == ['delete', 'bump'] and db.committed
+    db = _Db()
+    assert active.sweep_expired(db) == set()
+    assert db.kinds == ['delete'] and db.committed
+
+
+class _Row(SimpleNamespace):
+    def __getattr__(self, name):
+        return None
+
+
+class _Session:
+    def __init__(self, store):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        if stmt is versions.VERSION_SQL:
+            return _Result(scalar=self.store['version'])
+        self.store['loads'] += 1
+        return _Result(self.store['rows'])
+
+
+def test_snapshot_reloads_only_when_the_version_changes():
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    earlier = datetime.now(timezone.utc) - timedelta(minutes=1)
+    store = {'version': None, 'loads': 0, 'rows': [
+        _Row(id='a', event='Tornado Warning', expires=later, xmin=-100, ymin=30, xmax=-99, ymax=31),
+        _Row(id='b', event='Flood Warning', expires=earlier),
+    ]}
+    snapshot = active.ActiveSnapshot(lambda: _Session(store), ttl=0)
+
+    async def scenario():
+        first = await snapshot.rows()
+        await snapshot.rows()
+        store['version'] = 4
+        store['rows'] = store['rows'][:1]
+        await snapshot.rows()
+        inside = await snapshot.rows(bbox=(-101, 29, -98, 32))
+        outside = await snapshot.rows(bbox=(-90, 29, -88, 32))
+        return first, inside, outside
+
+    first, inside, outside = asyncio.run(scenario())
+    assert [d['id'] for d in first] == ['a']
+    assert store['loads'] == 2
+    assert [d['id'] for d in inside] == ['a'] and outside == []
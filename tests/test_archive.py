@@ -0,0 +1,45 @@
+"""Content-addressed storage of raw payloads."""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app import archive  # noqa: E402
+
+
+def test_put_object_stores_compressed_payload(tmp_path):
+    sha256, codec, stored_size, path = archive.put_object(b'{"features": []}' * 100, tmp_path)
+    assert path == archive.object_path(sha256, codec, tmp_path)
+    assert path.parent.name == sha256[:2]
+    assert stored_size == path.stat().st_size < 1600
+    assert archive.read_object(sha256, codec, tmp_path) == b'{"features": []}' * 100
+    assert not list(path.parent.glob('*.tmp'))
+
+
+def test_put_object_deduplicates_identical_content(tmp_path):
+    first = archive.put_object(b'payload', tmp_path)
+    second = archive.put_object(b'payload', tmp_path)
+    assert second == first
+    assert len(list((tmp_path / 'objects').glob('*/*'))) == 1
+    other = archive.put_object(b'other payload', tmp_path)
+    assert other[0] != first[0]
+
+
+def test_dedup_hit_refreshes_mtime(tmp_path):
+    _, _, _, path = archive.put_object(b'payload', tmp_path)
+    old = time.time() - 2 * 3600
+    os.utime(path, (old, old))
+    archive.put_object(b'payload', tmp_path)
+    # prune only deletes unreferenced objects older than an hour
+    assert time.time() - path.stat().st_mtime < 60
+
+
+def test_dedup_finds_object_stored_with_the_other_codec(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, 'COMPRESSION', 'gzip')
+    sha256, codec, _, path = archive.put_object(b'payload', tmp_path)
+    assert codec == 'gz'
+    monkeypatch.setattr(archive, 'COMPRESSION', 'auto')
+    assert archive.put_object(b'payload', tmp_path) == (sha256, 'gz', path.stat().st_size, path)
@@ -0,0 +1,43 @@
+"""Keyword matching and enrichment of alert properties."""
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app.enrich import Enricher, KeywordMatcher  # noqa: E402
+
+
+def test_matches_whole_words_case_insensitively():
+    m = KeywordMatcher(['Tornado', 'Test'])
+    assert m.find('TORNADO WARNING') == ['Tornado']
+    assert m.find('Required Weekly Test') == ['Test']
+    assert m.find('Contest results; testing') == []
+
+
+def test_returns_keywords_in_order_of_first_occurrence_once():
+    m = KeywordMatcher(['Flood', 'Flash Flood', 'Warning'])
+    assert m.find('Flash Flood Warning, flood warning') == ['Flash Flood', 'Flood', 'Warning']
+
+
+def test_overlapping_keywords_share_a_suffix():
+    m = KeywordMatcher(['Severe Thunderstorm', 'Thunderstorm', 'storm'])
+    # "storm" is inside a word here, so only the whole-word keywords match
+    assert m.find('Severe Thunderstorm Watch') == ['Severe Thunderstorm', 'Thunderstorm']
+    assert m.find('Winter storm') == ['storm']
+
+
+def test_empty_inputs():
+    assert KeywordMatcher([]).find('Tornado') == []
+    assert KeywordMatcher(['', None, 'Fog']).find('') == []
+    assert KeywordMatcher(['', None, 'Fog']).find('Dense fog advisory') == ['Fog']
+
+
+def test_enricher_collects_colors_of_matched_keywords():
+    enricher = Enricher(
+        types={'Tornado Warning': 'T'},
+        keywords={'Tornado': {'emoji': None, 'color': 'red'}, 'Warning': {'emoji': None, 'color': 'red'},
+                  'Emergency': {'emoji': None, 'color': 'purple'}},
+    )
+    out = enricher.enrich({'event': ' Tornado Warning ', 'headline': 'Tornado Emergency for Moore'})
+    assert out == {'type_emoji': 'T', 'keywords': ['Tornado', 'Warning', 'Emergency'],
+                   'keyword_colors': ['red', 'purple']}
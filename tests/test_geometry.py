@@ -0,0 +1,47 @@
+"""Geometry tier selection."""
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app.geometry import GEOJSON_DIGITS, geojson_sql, parse_bbox, tier_for  # noqa: E402
+
+
+def test_full_geometry_without_zoom_or_tolerance():
+    assert tier_for() == 0
+    assert tier_for(tolerance=0) == 0
+    assert tier_for(tolerance=-1) == 0
+
+
+def test_tolerance_picks_coarsest_tier_below_it():
+    assert tier_for(tolerance=0.0005) == 0
+    assert tier_for(tolerance=0.001) == 1
+    assert tier_for(tolerance=0.02) == 2
+    assert tier_for(tolerance=1.0) == 3
+
+
+def test_zoom_maps_to_pixel_size():
+    # One pixel is 360 / (256 * 2**zoom) degrees
+    assert tier_for(zoom=3) == 3      # ~0.18 deg
+    assert tier_for(zoom=6) == 2      # ~0.022 deg
+    assert tier_for(zoom=9) == 1      # ~0.0027 deg
+    assert tier_for(zoom=12) == 0     # ~0.00034 deg
+    assert tier_for(zoom=-5) == tier_for(zoom=0)
+    assert tier_for(zoom=40) == 0
+
+
+def test_explicit_tolerance_wins_over_zoom():
+    assert tier_for(zoom=3, tolerance=0.0001) == 0
+
+
+def test_full_tier_keeps_default_geojson_precision():
+    assert 0 not in GEOJSON_DIGITS
+    assert geojson_sql('geom', 0) == 'ST_AsGeoJSON(geom)'
+    assert geojson_sql('geom_s2', 2) == f'ST_AsGeoJSON(geom_s2, {GEOJSON_DIGITS[2]})'
+
+
+def test_parse_bbox():
+    assert parse_bbox('-100,30,-90,40.5') == (-100.0, 30.0, -90.0, 40.5)
+    assert parse_bbox('') is None
+    assert parse_bbox('1,2,3') is None
+    assert parse_bbox('a,b,c,d') is None
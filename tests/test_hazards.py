@@ -0,0 +1,114 @@
+"""Hazard layer bodies, ETags and conditional GETs (no database)."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('geoalchemy2')
+
+from app import hazards, versions  # noqa: E402
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self._rows = list(rows)
+        self._scalar = scalar
+
+    def all(self):
+        return self._rows
+
+    def scalar(self):
+        return self._scalar
+
+
+def _layer(source, name, category=''):
+    return SimpleNamespace(source=source, name=name, category=category, members=2,
+                           updated_at=datetime(2026, 5, 19, 21, 0, tzinfo=timezone.utc),
+                           geometry='{"type":"MultiPolygon","coordinates":[]}')
+
+
+class _Db:
+    def __init__(self):
+        self.version = 1
+        self.loads = 0
+        self.layers = [_layer('nws', 'Tornado Warning'), _layer('nws', 'Flood Warning'),
+                       _layer('spc', 'day1otlk_cat', 'MDT')]
+
+    async def execute(self, stmt, params=None):
+        if stmt is versions.VERSION_SQL:
+            assert params == {"name": hazards.VERSION_NAME}
+            return _Result(scalar=self.version)
+        assert stmt is hazards.LAYERS_SQL
+        self.loads += 1
+        return _Result(self.layers)
+
+
+def _body(cache, db, source=None, names=None):
+    body, etag = asyncio.run(cache.body(db, source, names))
+    return json.loads(body), etag
+
+
+def test_filters_by_source_and_name():
+    cache, db = hazards.HazardCache(ttl=0), _Db()
+    everything, _ = _body(cache, db)
+    assert len(everything['features']) == 3
+    spc, _ = _body(cache, db, source='spc')
+    assert [f['properties']['category'] for f in spc['features']] == ['MDT']
+    named, _ = _body(cache, db, names=['Flood Warning'])
+    assert [f['properties']['name'] for f in named['features']] == ['Flood Warning']
+    nws, _ = _body(cache, db, source='nws')
+    assert nws['features'][0]['properties']['category'] is None
+
+
+def test_etag_is_stable_until_the_layers_change():
+    cache, db = hazards.HazardCache(ttl=0), _Db()
+    _, first = _body(cache, db, names=['Tornado Warning', 'Flood Warning'])
+    _, same = _body(cache, db, names=['Flood Warning', 'Tornado Warning'])
+    assert same == first and db.loads == 1
+    db.version = 2
+    _, unchanged = _body(cache, db, names=['Flood Warning', 'Tornado Warning'])
+    assert unchanged == first and db.loads == 2
+    db.version = 3
+    db.layers = db.layers[1:]
+    _, changed = _body(cache, db, names=['Flood Warning', 'Tornado Warning'])
+    assert changed != first
+
+
+def test_version_is_not_rechecked_within_the_ttl():
+    cache, db = hazards.HazardCache(ttl=60), _Db()
+    _body(cache, db)
+    db.version = 2
+    _body(cache, db)
+    assert db.loads == 1
+
+
+def test_hazards_endpoint_answers_matching_if_none_match_with_304(monkeypatch):
+    pytest.importorskip('httpx')
+    from fastapi.testclient import TestClient
+    from app import main
+
+    db = _Db()
+    monkeypatch.setattr(main, 'hazard_cache', hazards.HazardCache(ttl=0))
+
+    async def read_db():
+        yield db
+
+    main.app.dependency_overrides[main.get_read_db] = read_db
+    try:
+        client = TestClient(main.app)
+        first = client.get('/hazards', params={'source': 'nws'})
+        assert first.status_code == 200
+        assert first.headers['content-type'] == 'application/geo+json'
+        etag = first.headers['etag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            cached = client.get('/hazards', params={'source': 'nws'}, headers={'If-None-Match': header})
+            assert cached.status_code == 304 and cached.content == b''
+            assert cached.headers['etag'] == etag
+        stale = client.get('/hazards', params={'source': 'nws'}, headers={'If-None-Match': '"other"'})
+        assert stale.status_code == 200
+    finally:
+        main.app.dependency_overrides.clear()
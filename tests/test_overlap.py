@@ -0,0 +1,76 @@
+"""Fingerprint-gated alert <-> outlook overlap refresh (no database)."""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app import overlap  # noqa: E402
+
+
+class _Result:
+    def __init__(self, rows=(), rowcount=0):
+        self._rows = list(rows)
+        self.rowcount = rowcount
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+
+class _Db:
+    """UPDATEs return `changed` ids; each INSERT writes `inserted` pairs."""
+
+    def __init__(self, changed=(), inserted=2):
+        self.changed = [SimpleNamespace(id=i) for i in changed]
+        self.inserted = inserted
+        self.calls = []
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.calls.append((sql.split()[0], sql, params))
+        if sql.lstrip().startswith('UPDATE'):
+            return _Result(self.changed)
+        if sql.lstrip().startswith('INSERT'):
+            return _Result(rowcount=self.inserted)
+        return _Result()
+
+
+def test_unchanged_alert_is_not_rejoined():
+    db = _Db(changed=[])
+    assert overlap.refresh_alert_overlaps(db, 'urn:oid:a', 'sent') == 0
+    assert [verb for verb, _, _ in db.calls] == ['UPDATE']
+    sql = db.calls[0][1]
+    assert 'overlap_md5 IS DISTINCT FROM ' + overlap.ALERT_MD5.format(t='alerts') in sql
+
+
+def test_changed_alert_replaces_its_pairs_against_every_outlook_table():
+    db = _Db(changed=['urn:oid:a'], inserted=3)
+    assert overlap.refresh_alert_overlaps(db, 'urn:oid:a', 'sent') == 6
+    assert [verb for verb, _, _ in db.calls] == ['UPDATE', 'DELETE', 'INSERT', 'INSERT']
+    inserts = [sql for verb, sql, _ in db.calls if verb == 'INSERT']
+    assert [table in sql for sql, table in zip(inserts, overlap.OUTLOOK_TABLES.values())] == [True, True]
+    assert all(params == {'id': 'urn:oid:a', 'sent': 'sent'} for _, _, params in db.calls)
+
+
+def test_outlook_refresh_is_limited_to_the_product_written_in_this_transaction():
+    db = _Db(changed=[11, 12], inserted=5)
+    assert overlap.refresh_outlook_overlaps(db, 'fire', 'day1fw_dryt') == 5
+    _, update, params = db.calls[0]
+    assert 'UPDATE fire_outlooks' in update
+    assert 'product = :product' in update and 'created_at = now()' in update
+    assert params == {'product': 'day1fw_dryt'}
+    assert db.calls[1][2] == {'kind': 'fire', 'ids': [11, 12]}
+    assert db.calls[2][2] == {'ids': [11, 12]}
+
+
+def test_outlook_backfill_mode_and_nothing_changed():
+    db = _Db(changed=[])
+    assert overlap.refresh_outlook_overlaps(db, 'convective', since_tx_start=False) == 0
+    _, update, params = db.calls[0]
+    assert 'created_at' not in update and 'product =' not in update
+    assert params == {}
+    assert len(db.calls) == 1
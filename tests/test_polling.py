@@ -0,0 +1,85 @@
+"""Adaptive NWS poll interval."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app.polling import AdaptiveInterval, cache_max_age, retry_after
+
+
+def _interval(**kwargs):
+    defaults = dict(min_seconds=15, max_seconds=300, backoff=1.5, jitter=0, adaptive=True, fixed_seconds=300)
+    defaults.update(kwargs)
+    return AdaptiveInterval(**defaults)
+
+
+def test_starts_at_max_and_grows_no_further_when_idle():
+    poll = _interval()
+    assert poll.next_delay({}) == 300
+    assert poll.next_delay({'not_modified': True}) == 300
+
+
+def test_changes_halve_down_to_min():
+    poll = _interval()
+    assert poll.next_delay({'changed': True}) == 150
+    assert poll.next_delay({'changed': True}) == 75
+    for _ in range(10):
+        delay = poll.next_delay({'changed': True})
+    assert delay == 15
+
+
+def test_new_feed_stamp_counts_as_change_once():
+    poll = _interval()
+    assert poll.next_delay({'updated': '2026-05-19T21:00:00+00:00'}) == 150
+    assert poll.next_delay({'updated': '2026-05-19T21:00:00+00:00'}) == 225
+
+
+def test_urgent_alerts_drop_to_min_then_back_off():
+    poll = _interval()
+    assert poll.next_delay({'changed': True, 'urgent': True}) == 15
+    assert poll.next_delay({}) == 22.5
+
+
+def test_errors_double_and_honor_retry_after():
+    poll = _interval()
+    poll.next_delay({'urgent': True})
+    assert poll.next_delay({'error': True}) == 30
+    assert poll.next_delay({'error': True, 'retry_after': 120}) == 120
+    assert poll.current == 60
+
+
+def test_max_age_is_a_floor_even_with_jitter():
+    poll = _interval(jitter=0.5)
+    poll.next_delay({'urgent': True})
+    for _ in range(20):
+        poll.current = poll.min
+        assert poll.next_delay({'urgent': True, 'max_age': 60}) >= 60
+
+
+def test_jitter_stays_within_fraction():
+    poll = _interval(jitter=0.1)
+    for _ in range(50):
+        assert 270 <= poll.next_delay({}) <= 330
+
+
+def test_fixed_interval_when_not_adaptive():
+    poll = _interval(adaptive=False, fixed_seconds=60)
+    assert poll.next_delay({'urgent': True}) == 60
+    assert poll.next_delay({'error': True, 'retry_after': 90}) == 90
+
+
+def test_cache_max_age():
+    assert cache_max_age({'Cache-Control': 'public, max-age=45, s-maxage=30'}) == 45
+    assert cache_max_age({'Cache-Control': 'no-cache'}) is None
+    assert cache_max_age({}) is None
+    assert cache_max_age(None) is None
+
+
+def test_retry_after_seconds_and_date():
+    assert retry_after({'Retry-After': '120'}) == 120
+    assert retry_after({'Retry-After': ' '}) is None
+    assert retry_after({'Retry-After': 'soon'}) is None
+    assert retry_after(None) is None
+    when = datetime.now(timezone.utc) + timedelta(seconds=90)
+    assert 80 <= retry_after({'Retry-After': format_datetime(when, usegmt=True)}) <= 90
+    past = datetime.now(timezone.utc) - timedelta(hours=1)
+    assert retry_after({'Retry-After': format_datetime(past, usegmt=True)}) == 0
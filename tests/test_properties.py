@@ -0,0 +1,62 @@
+"""Compact alert properties round-trip back to the original documents."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app.properties import EXTRACTED_PROPERTIES, compact_properties  # noqa: E402
+
+
+SNAPSHOT = Path(__file__).resolve().parent.parent / 'examples' / 'alerts_snapshot.json'
+
+
+def _columns(properties):
+    """The extracted column values ingest writes for `properties`."""
+    columns = {}
+    for key, (col, kind) in EXTRACTED_PROPERTIES.items():
+        value = properties.get(key)
+        if kind == 'text' and value is not None and not isinstance(value, str):
+            value = str(value)
+        columns[col] = value
+    return columns
+
+
+def _rebuild(columns, residual):
+    """Python mirror of `full_properties_sql`: non-NULL columns, then the residual on top."""
+    doc = {key: columns[col] for key, (col, _) in EXTRACTED_PROPERTIES.items() if columns[col] is not None}
+    doc.update(residual)
+    return doc
+
+
+def _features():
+    return json.loads(SNAPSHOT.read_text())['features']
+
+
+def test_snapshot_has_features():
+    assert _features()
+
+
+@pytest.mark.parametrize('feature', _features(), ids=lambda f: f.get('id', '?')[-12:])
+def test_compact_round_trip(feature):
+    properties = feature['properties']
+    residual = compact_properties(properties)
+    assert _rebuild(_columns(properties), residual) == properties
+    # Compacting drops every key held verbatim in a column
+    assert not set(residual) & {k for k, v in properties.items()
+                                if v is not None and EXTRACTED_PROPERTIES.get(k, (None, 'text'))[1] == 'json'}
+
+
+def test_full_rows_round_trip():
+    for feature in _features():
+        properties = feature['properties']
+        assert _rebuild(_columns(properties), properties) == properties
+
+
+def test_non_string_text_values_stay_in_residual():
+    properties = {'event': 12, 'headline': None, 'geocode': {'UGC': ['TXZ001']}}
+    residual = compact_properties(properties)
+    assert residual == {'event': 12, 'headline': None}
+    assert _rebuild(_columns(properties), residual) == properties
@@ -0,0 +1,123 @@
+"""SPC job queue: retries, lease reaping and run settlement (no database)."""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('psycopg')
+
+from app import spc_jobs  # noqa: E402
+
+
+class _Result:
+    def __init__(self, rows=(), rowcount=None):
+        self._rows = list(rows)
+        self.rowcount = len(self._rows) if rowcount is None else rowcount
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return self._rows
+
+
+class _Engine:
+    """Answers spc_jobs statements from `responses` (SQL fragment -> callable(params) -> _Result)."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.calls.append((sql, params))
+        for fragment, respond in self.responses.items():
+            if fragment in sql:
+                return respond(params)
+        raise AssertionError(f"unexpected statement: {sql}")
+
+
+def _settle(finished_before=None, status='partial'):
+    """Responses of `_finalize_run`: the run lock, then the aggregate update."""
+    return {
+        "SELECT finished_at FROM spc_runs": lambda p: _Result([SimpleNamespace(finished_at=finished_before)]),
+        "WITH agg AS": lambda p: _Result([SimpleNamespace(status=status, finished_at='now')]),
+    }
+
+
+def _job(**kwargs):
+    values = dict(id=7, run_id=3, name='day1otlk_cat', url='u', product='day1otlk_cat', attempts=1, max_attempts=3)
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def test_retry_delay_grows_linearly(monkeypatch):
+    monkeypatch.setattr(spc_jobs, 'RETRY_SECONDS', 30.0)
+    assert [spc_jobs.retry_delay(n) for n in (1, 2, 3)] == [30.0, 60.0, 90.0]
+
+
+def test_fail_job_requeues_with_backoff_and_settles_the_run(monkeypatch):
+    monkeypatch.setattr(spc_jobs, 'RETRY_SECONDS', 30.0)
+    engine = _Engine({"UPDATE spc_jobs": lambda p: _Result(rowcount=1), **_settle(status='partial')})
+    monkeypatch.setattr(spc_jobs, 'engine', engine)
+    assert spc_jobs.fail_job(_job(attempts=2), 'w1', RuntimeError('x' * 5000)) == 'partial'
+    sql, params = engine.calls[0]
+    assert params['delay'] == 60.0
+    assert params['worker'] == 'w1'
+    assert len(params['error']) == 2000
+    assert "CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END" in sql
+
+
+def test_fail_job_after_losing_the_lease_changes_nothing(monkeypatch):
+    engine = _Engine({"UPDATE spc_jobs": lambda p: _Result(rowcount=0)})
+    monkeypatch.setattr(spc_jobs, 'engine', engine)
+    assert spc_jobs.fail_job(_job(), 'w1', 'boom') is None
+    assert len(engine.calls) == 1
+
+
+def test_run_already_finished_is_not_reported_again(monkeypatch):
+    engine = _Engine({"UPDATE spc_jobs": lambda p: _Result(rowcount=1), **_settle(finished_before='earlier')})
+    monkeypatch.setattr(spc_jobs, 'engine', engine)
+    assert spc_jobs.complete_job(_job(), 'w1', {}) is None
+
+
+def test_reap_expired_settles_each_run_once(monkeypatch):
+    reaped = [SimpleNamespace(run_id=r) for r in (5, 3, 5, 4)]
+    statuses = {3: 'failed', 4: None, 5: 'partial'}
+    settled = []
+
+    def aggregate(params):
+        settled.append(params['r'])
+        status = statuses[params['r']]
+        return _Result([SimpleNamespace(status=status or 'running', finished_at=status and 'now')])
+
+    engine = _Engine({
+        "last_error = 'lease expired'": lambda p: _Result(reaped),
+        "SELECT finished_at FROM spc_runs": lambda p: _Result([SimpleNamespace(finished_at=None)]),
+        "WITH agg AS": aggregate,
+    })
+    monkeypatch.setattr(spc_jobs, 'engine', engine)
+    assert spc_jobs.reap_expired() == [(3, 'failed'), (5, 'partial')]
+    assert settled == [3, 4, 5]
+    assert "attempts >= max_attempts" in engine.calls[0][0]
+
+
+def test_process_job_records_failure_and_reports_finished_run(monkeypatch):
+    calls = []
+    monkeypatch.setattr(spc_jobs, 'fail_job', lambda job, worker, e: calls.append(('fail', str(e))) or 'failed')
+    monkeypatch.setattr(spc_jobs, 'complete_job', lambda job, worker, stats: calls.append(('ok', stats)))
+
+    def broken(job):
+        raise ValueError('bad payload')
+
+    finished = []
+    spc_jobs.process_job(_job(), 'w1', broken, lambda run_id, status: finished.append((run_id, status)))
+    spc_jobs.process_job(_job(), 'w1', lambda job: {'features': 4}, lambda run_id, status: finished.append(1))
+    assert calls == [('fail', 'bad payload'), ('ok', {'features': 4})]
+    assert finished == [(3, 'failed')]
@@ -0,0 +1,78 @@
+"""Per-issuance SPC risk cache (no database)."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app import spc_risk, versions  # noqa: E402
+
+
+class _Result:
+    def __init__(self, rows=(), scalar=None):
+        self._rows = list(rows)
+        self._scalar = scalar
+
+    def all(self):
+        return self._rows
+
+    def scalar(self):
+        return self._scalar
+
+
+class _Db:
+    def __init__(self, version=1):
+        self.version = version
+        self.version_reads = 0
+        self.lookups = []
+
+    async def execute(self, stmt, params=None):
+        if stmt is versions.VERSION_SQL:
+            assert params == {"name": spc_risk.VERSION_NAME}
+            self.version_reads += 1
+            return _Result(scalar=self.version)
+        assert stmt is spc_risk.RISK_SQL
+        self.lookups.append((params['lat'], params['lon']))
+        row = SimpleNamespace(product='day1otlk_cat', kind='convective', issue='i', valid='v', expire='e',
+                              dn='4', label='MDT', label2='Moderate Risk', stroke='#f00', fill='#f99')
+        return _Result([row])
+
+
+def _lookups(cache, db, points):
+    async def run():
+        return [await cache.lookup(db, lat, lon) for lat, lon in points]
+    return asyncio.run(run())
+
+
+def test_nearby_points_share_one_rounded_entry():
+    cache, db = spc_risk.RiskCache(ttl=60, decimals=2), _Db()
+    (p1, rows, hit1), (p2, _, hit2) = _lookups(cache, db, [(35.2231, -97.4394), (35.2249, -97.4351)])
+    assert p1 == p2 == (35.22, -97.44)
+    assert (hit1, hit2) == (False, True)
+    assert db.lookups == [(35.22, -97.44)]
+    assert rows[0]['label2'] == 'Moderate Risk'
+
+
+def test_version_is_checked_at_most_once_per_ttl():
+    cache, db = spc_risk.RiskCache(ttl=60), _Db()
+    _lookups(cache, db, [(35.0, -97.0), (36.0, -97.0), (35.0, -97.0)])
+    assert db.version_reads == 1
+
+
+def test_new_issuance_drops_cached_entries():
+    cache, db = spc_risk.RiskCache(ttl=0), _Db(version=1)
+    _lookups(cache, db, [(35.0, -97.0)])
+    db.version = 2
+    (_, _, hit), = _lookups(cache, db, [(35.0, -97.0)])
+    assert not hit
+    assert db.lookups == [(35.0, -97.0), (35.0, -97.0)]
+    assert len(cache._entries) == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, db = spc_risk.RiskCache(size=2, ttl=60), _Db()
+    _lookups(cache, db, [(1.0, 1.0), (2.0, 2.0), (1.0, 1.0), (3.0, 3.0)])
+    hits = [hit for _, _, hit in _lookups(cache, db, [(1.0, 1.0), (2.0, 2.0)])]
+    assert hits == [True, False]
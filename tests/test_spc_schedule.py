@@ -0,0 +1,58 @@
+"""Issuance-aware SPC poll schedule."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+
+from app.spc_schedule import (  # noqa: E402
+    FAST_SECONDS, SLOW_SECONDS, WINDOW_AFTER, WINDOW_BEFORE, issuance_times, next_check,
+)
+
+
+def _utc(hour, minute=0, day=19):
+    return datetime(2026, 5, day, hour, minute, tzinfo=timezone.utc)
+
+
+def test_issuance_times_use_longest_prefix():
+    assert issuance_times('day1otlk_cat') == [(1, 0), (6, 0), (13, 0), (16, 30), (20, 0)]
+    assert issuance_times('day1fw_dryt') == [(7, 0), (17, 0)]
+    assert issuance_times('unknown_product') == []
+
+
+def test_fast_polls_inside_a_window_until_the_issue_lands():
+    now = _utc(13) + timedelta(minutes=10)
+    assert next_check('day1otlk_cat', now, last_issue=_utc(6)) == now + timedelta(seconds=FAST_SECONDS)
+
+
+def test_waits_for_the_next_window_once_the_issue_landed():
+    now = _utc(13) + timedelta(minutes=10)
+    expected = min(_utc(16, 30) - WINDOW_BEFORE, now + timedelta(seconds=SLOW_SECONDS))
+    assert next_check('day1otlk_cat', now, last_issue=_utc(13)) == expected
+
+
+def test_outside_windows_checks_at_the_next_window_start_or_slow_cadence():
+    now = _utc(16)
+    assert next_check('day1otlk_cat', now, last_issue=_utc(13)) == min(
+        _utc(16, 30) - WINDOW_BEFORE, now + timedelta(seconds=SLOW_SECONDS))
+
+
+def test_next_day_issuance_across_midnight():
+    now = _utc(23, 30)
+    assert next_check('day1otlk_cat', now, last_issue=_utc(20)) == min(
+        _utc(1, day=20) - WINDOW_BEFORE, now + timedelta(seconds=SLOW_SECONDS))
+    now = _utc(1, day=20) - WINDOW_BEFORE + timedelta(minutes=1)
+    assert next_check('day1otlk_cat', now, last_issue=_utc(20)) == now + timedelta(seconds=FAST_SECONDS)
+
+
+def test_window_end_is_exclusive():
+    now = _utc(13) + WINDOW_AFTER
+    assert next_check('day1otlk_cat', now, last_issue=_utc(6)) != now + timedelta(seconds=FAST_SECONDS)
+
+
+def test_products_without_a_stored_issue_or_schedule_poll_slowly():
+    now = _utc(13) + timedelta(minutes=10)
+    slow = now + timedelta(seconds=SLOW_SECONDS)
+    assert next_check('day1otlk_cat', now, last_issue=None) == min(_utc(16, 30) - WINDOW_BEFORE, slow)
+    assert next_check('unknown_product', now, last_issue=_utc(6)) == slow
@@ -0,0 +1,86 @@
+"""P-VTEC parsing and the ordering guard of the `vtec_events` upsert."""
+
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('geoalchemy2')
+
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app.vtec import parse_vtec, upsert_vtec_events  # noqa: E402
+
+
+def test_parse_single_string():
+    [ev] = parse_vtec('/O.NEW.KOUN.TO.W.0042.260519T2130Z-260519T2215Z/')
+    assert ev == {
+        'product_class': 'O',
+        'action': 'NEW',
+        'office': 'KOUN',
+        'phenomena': 'TO',
+        'significance': 'W',
+        'etn': 42,
+        'year': 2026,
+        'begin_time': datetime(2026, 5, 19, 21, 30, tzinfo=timezone.utc),
+        'end_time': datetime(2026, 5, 19, 22, 15, tzinfo=timezone.utc),
+        'raw': 'O.NEW.KOUN.TO.W.0042.260519T2130Z-260519T2215Z',
+    }
+
+
+def test_parse_list_keeps_order():
+    events = parse_vtec([
+        '/O.UPG.KTAE.TO.A.0008.000000T0000Z-260215T2200Z/',
+        None,
+        '/O.NEW.KTAE.TO.W.0011.260215T2000Z-260215T2045Z/',
+    ])
+    assert [(e['action'], e['phenomena'], e['significance'], e['etn']) for e in events] == [
+        ('UPG', 'TO', 'A', 8), ('NEW', 'TO', 'W', 11)]
+
+
+def test_unspecified_begin_takes_year_from_sent():
+    [ev] = parse_vtec('/O.CON.KTAE.TO.A.0008.000000T0000Z-270101T0100Z/', sent='2026-12-31T23:00:00-05:00')
+    assert ev['begin_time'] is None
+    assert ev['year'] == 2027  # sent is 2027-01-01 in UTC
+    [ev] = parse_vtec('/O.CON.KTAE.TO.A.0008.000000T0000Z-270101T0100Z/')
+    assert ev['year'] == 2027  # no sent: the end time's year
+
+
+def test_parse_ignores_garbage():
+    assert parse_vtec(None) == []
+    assert parse_vtec('') == []
+    assert parse_vtec('not a vtec string') == []
+    assert parse_vtec('/O.NEW.KOUN.TO.W.42.260519T2130Z-260519T2215Z/') == []
+
+
+class _Recorder:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+
+
+def test_upsert_only_moves_forward():
+    db = _Recorder()
+    properties = {
+        'event': 'Tornado Watch',
+        'sent': '2026-02-15T14:00:00-05:00',
+        'parameters': {'VTEC': ['/O.EXT.KTAE.TO.A.0008.000000T0000Z-260215T2300Z/',
+                                '/O.NEW.KTAE.TO.A.0009.260215T1900Z-260216T0100Z/']},
+    }
+    assert upsert_vtec_events(db, 'urn:test', properties) == 2
+    assert len(db.statements) == 2
+    for sql in db.statements:
+        assert 'ON CONFLICT (office, phenomena, significance, etn, year) DO UPDATE' in sql
+        # An older (re-fetched) message never overwrites a newer action
+        assert 'WHERE vtec_events.sent IS NULL OR excluded.sent IS NULL OR excluded.sent >= vtec_events.sent' in sql
+        # CON / EXT messages without a begin time keep the stored one
+        assert 'begin_time = coalesce(excluded.begin_time, vtec_events.begin_time)' in sql
+
+
+def test_upsert_without_vtec_writes_nothing():
+    db = _Recorder()
+    assert upsert_vtec_events(db, 'urn:test', {'parameters': {}}) == 0
+    assert upsert_vtec_events(db, 'urn:test', {'parameters': None}) == 0
+    assert db.statements == []